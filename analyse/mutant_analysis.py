@@ -3,6 +3,8 @@ import subprocess
 import itertools
 import json
 
+from common.results_store import ResultsStore
+
 
 def get_mutant_info(filepath : Path) -> dict:
 
@@ -18,6 +20,10 @@ def get_mutant_info(filepath : Path) -> dict:
 
     return mutant_info
 
+def get_mutant_info_from_store(store : ResultsStore) -> dict:
+
+    return {str(mutant): store.kill_info(mutant) for mutant in sorted(store.killed_mutants())}
+
 def get_test_summary_info(filepath : Path) -> dict:
 
     tests = [d for d in filepath.iterdir() if not d.is_dir()]
@@ -85,7 +91,15 @@ def flatten(somelist : list) -> list:
 if __name__=="__main__":
 
     base = Path("/data/work/tint_mutation_testing/spirv_ast_printer_cts")
-    info = get_mutant_info(Path(base, 'killed_mutants'))
+
+    # Prefer the results store (see common/results_store.py) to reading every kill_info.json
+    store_path = Path(base, 'results.sqlite')
+    if store_path.exists():
+        store = ResultsStore(store_path)
+        info = get_mutant_info_from_store(store)
+    else:
+        store = None
+        info = get_mutant_info(Path(base, 'killed_mutants'))
     print(f"Example mutant info for mutant 8: {info['8']}")
     
     total_mutants_killed = len(info)
@@ -105,7 +119,7 @@ if __name__=="__main__":
 
     print_tracking_info(Path(base,'tracking'), mutants_killed_by_cts)
 
-    test_info = get_test_summary_info(Path(base))
+    test_info = store.test_summaries() if store is not None else get_test_summary_info(Path(base))
 
     covered_mutants = [v['covered_mutants'] for k, v in test_info.items()]
 
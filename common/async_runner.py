@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+
+from pathlib import Path
+from typing import AnyStr, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from common.process_reaper import report_leaks
+from common.run_process_with_timeout import (DEFAULT_CAPTURE_LIMIT_BYTES, READ_CHUNK_SIZE, TERMINATE_GRACE_SECONDS,
+                                             BoundedCapture, ProcessResult, ProgressWatchdog)
+
+STREAM_LINE_LIMIT: int = 1024 * 1024
+STDERR_DRAIN_SECONDS: float = 1.0
+MEASURE_PROCESS_SCRIPT: Path = Path(__file__).parent / 'measure_process.py'
+# Asks measure_process.py to kill the rest of its session (see KILL_SESSION_SIGNAL there)
+KILL_SESSION_SIGNAL = signal.SIGUSR1
+
+Item = TypeVar('Item')
+Result = TypeVar('Result')
+
+
+async def kill_process_group_async(process: asyncio.subprocess.Process) -> None:
+    '''
+    Terminates the process group led by process, a measure_process.py
+    wrapper. The wrapper ignores SIGTERM; if the command does not exit
+    within the grace period, the wrapper is asked to kill everything else in
+    its session, and it is only killed itself if it does not then exit.
+    Nothing is swept from here, as once the wrapper is reaped its session id
+    may name an unrelated process.
+    '''
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    for escalation in [KILL_SESSION_SIGNAL, signal.SIGKILL]:
+        try:
+            await asyncio.wait_for(process.wait(), TERMINATE_GRACE_SECONDS)
+            return
+        except asyncio.TimeoutError:
+            pass
+        try:
+            process.send_signal(escalation)
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+def read_resource_usage(usage_fd: int) -> Dict[str, float]:
+    '''
+    Reads the usage written by measure_process.py once it has exited. The
+    usage is missing if the wrapper itself was killed.
+    '''
+    data = b''
+    while chunk := os.read(usage_fd, READ_CHUNK_SIZE):
+        data += chunk
+    try:
+        return json.loads(data)
+    except ValueError:
+        return {}
+
+
+class AsyncExecutionEngine:
+    '''
+    Runs Dawn/WGSLsmith processes concurrently from a single coordinating
+    process. At most max_in_flight processes run at a time; each run has its
+    own timeout and its whole process group is killed on timeout, early stop
+    or cancellation.
+
+    Jobs are coroutines that may run several processes (e.g. to bisect a
+    batch of mutants); map_unordered runs jobs over a list of items and
+    yields their results to synchronous code as each job completes.
+    '''
+
+    def __init__(self, max_in_flight: int):
+        assert max_in_flight >= 1
+        self.max_in_flight: int = max_in_flight
+        self._loop = asyncio.new_event_loop()
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    def close(self) -> None:
+        self._loop.close()
+
+    def __enter__(self) -> 'AsyncExecutionEngine':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    async def run_process(self,
+                          cmd: List[str],
+                          timeout_seconds: Optional[float],
+                          env: Optional[Dict[AnyStr, AnyStr]] = None,
+                          cwd: Path = None,
+                          stop_predicate: Callable[[str], bool] = None,
+                          capture_limit_bytes: Optional[int] = DEFAULT_CAPTURE_LIMIT_BYTES,
+                          stdout_spool: Optional[Path] = None,
+                          watchdog: Optional[ProgressWatchdog] = None) -> Optional[ProcessResult]:
+        '''
+        Async counterpart of run_process_streaming: stdout lines are passed to
+        stop_predicate as they arrive and the process group is terminated as
+        soon as it returns True. Returns None on timeout, including when the
+        watchdog finds the run silent.
+
+        The command is run through measure_process.py, which reports its
+        resource usage back over a pipe.
+        '''
+        async with self._slots:
+            (usage_read_fd, usage_write_fd) = os.pipe()
+            try:
+                process = await asyncio.create_subprocess_exec(sys.executable,
+                                                               str(MEASURE_PROCESS_SCRIPT),
+                                                               str(usage_write_fd),
+                                                               *[str(c) for c in cmd],
+                                                               limit=STREAM_LINE_LIMIT,
+                                                               stdout=asyncio.subprocess.PIPE,
+                                                               stderr=asyncio.subprocess.PIPE,
+                                                               env=env,
+                                                               cwd=cwd,
+                                                               start_new_session=True,
+                                                               pass_fds=(usage_write_fd,))
+            except BaseException:
+                os.close(usage_read_fd)
+                raise
+            finally:
+                os.close(usage_write_fd)
+            stdout_capture = BoundedCapture(capture_limit_bytes, stdout_spool)
+            stderr_capture = BoundedCapture(capture_limit_bytes)
+            stopped_early = False
+
+            async def read_line() -> bytes:
+                line = b''
+                while True:
+                    try:
+                        return line + await process.stdout.readuntil(b'\n')
+                    except asyncio.IncompleteReadError as e:
+                        # The output ended without a final newline
+                        return line + e.partial
+                    except asyncio.LimitOverrunError as e:
+                        # Longer than the stream buffer: take what is buffered and read on to the newline
+                        line += await process.stdout.readexactly(e.consumed)
+
+            async def read_stdout() -> bool:
+                if watchdog is not None:
+                    watchdog.start()
+                while True:
+                    if watchdog is None:
+                        line = await read_line()
+                    else:
+                        try:
+                            line = await asyncio.wait_for(read_line(), watchdog.remaining())
+                        except asyncio.TimeoutError:
+                            watchdog.silenced = True
+                            raise
+                    if not line:
+                        if watchdog is not None:
+                            watchdog.finish()
+                        return False
+                    stdout_capture.write(line)
+                    if stop_predicate is None and watchdog is None:
+                        continue
+                    decoded = line.decode('utf-8', errors='replace')
+                    if watchdog is not None:
+                        watchdog.observe(decoded)
+                    if stop_predicate is not None and stop_predicate(decoded):
+                        return True
+
+            async def read_stderr() -> None:
+                while chunk := await process.stderr.read(READ_CHUNK_SIZE):
+                    stderr_capture.write(chunk)
+
+            loop = asyncio.get_running_loop()
+            deadline = None if timeout_seconds is None else loop.time() + timeout_seconds
+
+            def remaining() -> Optional[float]:
+                return None if deadline is None else max(0.0, deadline - loop.time())
+
+            stderr_task = asyncio.ensure_future(read_stderr())
+            try:
+                stopped_early = await asyncio.wait_for(read_stdout(), remaining())
+                if stopped_early:
+                    await kill_process_group_async(process)
+                else:
+                    await asyncio.wait_for(process.wait(), remaining())
+                await asyncio.wait([stderr_task], timeout=STDERR_DRAIN_SECONDS)
+                usage = read_resource_usage(usage_read_fd)
+            except asyncio.TimeoutError:
+                await kill_process_group_async(process)
+                report_leaks(process.pid, read_resource_usage(usage_read_fd).get("leaked_processes", []))
+                return None
+            except BaseException:
+                # Cancelled (or failed): never leave the process group running
+                await asyncio.shield(kill_process_group_async(process))
+                raise
+            finally:
+                # Anything the command left behind was killed by measure_process.py before it exited
+                os.close(usage_read_fd)
+                stderr_task.cancel()
+                stdout_capture.close()
+                stderr_capture.close()
+
+            result = ProcessResult(returncode=process.returncode,
+                                   stdout=bytes(stdout_capture.data),
+                                   stderr=bytes(stderr_capture.data),
+                                   stopped_early=stopped_early,
+                                   stdout_spool=stdout_capture.spooled())
+            result.wall_time = usage.get("wall_time")
+            result.user_time = usage.get("user_time")
+            result.system_time = usage.get("system_time")
+            result.max_rss_kb = usage.get("max_rss_kb")
+            report_leaks(process.pid, usage.get("leaked_processes", []))
+            return result
+
+    async def run_blocking(self, function: Callable[..., Result], *args) -> Result:
+        '''
+        Runs a blocking function (e.g. one driving a persistent worker
+        process) in a thread, counting it against max_in_flight.
+        '''
+        async with self._slots:
+            return await asyncio.to_thread(function, *args)
+
+    def map_unordered(self,
+                      job: Callable[[Item], Awaitable[Result]],
+                      items: Iterable[Item]) -> Iterator[Tuple[Item, Result]]:
+        '''
+        Runs job on every item concurrently and yields (item, result) pairs
+        in completion order. If the consumer stops early, outstanding jobs
+        are cancelled and their processes killed.
+        '''
+        tasks = {self._loop.create_task(job(item)): item for item in items}
+        pending = set(tasks)
+        try:
+            while pending:
+                (done, pending) = self._loop.run_until_complete(
+                    asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED))
+                for task in done:
+                    yield (tasks[task], task.result())
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
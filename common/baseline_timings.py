@@ -0,0 +1,83 @@
+import sqlite3
+import time
+
+from pathlib import Path
+from typing import Optional
+
+BUSY_TIMEOUT_SECONDS: float = 60.0
+BASELINE_TIMINGS_FILE_NAME = 'baseline_timings.sqlite'
+
+# Kinds of test
+CTS = 'cts'
+WGSLSMITH = 'wgslsmith'
+
+
+class BaselineTiming:
+    def __init__(self, runs: int, wall_time: float, longest_silence: Optional[float]):
+        self.runs: int = runs
+        # Slowest unmutated run seen, so timeouts derived from it allow for a slow node
+        self.wall_time: float = wall_time
+        # Longest an unmutated run went without progress (see ProgressWatchdog)
+        self.longest_silence: Optional[float] = longest_silence
+
+
+class BaselineTimings:
+    '''
+    Runtimes of unmutated runs of each CTS query and WGSLsmith program, in a
+    SQLite file shared by the kill processes and kept across campaigns.
+    Mutant run timeouts are derived from these, so a test that has been
+    timed before does not need an unmutated run just to set its timeouts.
+    '''
+
+    def __init__(self, path: Path):
+        self.path: Path = Path(path)
+        self._connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS baseline_timings (
+                kind TEXT NOT NULL,
+                test TEXT NOT NULL,
+                runs INTEGER NOT NULL,
+                wall_time REAL NOT NULL,
+                longest_silence REAL,
+                last_wall_time REAL NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (kind, test)
+            )''')
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'BaselineTimings':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def record(self, kind: str, test: str, wall_time: float, longest_silence: Optional[float] = None) -> BaselineTiming:
+        '''
+        Records an unmutated run and returns the timing of the test over all
+        recorded runs.
+        '''
+        with self._connection:
+            self._connection.execute('''
+                INSERT INTO baseline_timings (kind, test, runs, wall_time, longest_silence, last_wall_time, updated)
+                VALUES (?, ?, 1, ?, ?, ?, ?)
+                ON CONFLICT (kind, test) DO UPDATE SET
+                    runs = runs + 1,
+                    wall_time = MAX(wall_time, excluded.wall_time),
+                    longest_silence = MAX(COALESCE(longest_silence, excluded.longest_silence),
+                                          COALESCE(excluded.longest_silence, longest_silence)),
+                    last_wall_time = excluded.last_wall_time,
+                    updated = excluded.updated''',
+                (kind, test, wall_time, longest_silence, wall_time, time.time()))
+        return self.get(kind, test)
+
+    def get(self, kind: str, test: str) -> Optional[BaselineTiming]:
+        row = self._connection.execute('SELECT runs, wall_time, longest_silence FROM baseline_timings '
+                                       'WHERE kind = ? AND test = ?', (kind, test)).fetchone()
+        return None if row is None else BaselineTiming(*row)
+
+
+def get_default_baseline_timings_path(mutant_kill_path: Path) -> Path:
+    return Path(mutant_kill_path, BASELINE_TIMINGS_FILE_NAME)
@@ -0,0 +1,68 @@
+import hashlib
+import json
+
+from pathlib import Path
+from typing import List, Optional
+
+from common.mutation_tree_cache import HASH_CHUNK_SIZE
+
+# The parts of a Dawn build that a CTS run loads: the Node addon and the
+# shared libraries next to it
+BUILD_BINARY_PATTERNS = ['*.node', '*.so', '*.so.*']
+
+
+def update_with_file(sha, path: Path) -> None:
+    sha.update(path.name.encode('utf-8'))
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+
+
+def get_build_binaries(dawn_path: Path) -> List[Path]:
+    build_dir = Path(dawn_path, 'out', 'Debug')
+    binaries = set()
+    for pattern in BUILD_BINARY_PATTERNS:
+        binaries.update([path for path in build_dir.glob(pattern) if path.is_file()])
+    return sorted(binaries)
+
+
+def get_build_fingerprint(dawn_path: Path) -> str:
+    '''
+    Hash of the content of the binaries in a Dawn checkout's out/Debug that
+    a CTS run loads, so results cached against it are only reused while
+    the build is unchanged. Mutants are enabled through the environment,
+    so every mutant shares its build's fingerprint.
+    '''
+    binaries = get_build_binaries(dawn_path)
+    if not binaries:
+        raise FileNotFoundError(f'No Dawn binaries found in {Path(dawn_path, "out", "Debug")}')
+    sha = hashlib.sha256()
+    for path in binaries:
+        update_with_file(sha, path)
+    return sha.hexdigest()
+
+
+def get_icd_fingerprint(vk_icd: Optional[str]) -> str:
+    '''
+    Identifies a Vulkan driver by the content of its ICD manifest and of
+    the library the manifest names, so that rebuilding a driver in place
+    is noticed. An unset ICD (the system default) is identified as such.
+    '''
+    if not vk_icd:
+        return 'default'
+    manifest = Path(vk_icd)
+    if not manifest.is_file():
+        return f'missing:{vk_icd}'
+
+    sha = hashlib.sha256()
+    update_with_file(sha, manifest)
+    try:
+        with open(manifest, 'r') as f:
+            library_path = json.load(f)["ICD"]["library_path"]
+    except (ValueError, KeyError, TypeError):
+        library_path = None
+    if library_path is not None:
+        library = Path(manifest.parent, library_path)
+        if library.is_file():
+            update_with_file(sha, library)
+    return sha.hexdigest()
@@ -0,0 +1,146 @@
+import fcntl
+import json
+import os
+import time
+
+from pathlib import Path
+from typing import Dict, List, Optional, Set, TextIO
+
+JOURNAL_FILE_NAME = 'journal.jsonl'
+TEST_LOCK_FILE_NAME = '.lock'
+
+# Journal records, one JSON object per line:
+#   {"type": "start", "test": t, "worker": pid, "time": s}
+#   {"type": "outcome", "test": t, "mutant": m, "outcome": "killed" | "survived" | "uncovered", "kill_type": k}
+#   {"type": "done", "test": t, "reason": r}
+START = 'start'
+OUTCOME = 'outcome'
+DONE = 'done'
+
+KILLED = 'killed'
+SURVIVED = 'survived'
+# Not run, as no test covers the mutant
+UNCOVERED = 'uncovered'
+
+
+class TestProgress:
+    def __init__(self):
+        self.started: bool = False
+        self.done: bool = False
+        self.outcomes: Dict[int, dict] = {}
+
+
+class CampaignJournal:
+    '''
+    Append-only journal of a kill campaign, shared by the kill processes
+    writing to the same mutant kill directory. Each record is written with
+    a single O_APPEND write and fsync'd before the caller moves on, so after
+    a crash the journal holds every mutant outcome up to the one that was
+    being run. Replaying it at start-up lets a test that was interrupted
+    resume at that mutant instead of starting again.
+
+    The replayed state is a snapshot taken when the journal is opened; use
+    claim_test_directory to stop two processes resuming the same test.
+    '''
+
+    def __init__(self, path: Path):
+        self.path: Path = Path(path)
+        self.tests: Dict[str, TestProgress] = {}
+        self._replay()
+        self._fd: int = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def __enter__(self) -> 'CampaignJournal':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _replay(self) -> None:
+        if not self.path.exists():
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        # A crash can leave a partial final record; drop it so that new records start on a fresh line
+        complete_length = data.rfind(b'\n') + 1
+        if complete_length < len(data):
+            with open(self.path, 'r+b') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # Another process may have completed the line in the meantime
+                    if os.fstat(f.fileno()).st_size == len(data):
+                        f.truncate(complete_length)
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+        for line in data[:complete_length].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            progress = self.tests.setdefault(record["test"], TestProgress())
+            if record["type"] == START:
+                progress.started = True
+            elif record["type"] == OUTCOME:
+                progress.outcomes[record["mutant"]] = record
+            elif record["type"] == DONE:
+                progress.done = True
+
+    def _append(self, record: dict) -> None:
+        os.write(self._fd, (json.dumps(record) + '\n').encode('utf-8'))
+        os.fsync(self._fd)
+
+    def record_start(self, test: str) -> None:
+        self.tests.setdefault(test, TestProgress()).started = True
+        self._append({"type": START, "test": test, "worker": os.getpid(), "time": time.time()})
+
+    def record_outcome(self, test: str, mutant: int, outcome: str, kill_type: str) -> None:
+        record = {"type": OUTCOME, "test": test, "mutant": mutant, "outcome": outcome, "kill_type": kill_type}
+        self.tests.setdefault(test, TestProgress()).outcomes[mutant] = record
+        self._append(record)
+
+    def record_done(self, test: str, reason: str = 'complete') -> None:
+        self.tests.setdefault(test, TestProgress()).done = True
+        self._append({"type": DONE, "test": test, "reason": reason})
+
+    def completed_tests(self) -> Set[str]:
+        return set([test for (test, progress) in self.tests.items() if progress.done])
+
+    def interrupted_tests(self) -> List[str]:
+        '''
+        Tests that were started but not finished, in the order they were
+        first recorded.
+        '''
+        return [test for (test, progress) in self.tests.items() if progress.started and not progress.done]
+
+    def outcomes(self, test: str) -> Dict[int, dict]:
+        '''
+        Mutant outcomes already recorded for a test, keyed by mutant.
+        '''
+        progress = self.tests.get(test)
+        return {} if progress is None else dict(progress.outcomes)
+
+
+def get_journal_file(mutant_kill_path: Path) -> Path:
+    return Path(mutant_kill_path, JOURNAL_FILE_NAME)
+
+
+def claim_test_directory(test_directory: Path) -> Optional[TextIO]:
+    '''
+    Creates test_directory if needed and takes an exclusive lock on it,
+    returning the open lock file, which must be kept open while the test is
+    run. Returns None if another live process holds the lock. The lock is
+    released when its process exits, so a test left by a crashed process can
+    be claimed again.
+    '''
+    Path(test_directory).mkdir(exist_ok=True)
+    lock_file = open(Path(test_directory, TEST_LOCK_FILE_NAME), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
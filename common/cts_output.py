@@ -0,0 +1,181 @@
+import re
+import sys
+
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Statuses that a test result line can report; tests that pass with
+# warnings are reported as warn. All are the same length, so a status is
+# recognised with a single slice.
+TEST_STATUSES = frozenset(['pass', 'fail', 'skip', 'warn'])
+STATUS_LENGTH = 4
+
+RESULT_SEPARATOR = ' - '
+
+# e.g. "PASS: 1234" in the summary printed at the end of a run
+SUMMARY_COUNT = re.compile(r'\b(PASS|FAIL|SKIP|WARN): (\d+)')
+
+
+class TestResult:
+    __slots__ = ('test', 'status')
+
+    def __init__(self, test: str, status: str):
+        self.test: str = test
+        self.status: str = status
+
+    def __repr__(self) -> str:
+        return f'TestResult({self.test!r}, {self.status!r})'
+
+
+class SummaryCount:
+    __slots__ = ('status', 'count')
+
+    def __init__(self, status: str, count: int):
+        self.status: str = status
+        self.count: int = count
+
+    def __repr__(self) -> str:
+        return f'SummaryCount({self.status!r}, {self.count})'
+
+
+class TestWarning:
+    '''
+    A test that passed with warnings.
+    '''
+    __slots__ = ('test', 'message')
+
+    def __init__(self, test: str, message: str):
+        self.test: str = test
+        self.message: str = message
+
+    def __repr__(self) -> str:
+        return f'TestWarning({self.test!r}, {self.message!r})'
+
+
+CTSEvent = Union[TestResult, SummaryCount, TestWarning]
+
+
+def split_result_line(line: str) -> Optional[Tuple[str, str]]:
+    '''
+    Splits a verbose CTS result line, "<test> - <status>", where the status
+    may be followed by a colon and further text, into the test and its
+    status. Returns None for any other line.
+    '''
+    (test, separator, rest) = line.partition(RESULT_SEPARATOR)
+    if not separator:
+        return None
+    status = rest[:STATUS_LENGTH]
+    if status not in TEST_STATUSES or rest[STATUS_LENGTH:STATUS_LENGTH + 1].isalpha():
+        return None
+    # The test id ends at the first space
+    if ' ' in test:
+        test = test[:test.index(' ')]
+    return (test, status)
+
+
+def is_result_line(line: str) -> bool:
+    return split_result_line(line) is not None
+
+
+def parse_result_line(line: str) -> Optional[TestResult]:
+    split = split_result_line(line)
+    if split is None:
+        return None
+    return TestResult(sys.intern(split[0]), split[1])
+
+
+class CTSOutputParser:
+    '''
+    Incremental parser for the output of a verbose CTS run. Test ids are
+    interned, as the same ids are looked up and stored many times over a
+    campaign.
+
+    For live use, output is fed as bytes or text chunks as it streams in
+    (feed) or line by line (feed_line); each returns the events for the
+    lines it completed, e.g. to stop a run at the first failure. For saved
+    output, read_lines only collects the results and summary counts, which
+    avoids creating an event per line.
+    '''
+
+    def __init__(self):
+        self._pending: str = ''
+        # Latest status of each test
+        self.results: Dict[str, str] = {}
+        # First count reported for each status in the run's summary
+        self.summary: Dict[str, int] = {}
+
+    def _read_summary(self, line: str) -> List[SummaryCount]:
+        counts = []
+        for matched in SUMMARY_COUNT.finditer(line):
+            count = SummaryCount(matched.group(1).lower(), int(matched.group(2)))
+            self.summary.setdefault(count.status, count.count)
+            counts.append(count)
+        return counts
+
+    def feed_line(self, line: str) -> List[CTSEvent]:
+        result = parse_result_line(line)
+        if result is None:
+            return self._read_summary(line) if ': ' in line else []
+
+        self.results[result.test] = result.status
+        if result.status == 'warn':
+            message = line.partition(RESULT_SEPARATOR)[2][STATUS_LENGTH:]
+            return [result, TestWarning(result.test, message.lstrip(':').strip())]
+        return [result]
+
+    def feed(self, data: Union[bytes, str]) -> List[CTSEvent]:
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', errors='replace')
+        lines = (self._pending + data).split('\n')
+        self._pending = lines.pop()
+        events = []
+        for line in lines:
+            events.extend(self.feed_line(line))
+        return events
+
+    def close(self) -> List[CTSEvent]:
+        '''
+        Parses a final line that was not terminated by a newline.
+        '''
+        (line, self._pending) = (self._pending, '')
+        return self.feed_line(line) if line else []
+
+    def read_lines(self, lines: Iterable[str]) -> 'CTSOutputParser':
+        # Same parsing as split_result_line, inlined as this runs for every line of a saved run
+        results = self.results
+        intern = sys.intern
+        for line in lines:
+            (test, separator, rest) = line.partition(RESULT_SEPARATOR)
+            if separator:
+                status = rest[:STATUS_LENGTH]
+                if status in TEST_STATUSES and not rest[STATUS_LENGTH:STATUS_LENGTH + 1].isalpha():
+                    if ' ' in test:
+                        test = test[:test.index(' ')]
+                    results[intern(test)] = status
+                    continue
+            if ': ' in line:
+                self._read_summary(line)
+        return self
+
+    def test_results(self, statuses: Iterable[str] = ('pass', 'fail', 'skip')) -> Dict[str, str]:
+        '''
+        Maps each test to its status, keeping only tests with the given
+        statuses.
+        '''
+        statuses = frozenset(statuses)
+        return {test: status for (test, status) in self.results.items() if status in statuses}
+
+
+def parse_lines(lines: Iterable[str]) -> CTSOutputParser:
+    return CTSOutputParser().read_lines(lines)
+
+
+def parse_file(filename: Path) -> CTSOutputParser:
+    with open(filename, 'r', errors='replace') as f:
+        return parse_lines(f)
+
+
+def iter_events(lines: Iterable[str]) -> Iterator[CTSEvent]:
+    parser = CTSOutputParser()
+    for line in lines:
+        yield from parser.feed_line(line.rstrip('\n'))
@@ -0,0 +1,102 @@
+from typing import Awaitable, Callable, Dict, Generator, List, Set
+
+from common.mutation_tree import MutationTree
+
+
+def pack_compatible_mutants(mutants: List[int],
+                            mutation_tree: MutationTree,
+                            max_batch_size: int) -> List[List[int]]:
+    '''
+    Greedily packs mutants into batches of at most max_batch_size such that
+    no two mutants in a batch are incompatible, i.e. neither lies in the
+    mutation tree subtree or on the ancestor path of the other. Mutants
+    keep their relative order within and across batches.
+    '''
+    batches: List[List[int]] = []
+    blocked: List[Set[int]] = []
+
+    for mutant in mutants:
+        for (batch, blocked_by_batch) in zip(batches, blocked):
+            if len(batch) < max_batch_size and mutant not in blocked_by_batch:
+                break
+        else:
+            batch = []
+            blocked_by_batch = set()
+            batches.append(batch)
+            blocked.append(blocked_by_batch)
+
+        batch.append(mutant)
+        blocked_by_batch.update(mutation_tree.get_incompatible_mutation_ids(mutant))
+
+    return batches
+
+
+def bisect_mutants(batch: List[int],
+                   survived: Callable[[tuple], bool]) -> Generator[List[int], tuple, Dict[int, tuple]]:
+    '''
+    Group testing of a compatible batch: all mutants are run together and
+    the batch is only bisected if the run does not survive, so that each
+    mutant ends up with the result of a run in which it was enabled alone
+    or in a surviving batch.
+
+    This is a generator so that the same strategy can be driven
+    synchronously or asynchronously: it yields the mutants to run next, is
+    sent the result of that run, and returns the result attributed to each
+    mutant. survived decides whether a result means none of the enabled
+    mutants were killed.
+    '''
+    results: Dict[int, tuple] = {}
+    pending: List[List[int]] = [batch]
+
+    while pending:
+        mutants = pending.pop()
+        if len(mutants) > 1:
+            print(f'Trying batch of {len(mutants)} mutants: {mutants}')
+        else:
+            print(f'Trying mutant {mutants[0]}')
+
+        result = yield mutants
+
+        if survived(result) or len(mutants) == 1:
+            for mutant in mutants:
+                results[mutant] = result
+            continue
+
+        # Both halves need to be run: more than one mutant in the batch may
+        # be killed, and a kill may only be caused by the mutants together
+        middle = len(mutants) // 2
+        pending.append(mutants[middle:])
+        pending.append(mutants[:middle])
+
+    return results
+
+
+def group_test_mutants(batch: List[int],
+                       run_mutants: Callable[[List[int]], tuple],
+                       survived: Callable[[tuple], bool]) -> Dict[int, tuple]:
+    '''
+    Runs bisect_mutants with run_mutants, which runs the test with the given
+    mutants enabled and returns its result.
+    '''
+    strategy = bisect_mutants(batch, survived)
+    try:
+        mutants = next(strategy)
+        while True:
+            mutants = strategy.send(run_mutants(mutants))
+    except StopIteration as finished:
+        return finished.value
+
+
+async def group_test_mutants_async(batch: List[int],
+                                   run_mutants: Callable[[List[int]], Awaitable[tuple]],
+                                   survived: Callable[[tuple], bool]) -> Dict[int, tuple]:
+    '''
+    As group_test_mutants, for a coroutine run_mutants.
+    '''
+    strategy = bisect_mutants(batch, survived)
+    try:
+        mutants = next(strategy)
+        while True:
+            mutants = strategy.send(await run_mutants(mutants))
+    except StopIteration as finished:
+        return finished.value
@@ -0,0 +1,89 @@
+'''
+Runs a command and writes its resource usage as JSON to a file descriptor
+inherited from the caller:
+
+    python measure_process.py <fd> <cmd>...
+
+asyncio reaps the processes it starts itself, so their rusage is lost;
+AsyncExecutionEngine runs commands through this script instead, which
+reaps the command with wait4 and then exits the way the command did.
+
+As the leader of the run's session, it also kills any processes the
+command left behind, which would otherwise keep the output pipes open,
+and reports their names. It is the only process that sweeps the session:
+being alive, it keeps the session id from naming anything else. The
+engine sends it KILL_SESSION_SIGNAL to have the session killed early,
+e.g. when the command does not exit after SIGTERM.
+'''
+
+import ctypes
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+# Run as a script, so this module's directory is on the path rather than the repository root
+from process_reaper import kill_session_processes
+
+PR_SET_CHILD_SUBREAPER = 36
+KILL_SESSION_SIGNAL = signal.SIGUSR1
+
+
+def become_subreaper() -> None:
+    '''
+    Has orphaned descendants reparented to this process rather than to
+    init, so that those that leave the session are still found as
+    descendants. Linux only; elsewhere nothing changes.
+    '''
+    try:
+        ctypes.CDLL(None, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0)
+    except (OSError, AttributeError):
+        pass
+
+
+def main():
+    usage_fd = int(sys.argv[1])
+    cmd = sys.argv[2:]
+
+    become_subreaper()
+    start_time = time.monotonic()
+    process = subprocess.Popen(cmd)
+
+    # The engine terminates the whole process group; stay alive long enough
+    # to report on the command. (Ignored signals would be inherited, so
+    # this is only done once the command has started.)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    leaked = []
+
+    def kill_session(signum, frame) -> None:
+        # Kills the command too, so the wait below returns; only the others are leaks
+        leaked.extend([info for info in kill_session_processes(os.getsid(0)) if info.pid != process.pid])
+
+    signal.signal(KILL_SESSION_SIGNAL, kill_session)
+
+    (_, status, rusage) = os.wait4(process.pid, 0)
+    wall_time = time.monotonic() - start_time
+    process.returncode = os.waitstatus_to_exitcode(status)
+    leaked.extend(kill_session_processes(os.getsid(0)))
+
+    with os.fdopen(usage_fd, 'w') as usage_file:
+        json.dump({
+            "wall_time": wall_time,
+            "user_time": rusage.ru_utime,
+            "system_time": rusage.ru_stime,
+            "max_rss_kb": rusage.ru_maxrss,
+            "leaked_processes": [info.name for info in leaked],
+        }, usage_file)
+
+    if process.returncode < 0:
+        signal.signal(-process.returncode, signal.SIG_DFL)
+        os.kill(os.getpid(), -process.returncode)
+    sys.exit(process.returncode)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,17 @@
-import functools
+import hashlib
+import json
+import struct
+import sys
 
-from typing import List
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator, List
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 #TODO: link this to the dredd-compiler-testing repo once I know which branch to use
 
@@ -17,7 +28,27 @@ def get_mutation_ids_for_mutation_group(mutation_group):
 
 def get_mutation_ids_for_json_node(node):
     assert "mutationGroups" in node
-    return functools.reduce(lambda x, y: x + y, map(get_mutation_ids_for_mutation_group, node["mutationGroups"]), [])
+    return [mutation_id
+            for mutation_group in node["mutationGroups"]
+            for mutation_id in get_mutation_ids_for_mutation_group(mutation_group)]
+
+
+def compute_mutation_tree_digest(parent, mutation_offsets, mutation_ids) -> str:
+    '''
+    Canonical digest of a tree's structure and mutation ids. Node ids are
+    assigned in pre-order, so trees built from structurally identical
+    mutation info files have identical arrays and therefore digests. The
+    arrays are hashed as little-endian int32 so the digest does not depend
+    on the machine.
+    '''
+    sha = hashlib.sha256(b'dredd-mutation-tree')
+    for values in [parent, mutation_offsets, mutation_ids]:
+        data = array('i', values)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        sha.update(struct.pack('<q', len(data)))
+        sha.update(data.tobytes())
+    return sha.hexdigest()
 
 
 class MutationTreeNode:
@@ -26,46 +57,245 @@ class MutationTreeNode:
         self.mutation_ids = mutation_ids
 
 
+class MutationTreeBuilder:
+    '''
+    Builds a MutationTree from a depth-first walk over the mutation tree nodes.
+
+    Nodes are numbered in pre-order as they are started, so every subtree
+    occupies a contiguous range of node ids. Mutation ids may be added to
+    the current node at any point before it is ended (Dredd emits a node's
+    mutation groups after its children).
+    '''
+
+    def __init__(self):
+        self._parent = array('i')
+        self._mutation_node = array('i')
+        self._mutation_ids = array('i')
+        self._stack: List[int] = []
+
+    def start_node(self) -> int:
+        node_id = len(self._parent)
+        self._parent.append(self._stack[-1] if self._stack else -1)
+        self._stack.append(node_id)
+        return node_id
+
+    def add_mutation_ids(self, mutation_ids) -> None:
+        assert self._stack, "Mutation ids must belong to a node"
+        node_id = self._stack[-1]
+        for mutation_id in mutation_ids:
+            self._mutation_node.append(node_id)
+            self._mutation_ids.append(mutation_id)
+
+    def end_node(self) -> None:
+        self._stack.pop()
+
+    def add_json(self, json_data) -> None:
+        # Iterative walk so that deep trees do not hit the recursion limit
+        for file_info in json_data["infoForFiles"]:
+            pending = [(False, node) for node in reversed(file_info["mutationTree"])]
+            while pending:
+                (is_end, json_node) = pending.pop()
+                if is_end:
+                    self.add_mutation_ids(get_mutation_ids_for_json_node(json_node))
+                    self.end_node()
+                    continue
+                self.start_node()
+                pending.append((True, json_node))
+                pending.extend((False, child) for child in reversed(json_node["children"]))
+
+    def build(self) -> 'MutationTree':
+        assert not self._stack, "Unfinished mutation tree node"
+        num_nodes = len(self._parent)
+
+        # Pre-order numbering means a child always has a larger id than its
+        # parent, so subtree sizes can be accumulated in a single reverse pass
+        subtree_end = array('i', range(1, num_nodes + 1))
+        for node_id in range(num_nodes - 1, -1, -1):
+            parent = self._parent[node_id]
+            if parent >= 0:
+                subtree_end[parent] = max(subtree_end[parent], subtree_end[node_id])
+
+        # Counting sort of the mutation ids by node, keeping the order in
+        # which they were added for each node
+        mutation_offsets = array('i', bytes(4 * (num_nodes + 1)))
+        for node_id in self._mutation_node:
+            mutation_offsets[node_id + 1] += 1
+        for node_id in range(num_nodes):
+            mutation_offsets[node_id + 1] += mutation_offsets[node_id]
+        mutation_ids = array('i', bytes(4 * len(self._mutation_ids)))
+        next_slot = array('i', mutation_offsets[:num_nodes])
+        for (node_id, mutation_id) in zip(self._mutation_node, self._mutation_ids):
+            mutation_ids[next_slot[node_id]] = mutation_id
+            next_slot[node_id] += 1
+
+        digest = compute_mutation_tree_digest(self._parent, mutation_offsets, mutation_ids)
+
+        return MutationTree.from_arrays(self._parent, subtree_end, mutation_offsets, mutation_ids, digest=digest)
+
+
+class _ArrayMapping(Mapping):
+    '''
+    Read-only dict view over an array, where -1 marks a missing key.
+    '''
+
+    def __init__(self, values):
+        self._values = values
+
+    def __getitem__(self, key):
+        if not (isinstance(key, int) and 0 <= key < len(self._values)) or self._values[key] < 0:
+            raise KeyError(key)
+        return self._values[key]
+
+    def __iter__(self) -> Iterator[int]:
+        return (key for (key, value) in enumerate(self._values) if value >= 0)
+
+    def __len__(self) -> int:
+        return sum(1 for value in self._values if value >= 0)
+
+
+class _NodeMapping(Mapping):
+    '''
+    Read-only dict view presenting the nodes of a MutationTree as
+    MutationTreeNode objects, created on access.
+    '''
+
+    def __init__(self, tree: 'MutationTree'):
+        self._tree = tree
+
+    def __getitem__(self, node_id):
+        if not (isinstance(node_id, int) and 0 <= node_id < self._tree.num_nodes):
+            raise KeyError(node_id)
+        return MutationTreeNode(self._tree.get_mutation_ids_for_node(node_id),
+                                list(self._tree.get_children(node_id)))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self._tree.num_nodes))
+
+    def __len__(self) -> int:
+        return self._tree.num_nodes
+
+
 class MutationTree:
+    '''
+    Mutation tree stored as flat arrays indexed by pre-order (Euler tour)
+    node id:
+        parent[n]            -- parent of node n, or -1 for a root
+        subtree_end[n]       -- one past the last node in the subtree of n;
+                                the first child of n is n + 1 if
+                                n + 1 < subtree_end[n]
+        mutation_offsets[n]  -- start of the mutation ids of n in
+                                mutation_ids; those of the subtree of n are
+                                mutation_ids[mutation_offsets[n]:mutation_offsets[subtree_end[n]]]
+    '''
+
     def __init__(self, json_data):
+        builder = MutationTreeBuilder()
+        builder.add_json(json_data)
+        tree = builder.build()
+        self._init_from_arrays(tree.parent, tree.subtree_end, tree.mutation_offsets, tree.mutation_ids,
+                               tree.mutation_node, tree.digest)
 
-        def populate(json_node, node_id):
-            children = []
-            for child_json_node in json_node["children"]:
-                child_node_id = self.num_nodes
-                children.append(child_node_id)
-                self.parent_map[child_node_id] = node_id
-                self.num_nodes += 1
-                # populate(child_json_node, child_node_id)
-            self.nodes[node_id] = MutationTreeNode(get_mutation_ids_for_json_node(json_node), children)
-            temp: int = functools.reduce(max, self.nodes[node_id].mutation_ids, 0)
-            self.num_mutations = max(self.num_mutations, temp)
-            for mutation_id in self.nodes[node_id].mutation_ids:
-                self.mutation_id_to_node_id[mutation_id] = node_id
-
-        self.nodes = {}
-        self.parent_map = {}
-        self.mutation_id_to_node_id = {}
-        self.num_mutations = 0
-        self.num_nodes = 0
+    @classmethod
+    def from_arrays(cls, parent, subtree_end, mutation_offsets, mutation_ids,
+                    mutation_node=None, digest: str = None) -> 'MutationTree':
+        '''
+        Creates a tree directly from its arrays, which may be any int32
+        sequences (e.g. memoryviews over a memory-mapped cache file). The
+        mutation id to node array and the digest are computed if not given.
+        '''
+        tree = cls.__new__(cls)
+        tree._init_from_arrays(parent, subtree_end, mutation_offsets, mutation_ids, mutation_node, digest)
+        return tree
 
-        for file_info in json_data["infoForFiles"]:
-            for mutation_tree_node in file_info["mutationTree"]: 
-                root_node_id = self.num_nodes
-                self.num_nodes += 1
-                populate(mutation_tree_node, root_node_id)
+    def _init_from_arrays(self, parent, subtree_end, mutation_offsets, mutation_ids,
+                          mutation_node=None, digest: str = None):
+        self.parent = parent
+        self.subtree_end = subtree_end
+        self.mutation_offsets = mutation_offsets
+        self.mutation_ids = mutation_ids
+        self.num_nodes: int = len(parent)
+
+        if mutation_node is None:
+            mutation_node = array('i', [-1]) * (max(mutation_ids, default=0) + 1)
+            for node_id in range(self.num_nodes):
+                for index in range(mutation_offsets[node_id], mutation_offsets[node_id + 1]):
+                    mutation_node[mutation_ids[index]] = node_id
+        self.mutation_node = mutation_node
+        self.num_mutations: int = len(mutation_node) - 1
+
+        if digest is None:
+            digest = compute_mutation_tree_digest(parent, mutation_offsets, mutation_ids)
+        self.digest: str = digest
+
+        # Dict-like views kept for compatibility with code that inspects the tree directly
+        self.nodes = _NodeMapping(self)
+        self.parent_map = _ArrayMapping(self.parent)
+        self.mutation_id_to_node_id = _ArrayMapping(self.mutation_node)
+
+    def get_children(self, node_id) -> Iterator[int]:
+        child = node_id + 1
+        while child < self.subtree_end[node_id]:
+            yield child
+            child = self.subtree_end[child]
+
+    def get_mutation_ids_for_node(self, node_id) -> List[int]:
+        assert 0 <= node_id < self.num_nodes
+        return self.mutation_ids[self.mutation_offsets[node_id]:self.mutation_offsets[node_id + 1]].tolist()
 
     def get_mutation_ids_for_subtree(self, node_id) -> List[int]:
         assert 0 <= node_id < self.num_nodes
-        return self.nodes[node_id].mutation_ids + functools.reduce(lambda x, y: x + y,
-                                                                   map(lambda x: self.get_mutation_ids_for_subtree(x),
-                                                                       self.nodes[node_id].children), [])
+        start = self.mutation_offsets[node_id]
+        end = self.mutation_offsets[self.subtree_end[node_id]]
+        return self.mutation_ids[start:end].tolist()
 
     def get_incompatible_mutation_ids(self, mutation_id) -> List[int]:
-        assert 0 <= mutation_id < self.num_mutations
-        node_id = self.mutation_id_to_node_id[mutation_id]
+        assert 0 <= mutation_id <= self.num_mutations
+        node_id = self.mutation_node[mutation_id]
+        assert node_id >= 0
         result = self.get_mutation_ids_for_subtree(node_id)
-        while node_id in self.parent_map:
-            node_id = self.parent_map[node_id]
-            result += self.nodes[node_id].mutation_ids
-        return result
\ No newline at end of file
+        node_id = self.parent[node_id]
+        while node_id >= 0:
+            result += self.get_mutation_ids_for_node(node_id)
+            node_id = self.parent[node_id]
+        return result
+
+
+MUTATION_TREE_ROOT_PREFIX = 'infoForFiles.item.mutationTree.item'
+
+
+def _is_tree_node_prefix(prefix: str) -> bool:
+    if prefix == MUTATION_TREE_ROOT_PREFIX:
+        return True
+    return prefix.startswith(MUTATION_TREE_ROOT_PREFIX) \
+        and prefix.endswith('.children.item') \
+        and '.mutationGroups.' not in prefix
+
+
+def stream_mutation_info(json_input, builder: MutationTreeBuilder) -> None:
+    '''
+    Walks infoForFiles -> mutationTree -> mutationGroups of a Dredd
+    mutation info file as a stream of parse events, feeding nodes and
+    mutation ids to the builder without materialising the document.
+    '''
+    for (prefix, event, value) in ijson.parse(json_input):
+        if event == 'start_map' and _is_tree_node_prefix(prefix):
+            builder.start_node()
+        elif event == 'end_map' and _is_tree_node_prefix(prefix):
+            builder.end_node()
+        elif event == 'number' and prefix.endswith('.mutationId') and '.mutationGroups.' in prefix:
+            builder.add_mutation_ids([int(value)])
+
+
+def load_mutation_tree(mutation_info_file: Path) -> MutationTree:
+    '''
+    Builds a MutationTree from a Dredd mutation info file. The file is
+    streamed if ijson is installed, otherwise it is loaded in full.
+    '''
+    builder = MutationTreeBuilder()
+    if ijson is not None:
+        with open(mutation_info_file, 'rb') as json_input:
+            stream_mutation_info(json_input, builder)
+    else:
+        with open(mutation_info_file, 'r') as json_input:
+            builder.add_json(json.load(json_input))
+    return builder.build()
@@ -0,0 +1,164 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from array import array
+from pathlib import Path
+from typing import List, Optional
+
+from common.mutation_tree import MutationTree, load_mutation_tree
+
+# Cache file layout (native byte order, int32 arrays):
+#   header: magic, byte order marker, num_nodes, num_mutation_entries, num_mutations, digest
+#   parent[num_nodes]
+#   subtree_end[num_nodes]
+#   mutation_offsets[num_nodes + 1]
+#   mutation_ids[num_mutation_entries]
+#   mutation_node[num_mutations + 1]
+CACHE_MAGIC = b'DREDDMT2'
+CACHE_BYTE_ORDER_MARKER = 0x01020304
+CACHE_HEADER = struct.Struct('=8sIqqq32s')
+CACHE_ITEM_SIZE = 4
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def hash_file(path: Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def get_cache_dir(mutation_info_file: Path) -> Path:
+    return Path(Path(mutation_info_file).parent, 'mutation_tree_cache')
+
+
+def get_cache_file(mutation_info_file: Path, cache_dir: Path = None) -> Path:
+    if cache_dir is None:
+        cache_dir = get_cache_dir(mutation_info_file)
+    return Path(cache_dir, f'{hash_file(mutation_info_file)}.{sys.byteorder}.tree')
+
+
+def write_mutation_tree_cache(tree: MutationTree, cache_file: Path) -> None:
+    '''
+    Writes the tree to cache_file. The file is written to a temporary
+    file and renamed into place, so concurrent readers never see a
+    partially written cache.
+    '''
+    cache_file = Path(cache_file)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+    (fd, temp_path) = tempfile.mkstemp(dir=cache_file.parent, prefix=cache_file.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(CACHE_HEADER.pack(CACHE_MAGIC,
+                                      CACHE_BYTE_ORDER_MARKER,
+                                      tree.num_nodes,
+                                      len(tree.mutation_ids),
+                                      tree.num_mutations,
+                                      bytes.fromhex(tree.digest)))
+            for values in [tree.parent, tree.subtree_end, tree.mutation_offsets, tree.mutation_ids, tree.mutation_node]:
+                f.write(array('i', values).tobytes())
+        os.replace(temp_path, cache_file)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _read_cache_lengths(header: bytes, file_size: int) -> Optional[List[int]]:
+    '''
+    Returns the lengths of the arrays in a cache file, or None if its header
+    is not valid or the file is not the size the header says it should be
+    (e.g. it was truncated).
+    '''
+    if len(header) < CACHE_HEADER.size:
+        return None
+    (magic, marker, num_nodes, num_mutation_entries, num_mutations, _) = CACHE_HEADER.unpack_from(header)
+    if magic != CACHE_MAGIC or marker != CACHE_BYTE_ORDER_MARKER:
+        return None
+    lengths = [num_nodes, num_nodes, num_nodes + 1, num_mutation_entries, num_mutations + 1]
+    if file_size != CACHE_HEADER.size + CACHE_ITEM_SIZE * sum(lengths):
+        return None
+    return lengths
+
+
+def read_mutation_tree_cache(cache_file: Path) -> Optional[MutationTree]:
+    '''
+    Maps cache_file read-only and returns a tree whose arrays are views
+    onto the mapping, so processes reading the same cache share its pages.
+    Returns None if the file is missing or not a valid cache.
+    '''
+    try:
+        with open(cache_file, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    lengths = _read_cache_lengths(mapping, len(mapping))
+    if lengths is None:
+        return None
+    digest = CACHE_HEADER.unpack_from(mapping)[5]
+
+    view = memoryview(mapping)
+    arrays = []
+    offset = CACHE_HEADER.size
+    for length in lengths:
+        arrays.append(view[offset:offset + CACHE_ITEM_SIZE * length].cast('i'))
+        offset += CACHE_ITEM_SIZE * length
+
+    return MutationTree.from_arrays(*arrays, digest=digest.hex())
+
+
+def read_mutation_tree_cache_digest(cache_file: Path) -> Optional[str]:
+    '''
+    Reads only the digest from the header of cache_file, or returns None if
+    the file is missing, not a valid cache or truncated.
+    '''
+    try:
+        with open(cache_file, 'rb') as f:
+            header = f.read(CACHE_HEADER.size)
+            file_size = os.fstat(f.fileno()).st_size
+    except FileNotFoundError:
+        return None
+
+    if _read_cache_lengths(header, file_size) is None:
+        return None
+    return CACHE_HEADER.unpack(header)[5].hex()
+
+
+def load_cached_mutation_tree(mutation_info_file: Path, cache_dir: Path = None) -> MutationTree:
+    '''
+    Returns the mutation tree for a Dredd mutation info file, using a
+    cache keyed by the content hash of the file. On a miss the tree is
+    built from the file and written to the cache for later runs.
+    '''
+    cache_file = get_cache_file(mutation_info_file, cache_dir)
+
+    tree = read_mutation_tree_cache(cache_file)
+    if tree is not None:
+        print(f'Using cached mutation tree {cache_file}')
+        return tree
+
+    tree = load_mutation_tree(mutation_info_file)
+    try:
+        write_mutation_tree_cache(tree, cache_file)
+    except OSError as e:
+        print(f'Could not write mutation tree cache {cache_file}: {e}')
+    return tree
+
+
+def get_mutation_tree_digest(mutation_info_file: Path, cache_dir: Path = None) -> str:
+    '''
+    Returns the structural digest of the mutation tree for a Dredd mutation
+    info file. If the tree is cached only the cache header is read;
+    otherwise the tree is built (and cached).
+    '''
+    digest = read_mutation_tree_cache_digest(get_cache_file(mutation_info_file, cache_dir))
+    if digest is not None:
+        return digest
+    return load_cached_mutation_tree(mutation_info_file, cache_dir).digest
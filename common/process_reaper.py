@@ -0,0 +1,147 @@
+import os
+import signal
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+PROC_PATH: Path = Path('/proc')
+
+
+class ProcessInfo:
+    __slots__ = ('pid', 'name', 'state', 'ppid', 'pgrp', 'session')
+
+    def __init__(self, pid: int, name: str, state: str, ppid: int, pgrp: int, session: int):
+        self.pid: int = pid
+        self.name: str = name
+        self.state: str = state
+        self.ppid: int = ppid
+        self.pgrp: int = pgrp
+        self.session: int = session
+
+    def __repr__(self) -> str:
+        return f'{self.name}({self.pid})'
+
+
+def read_process_info(pid: int) -> Optional[ProcessInfo]:
+    '''
+    Reads a process's entry in /proc/<pid>/stat, or returns None if the
+    process has gone.
+    '''
+    try:
+        with open(PROC_PATH / str(pid) / 'stat', 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The name is in parentheses and may itself contain spaces or parentheses
+    (head, _, tail) = data.rpartition(b')')
+    name = head.partition(b'(')[2].decode('utf-8', errors='replace')
+    fields = tail.split()
+    return ProcessInfo(pid, name, fields[0].decode('ascii'), int(fields[1]), int(fields[2]), int(fields[3]))
+
+
+def list_processes() -> List[ProcessInfo]:
+    '''
+    Every live process visible in /proc; empty where there is no /proc.
+    Zombies are left out, as they have already exited and are reaped by
+    their parent.
+    '''
+    try:
+        entries = os.listdir(PROC_PATH)
+    except OSError:
+        return []
+    processes = []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        info = read_process_info(int(entry))
+        if info is not None and info.state != 'Z':
+            processes.append(info)
+    return processes
+
+
+def find_session_processes(sessions: Iterable[int]) -> List[ProcessInfo]:
+    '''
+    Processes in the given sessions, plus any descendants of those that
+    have moved to a session of their own.
+    '''
+    sessions = set(sessions)
+    processes = list_processes()
+    children: Dict[int, List[ProcessInfo]] = {}
+    for info in processes:
+        children.setdefault(info.ppid, []).append(info)
+
+    found = [info for info in processes if info.session in sessions]
+    seen: Set[int] = set([info.pid for info in found])
+    to_visit = list(found)
+    while to_visit:
+        for child in children.get(to_visit.pop().pid, []):
+            if child.pid not in seen:
+                seen.add(child.pid)
+                found.append(child)
+                to_visit.append(child)
+    return found
+
+
+class LeakReport:
+    '''
+    Counts, by process name, the processes that outlived the run that
+    started them and had to be killed, e.g. stray node processes left by
+    the CTS runner.
+    '''
+
+    def __init__(self):
+        self.runs_with_leaks: int = 0
+        self.leaked: Dict[str, int] = {}
+
+    def add(self, names: List[str]) -> None:
+        '''
+        Records the names of the processes leaked by one run.
+        '''
+        if not names:
+            return
+        self.runs_with_leaks += 1
+        for name in names:
+            self.leaked[name] = self.leaked.get(name, 0) + 1
+
+    def to_json(self) -> dict:
+        return {"runs_with_leaks": self.runs_with_leaks, "leaked": dict(self.leaked)}
+
+
+# Leaks from all runs made by this process
+leak_report = LeakReport()
+
+
+def kill_session_processes(session: int) -> List[ProcessInfo]:
+    '''
+    Kills every process in a session (see find_session_processes) other
+    than the calling process, e.g. the processes left behind by a session
+    leader that has exited. Runs are started in sessions of their own, so
+    the session id is the pid of the process that was started. That pid
+    can be reused once the leader has been reaped and nothing is left in
+    its session, so this must be called from within the session or before
+    the leader is reaped (see wait_for_exit in run_process_with_timeout.py)
+    to only reach processes started by the run.
+    '''
+    leaked = [info for info in find_session_processes([session]) if info.pid != os.getpid()]
+    for info in leaked:
+        try:
+            os.kill(info.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    return leaked
+
+
+def report_leaks(session: int, names: List[str]) -> None:
+    if names:
+        print(f'Killed {len(names)} processes left behind by session {session}: {", ".join(names)}')
+    leak_report.add(names)
+
+
+def reap_session(session: int) -> List[ProcessInfo]:
+    '''
+    Kills the processes left in the session of a run whose leader has
+    exited but not yet been reaped, and records them in the leak report.
+    '''
+    leaked = kill_session_processes(session)
+    report_leaks(session, [info.name for info in leaked])
+    return leaked
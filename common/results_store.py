@@ -0,0 +1,326 @@
+import argparse
+import json
+import sqlite3
+
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+BUSY_TIMEOUT_SECONDS: float = 60.0
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS mutants (
+    mutant INTEGER PRIMARY KEY,
+    killed INTEGER NOT NULL DEFAULT 0,
+    killing_test TEXT,
+    kill_type TEXT,
+    kill_info TEXT
+);
+CREATE TABLE IF NOT EXISTS tests (
+    name TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    state TEXT NOT NULL,
+    worker TEXT,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    test TEXT NOT NULL,
+    mutant INTEGER NOT NULL,
+    kill_type TEXT NOT NULL,
+    wall_time REAL,
+    user_time REAL,
+    system_time REAL,
+    max_rss_kb INTEGER
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    test TEXT NOT NULL,
+    mutant INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    PRIMARY KEY (test, mutant)
+);
+CREATE INDEX IF NOT EXISTS outcomes_by_mutant ON outcomes (mutant, outcome);
+CREATE INDEX IF NOT EXISTS runs_by_test ON runs (test);
+'''
+
+# Test states
+CLAIMED = 'claimed'
+DONE = 'done'
+
+# Outcomes of a mutant for a test; covered means covered but not tried (e.g. testing stopped early)
+COVERED = 'covered'
+KILLED = 'killed'
+SURVIVED = 'survived'
+SKIPPED = 'skipped'
+
+# Test name under which survivors listed only in surviving_mutants.txt are imported
+SURVIVORS_FILE_TEST = 'surviving_mutants.txt'
+
+
+class ResultsStore:
+    '''
+    Results of a mutant killing campaign in a single SQLite file (WAL mode,
+    so analysis can read while kill processes write):
+
+    - mutants: one row per killed mutant, with the test that killed it
+    - tests: one row per CTS query or WGSLsmith program, with its summary
+    - runs: resource usage of each mutant run
+    - outcomes: per test, whether each covered mutant was killed, survived,
+      was skipped (already killed) or was not tried
+
+    record_kill and claim_test are atomic, so concurrent kill processes can
+    use them in place of creating marker directories.
+    '''
+
+    def __init__(self, path: Path):
+        self.path: Path = Path(path)
+        self._connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'ResultsStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def record_kill(self, mutant: int, test: str, kill_type: str, kill_info: dict) -> bool:
+        '''
+        Records that test killed mutant. Returns False if the mutant had
+        already been recorded as killed (e.g. by another process), in which
+        case the earlier kill is kept.
+        '''
+        with self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO mutants (mutant, killed, killing_test, kill_type, kill_info) VALUES (?, 1, ?, ?, ?) '
+                'ON CONFLICT (mutant) DO UPDATE SET killed = 1, killing_test = excluded.killing_test, '
+                'kill_type = excluded.kill_type, kill_info = excluded.kill_info WHERE mutants.killed = 0',
+                (mutant, test, kill_type, json.dumps(kill_info)))
+        return cursor.rowcount == 1
+
+    def is_killed(self, mutant: int) -> bool:
+        row = self._connection.execute('SELECT killed FROM mutants WHERE mutant = ?', (mutant,)).fetchone()
+        return row is not None and row[0] == 1
+
+    def killed_mutants(self) -> Set[int]:
+        return set([mutant for (mutant,) in self._connection.execute('SELECT mutant FROM mutants WHERE killed = 1')])
+
+    def kill_info(self, mutant: int) -> Optional[dict]:
+        row = self._connection.execute('SELECT kill_info FROM mutants WHERE mutant = ? AND killed = 1',
+                                       (mutant,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def killing_test(self, mutant: int) -> Optional[str]:
+        row = self._connection.execute('SELECT killing_test FROM mutants WHERE mutant = ? AND killed = 1',
+                                       (mutant,)).fetchone()
+        return None if row is None else row[0]
+
+    def surviving_mutants(self) -> List[int]:
+        '''
+        Mutants that survived at least one test and have not been killed.
+        '''
+        rows = self._connection.execute('SELECT DISTINCT mutant FROM outcomes WHERE outcome = ? AND mutant NOT IN '
+                                        '(SELECT mutant FROM mutants WHERE killed = 1) ORDER BY mutant', (SURVIVED,))
+        return [mutant for (mutant,) in rows]
+
+    def claim_test(self, name: str, kind: str, worker: str) -> bool:
+        '''
+        Claims a test for this worker. Returns False if the test has already
+        been claimed or run by any worker.
+        '''
+        with self._connection:
+            cursor = self._connection.execute('INSERT OR IGNORE INTO tests (name, kind, state, worker) '
+                                              'VALUES (?, ?, ?, ?)', (name, kind, CLAIMED, worker))
+        return cursor.rowcount == 1
+
+    def record_run(self, test: str, mutant: int, kill_type: str, resource_usage: Optional[dict]) -> None:
+        '''
+        Records a mutant run; resource_usage is None for a run that timed out.
+        '''
+        usage = resource_usage if resource_usage is not None else {}
+        with self._connection:
+            self._connection.execute('INSERT INTO runs (test, mutant, kill_type, wall_time, user_time, system_time, '
+                                     'max_rss_kb) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                     (test, mutant, kill_type, usage.get("wall_time"), usage.get("user_time"),
+                                      usage.get("system_time"), usage.get("max_rss_kb")))
+
+    def record_test_summary(self, name: str, kind: str, summary: dict) -> None:
+        '''
+        Stores a test's kill summary and the outcome for each mutant it
+        covered, as listed in the summary.
+        '''
+        outcomes: Dict[int, str] = {}
+        for mutant in summary.get("covered_mutants", []):
+            outcomes[mutant] = COVERED
+        for (key, outcome) in [("skipped_mutants", SKIPPED),
+                               ("survived_mutants", SURVIVED),
+                               ("killed_mutants", KILLED)]:
+            for mutant in summary.get(key, []):
+                outcomes[mutant] = outcome
+
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._connection.execute('INSERT INTO tests (name, kind, state, summary) VALUES (?, ?, ?, ?) '
+                                     'ON CONFLICT (name) DO UPDATE SET state = excluded.state, '
+                                     'summary = excluded.summary', (name, kind, DONE, json.dumps(summary)))
+            self._connection.executemany('INSERT OR REPLACE INTO outcomes (test, mutant, outcome) VALUES (?, ?, ?)',
+                                         [(name, mutant, outcome) for (mutant, outcome) in outcomes.items()])
+            self._connection.execute('COMMIT')
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+
+    def test_summaries(self, kind: str = None) -> Dict[str, dict]:
+        if kind is None:
+            rows = self._connection.execute('SELECT name, summary FROM tests WHERE state = ?', (DONE,))
+        else:
+            rows = self._connection.execute('SELECT name, summary FROM tests WHERE state = ? AND kind = ?',
+                                            (DONE, kind))
+        return {name: json.loads(summary) for (name, summary) in rows}
+
+    def tests_covering(self, mutant: int) -> List[str]:
+        rows = self._connection.execute('SELECT test FROM outcomes WHERE mutant = ? ORDER BY test', (mutant,))
+        return [test for (test,) in rows]
+
+
+def is_noted_as_killed(mutant_kill_path: Path, results_store: Optional[ResultsStore], mutant: int) -> bool:
+    '''
+    Whether mutant has been killed by any process, from the results store
+    if there is one and otherwise from the killed_mutants directory.
+    '''
+    if results_store is not None:
+        return results_store.is_killed(mutant)
+    return Path(mutant_kill_path, f'killed_mutants/{str(mutant)}').exists()
+
+
+def get_killing_test(mutant_kill_path: Path, results_store: Optional[ResultsStore], mutant: int) -> Optional[str]:
+    '''
+    The test (WGSLsmith program or CTS query) recorded as killing mutant,
+    or None if it is not known to be killed or its kill info has not been
+    written yet.
+    '''
+    if results_store is not None:
+        return results_store.killing_test(mutant)
+    try:
+        with open(Path(mutant_kill_path, f'killed_mutants/{str(mutant)}/kill_info.json'), 'r') as f:
+            kill_info = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return kill_info.get("killing_test", kill_info.get("killing_query"))
+
+
+def note_kill(mutant_kill_path: Path,
+              results_store: Optional[ResultsStore],
+              mutant: int,
+              test: str,
+              kill_info: dict) -> bool:
+    '''
+    Records a kill and writes killed_mutants/<mutant>/kill_info.json.
+    Returns False, writing nothing, if another process recorded the kill
+    first.
+    '''
+    mutant_path = Path(mutant_kill_path, f'killed_mutants/{str(mutant)}')
+    if results_store is not None:
+        if not results_store.record_kill(mutant, test, kill_info["kill_type"], kill_info):
+            return False
+        mutant_path.mkdir(exist_ok=True)
+    else:
+        try:
+            mutant_path.mkdir()
+        except FileExistsError:
+            return False
+    with open(mutant_path / "kill_info.json", "w") as outfile:
+        json.dump(kill_info, outfile)
+    return True
+
+
+def get_test_kind(test_directory_name: str) -> str:
+    return 'wgslsmith' if test_directory_name.startswith('wgslsmith_') else 'cts'
+
+
+def import_output_directory(results_store: ResultsStore, mutant_kill_path: Path) -> None:
+    '''
+    Imports the results files written by kill processes under
+    mutant_kill_path. Importing is idempotent, so a directory can be
+    imported again after more results have been written.
+
+    Covered mutants come from the kill summaries; the tracking files are
+    only used to record queries that covered no mutants. The info_<pid>.log
+    files are progress logs and are not imported.
+    '''
+    mutant_kill_path = Path(mutant_kill_path)
+
+    n_killed = 0
+    for kill_info_file in sorted(Path(mutant_kill_path, 'killed_mutants').glob('*/kill_info.json')):
+        try:
+            with open(kill_info_file, 'r') as f:
+                kill_info = json.load(f)
+        except ValueError:
+            print(f'Skipping incomplete kill info {kill_info_file}')
+            continue
+        test = kill_info.get("killing_query") or kill_info.get("killing_test")
+        results_store.record_kill(int(kill_info_file.parent.name), test, kill_info.get("kill_type"), kill_info)
+        n_killed += 1
+
+    n_tests = 0
+    for summary_file in sorted(Path(mutant_kill_path, 'tests').glob('*/kill_summary*.json')):
+        try:
+            with open(summary_file, 'r') as f:
+                summary = json.load(f)
+        except ValueError:
+            print(f'Skipping incomplete kill summary {summary_file}')
+            continue
+        test_directory_name = summary_file.parent.name
+        results_store.record_test_summary(summary.get("query", test_directory_name),
+                                          get_test_kind(test_directory_name),
+                                          summary)
+        n_tests += 1
+
+    recorded_tests = results_store.test_summaries()
+    for tracking_file in sorted(Path(mutant_kill_path, 'tracking').glob('no_tracking_file_*.txt')):
+        with open(tracking_file, 'r') as f:
+            query = f.read().strip()
+        if query not in recorded_tests:
+            results_store.record_test_summary(query, 'cts', {"query": query, "covered_mutants": []})
+            n_tests += 1
+
+    # Survivors of sampled runs are also appended to surviving_mutants.txt; keep any the summaries do not cover
+    surviving_file = Path(mutant_kill_path, 'surviving_mutants.txt')
+    if surviving_file.exists():
+        with open(surviving_file, 'r') as f:
+            survivors = set([int(line) for line in f.read().split()])
+        survivors.difference_update(results_store.surviving_mutants())
+        survivors.difference_update(results_store.killed_mutants())
+        if survivors:
+            results_store.record_test_summary(SURVIVORS_FILE_TEST, 'cts',
+                                              {"survived_mutants": sorted(survivors)})
+
+    print(f'Imported {n_killed} kills and {n_tests} test summaries from {mutant_kill_path}')
+
+
+def get_default_store_path(mutant_kill_path: Path) -> Path:
+    return Path(mutant_kill_path, 'results.sqlite')
+
+
+def main(raw_args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mutant_kill_path",
+                        help="Directory of results written by the kill processes, to import.",
+                        type=Path)
+    parser.add_argument("--results_store",
+                        default=None,
+                        type=Path,
+                        help="SQLite results store to import into. Defaults to results.sqlite in mutant_kill_path.")
+    args = parser.parse_args(raw_args)
+
+    store_path = args.results_store if args.results_store is not None else get_default_store_path(args.mutant_kill_path)
+    with ResultsStore(store_path) as results_store:
+        import_output_directory(results_store, args.mutant_kill_path)
+        print(f'{len(results_store.killed_mutants())} killed and '
+              f'{len(results_store.surviving_mutants())} surviving mutants recorded in {store_path}')
+
+
+if __name__ == '__main__':
+    main()
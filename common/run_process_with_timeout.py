@@ -1,31 +1,451 @@
+import gzip
 import os
+import selectors
 import signal
 import subprocess
+import time
 
 from pathlib import Path
-from typing import AnyStr, Dict, List, Optional
+from typing import AnyStr, Callable, Dict, Iterator, List, Optional
+
+from common.process_reaper import reap_session
+
+DEFAULT_CAPTURE_LIMIT_BYTES: int = 16 * 1024 * 1024
+READ_CHUNK_SIZE: int = 64 * 1024
+TERMINATE_GRACE_SECONDS: float = 5.0
+REAP_POLL_SECONDS: float = 0.01
+EXIT_POLL_SECONDS: float = 1.0
 
 
 class ProcessResult:
-    def __init__(self, returncode: int, stdout: bytes, stderr: bytes):
+    def __init__(self, returncode: int, stdout: bytes, stderr: bytes,
+                 stopped_early: bool = False,
+                 stdout_spool: Optional[Path] = None):
         self.returncode: int = returncode
         self.stdout: bytes = stdout
         self.stderr: bytes = stderr
+        # True if the process was terminated because a decision had been reached
+        self.stopped_early: bool = stopped_early
+        # Compressed file holding any stdout beyond the capture limit
+        self.stdout_spool: Optional[Path] = stdout_spool
+        # Resource usage of the process and the descendants it waited for;
+        # None where it could not be measured
+        self.wall_time: Optional[float] = None
+        self.user_time: Optional[float] = None
+        self.system_time: Optional[float] = None
+        self.max_rss_kb: Optional[int] = None
+
+    def set_rusage(self, wall_time: float, rusage) -> None:
+        self.wall_time = wall_time
+        self.user_time = rusage.ru_utime
+        self.system_time = rusage.ru_stime
+        # Linux reports ru_maxrss in kilobytes
+        self.max_rss_kb = rusage.ru_maxrss
+
+    def resource_usage(self) -> Dict[str, Optional[float]]:
+        return {
+            "wall_time": self.wall_time,
+            "user_time": self.user_time,
+            "system_time": self.system_time,
+            "max_rss_kb": self.max_rss_kb,
+        }
+
+
+def get_resource_usage(result: Optional[ProcessResult]) -> Optional[Dict[str, Optional[float]]]:
+    '''
+    Resource usage of a run for writing to a kill summary, or None if the
+    run timed out.
+    '''
+    return None if result is None else result.resource_usage()
+
+
+class ResourceUsage:
+    '''
+    Running totals over the resource usage of a number of process runs,
+    e.g. all runs for a query or a mutant. Timed out runs have no result
+    and are only counted.
+    '''
+
+    def __init__(self):
+        self.runs: int = 0
+        self.timeouts: int = 0
+        self.wall_time: float = 0.0
+        self.user_time: float = 0.0
+        self.system_time: float = 0.0
+        self.max_rss_kb: int = 0
+
+    def add(self, result: Optional[ProcessResult]) -> None:
+        self.runs += 1
+        if result is None:
+            self.timeouts += 1
+            return
+        self.wall_time += result.wall_time or 0.0
+        self.user_time += result.user_time or 0.0
+        self.system_time += result.system_time or 0.0
+        self.max_rss_kb = max(self.max_rss_kb, result.max_rss_kb or 0)
+
+    def add_wall_time(self, wall_time: float) -> None:
+        '''
+        Counts a run for which only the wall time is known, e.g. tests run
+        in a persistent CTS worker.
+        '''
+        self.runs += 1
+        self.wall_time += wall_time
+
+    def to_json(self) -> Dict[str, float]:
+        return {
+            "runs": self.runs,
+            "timeouts": self.timeouts,
+            "wall_time": self.wall_time,
+            "user_time": self.user_time,
+            "system_time": self.system_time,
+            "max_rss_kb": self.max_rss_kb,
+        }
 
 
 def run_process_with_timeout(cmd: List[str],
                              timeout_seconds: int,
                              env: Optional[Dict[AnyStr, AnyStr]] = None,
                              cwd: Path = None) -> Optional[ProcessResult]:
-    process = None
+    # Output is captured in full, as callers parse all of it
+    return run_process_streaming(cmd, timeout_seconds, env=env, cwd=cwd, capture_limit_bytes=None)
+
+
+def wait_for_exit(process: subprocess.Popen, timeout_seconds: Optional[float] = None) -> bool:
+    '''
+    Waits up to timeout_seconds for process to exit without reaping it, so
+    that its pid, and the session it leads, cannot be reused while what it
+    left behind is swept (see reap_session). Returns False if it is still
+    running.
+    '''
+    deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+    while process.returncode is None:
+        try:
+            if os.waitid(os.P_PID, process.pid,
+                         os.WEXITED | os.WNOWAIT | (0 if deadline is None else os.WNOHANG)) is not None:
+                return True
+        except ChildProcessError:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(REAP_POLL_SECONDS)
+    return True
+
+
+def wait_with_rusage(process: subprocess.Popen, timeout_seconds: Optional[float] = None):
+    '''
+    Reaps process with wait4 so that its resource usage, including that of
+    the descendants it waited for, is available. Returns the rusage, or
+    None if the process did not exit within the timeout (or had already
+    been reaped elsewhere).
+    '''
+    deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+    while process.returncode is None:
+        try:
+            (pid, status, rusage) = os.wait4(process.pid, 0 if deadline is None else os.WNOHANG)
+        except ChildProcessError:
+            process.wait()
+            return None
+        if pid != 0:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return rusage
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(REAP_POLL_SECONDS)
+    return None
+
+
+class ProgressWatchdog:
+    '''
+    Watches the stdout lines of a run for progress, e.g. the result line
+    printed as each test completes (every line counts if is_progress is
+    None). With a silence timeout, a run that makes no progress for that
+    long is treated as hung: silenced is set and the run is killed as if it
+    had timed out, rather than waiting for the overall timeout. Either way
+    the longest time the run went without progress, including start-up and
+    shut-down, is measured, so that an unmutated run can set the silence
+    timeout for mutant runs of the same tests.
+
+    A watchdog is used for a single run.
+    '''
+
+    def __init__(self, is_progress: Callable[[str], bool] = None,
+                 silence_timeout_seconds: Optional[float] = None):
+        self.is_progress: Optional[Callable[[str], bool]] = is_progress
+        self.silence_timeout_seconds: Optional[float] = silence_timeout_seconds
+        self.progress_lines: int = 0
+        self.longest_silence: float = 0.0
+        self.silenced: bool = False
+        self._last_progress: float = time.monotonic()
+
+    def start(self) -> None:
+        self._last_progress = time.monotonic()
+
+    def _progress(self) -> None:
+        now = time.monotonic()
+        self.longest_silence = max(self.longest_silence, now - self._last_progress)
+        self._last_progress = now
+
+    def observe(self, line: str) -> None:
+        if self.is_progress is None or self.is_progress(line):
+            self.progress_lines += 1
+            self._progress()
+
+    def finish(self) -> None:
+        '''
+        Called when the run's output ends, to count the silence since the
+        last progress.
+        '''
+        self._progress()
+
+    def remaining(self) -> Optional[float]:
+        '''
+        Seconds until the run counts as silent, or None without a silence
+        timeout.
+        '''
+        if self.silence_timeout_seconds is None:
+            return None
+        return max(0.0, self._last_progress + self.silence_timeout_seconds - time.monotonic())
+
+
+def get_remaining_time(deadline: Optional[float], watchdog: Optional[ProgressWatchdog]) -> Optional[float]:
+    remaining = None if deadline is None else deadline - time.monotonic()
+    silence_remaining = None if watchdog is None else watchdog.remaining()
+    if silence_remaining is not None and (remaining is None or silence_remaining < remaining):
+        return silence_remaining
+    return remaining
+
+
+class BoundedCapture:
+    '''
+    Keeps the first limit bytes of a stream in memory (all of it if limit
+    is None). Anything beyond the limit is appended to a gzip-compressed
+    spool file if one is given, and otherwise only counted.
+    '''
+
+    def __init__(self, limit: Optional[int], spool_path: Optional[Path] = None):
+        self.limit: Optional[int] = limit
+        self.spool_path: Optional[Path] = spool_path
+        self.data = bytearray()
+        self.overflow_bytes: int = 0
+        self._spool = None
+
+    def write(self, chunk: bytes) -> None:
+        if self.limit is None:
+            self.data += chunk
+            return
+        space = self.limit - len(self.data)
+        if space > 0:
+            self.data += chunk[:space]
+            chunk = chunk[space:]
+        if not chunk:
+            return
+        self.overflow_bytes += len(chunk)
+        if self.spool_path is not None:
+            if self._spool is None:
+                self._spool = gzip.open(self.spool_path, 'wb')
+            self._spool.write(chunk)
+
+    def close(self) -> None:
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+    def spooled(self) -> Optional[Path]:
+        return self.spool_path if self.overflow_bytes and self.spool_path is not None else None
+
+
+class StreamingProcess:
+    '''
+    Runs a command in its own process group and yields its stdout line by
+    line as the output arrives, while stdout and stderr are captured up to a
+    bounded size. The whole process group can be terminated at any point,
+    e.g. as soon as the output seen so far decides the outcome.
+    '''
+
+    def __init__(self, cmd: List[str],
+                 env: Optional[Dict[AnyStr, AnyStr]] = None,
+                 cwd: Path = None,
+                 capture_limit_bytes: Optional[int] = DEFAULT_CAPTURE_LIMIT_BYTES,
+                 stdout_spool: Optional[Path] = None):
+        self.stdout_capture = BoundedCapture(capture_limit_bytes, stdout_spool)
+        self.stderr_capture = BoundedCapture(capture_limit_bytes)
+        self.timed_out: bool = False
+        self.stopped_early: bool = False
+        self.rusage = None
+        self.start_time: float = time.monotonic()
+        self.end_time: Optional[float] = None
+        self.process = subprocess.Popen(cmd,
+                                        start_new_session=True,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE,
+                                        env=env,
+                                        cwd=cwd)
+
+    def lines(self, timeout_seconds: Optional[float] = None,
+              watchdog: Optional[ProgressWatchdog] = None) -> Iterator[str]:
+        '''
+        Yields decoded stdout lines (including their line ending) until the
+        process closes its output. If the timeout expires first, or the
+        watchdog sees no progress within its silence timeout, the process
+        group is killed and timed_out is set.
+        '''
+        deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+        if watchdog is not None:
+            watchdog.start()
+        selector = selectors.DefaultSelector()
+        selector.register(self.process.stdout, selectors.EVENT_READ, self.stdout_capture)
+        selector.register(self.process.stderr, selectors.EVENT_READ, self.stderr_capture)
+        pending = b''
+        reaped_session = False
+
+        try:
+            while selector.get_map():
+                remaining = get_remaining_time(deadline, watchdog)
+                if remaining is not None and remaining <= 0:
+                    if watchdog is not None and watchdog.remaining() == 0.0:
+                        watchdog.silenced = True
+                    self.timed_out = True
+                    self.terminate()
+                    return
+
+                # Wake up periodically: processes left behind by the command can hold its output open
+                # after it has exited, and are killed so that the output ends
+                events = selector.select(timeout=EXIT_POLL_SECONDS if remaining is None
+                                         else min(remaining, EXIT_POLL_SECONDS))
+                if not events and self._exited():
+                    if reaped_session:
+                        # Held open by something outside the session; stop waiting for it
+                        break
+                    reap_session(self.process.pid)
+                    reaped_session = True
+
+                for (key, _) in events:
+                    chunk = os.read(key.fd, READ_CHUNK_SIZE)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                        continue
+                    key.data.write(chunk)
+                    if key.data is not self.stdout_capture:
+                        continue
+                    pending += chunk
+                    *complete, pending = pending.split(b'\n')
+                    for line in complete:
+                        line = (line + b'\n').decode('utf-8', errors='replace')
+                        if watchdog is not None:
+                            watchdog.observe(line)
+                        yield line
+
+            if pending:
+                pending = pending.decode('utf-8', errors='replace')
+                if watchdog is not None:
+                    watchdog.observe(pending)
+                yield pending
+            if watchdog is not None:
+                watchdog.finish()
+        finally:
+            selector.close()
+
+    def _exited(self) -> bool:
+        '''
+        True once the process has exited, without reaping it, so that its
+        resource usage can still be collected.
+        '''
+        return wait_for_exit(self.process, 0)
+
+    def _reap(self, timeout_seconds: Optional[float] = None) -> bool:
+        '''
+        Waits up to timeout_seconds for the process to exit, kills whatever
+        it left in its session and then reaps it.
+        '''
+        if self.process.returncode is None:
+            if not wait_for_exit(self.process, timeout_seconds):
+                return False
+            # Until the leader is reaped its pid, and so the session id, cannot name another process
+            reap_session(self.process.pid)
+            rusage = wait_with_rusage(self.process)
+            if rusage is not None:
+                self.rusage = rusage
+                self.end_time = time.monotonic()
+        return self.process.returncode is not None
+
+    def terminate(self) -> None:
+        '''
+        Terminates the process group, escalating to SIGKILL if it does not
+        exit within the grace period.
+        '''
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        if self._reap(TERMINATE_GRACE_SECONDS):
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self._reap()
+
+    def result(self, timeout_seconds: Optional[float] = None) -> Optional[ProcessResult]:
+        '''
+        Waits for the process and returns its result, or None if it timed out.
+        Any processes it left behind are killed.
+        '''
+        if not self._reap(timeout_seconds):
+            self.timed_out = True
+            self.terminate()
+        self.process.stdout.close()
+        self.process.stderr.close()
+        self.stdout_capture.close()
+        self.stderr_capture.close()
+
+        if self.timed_out:
+            return None
+        result = ProcessResult(returncode=self.process.returncode,
+                               stdout=bytes(self.stdout_capture.data),
+                               stderr=bytes(self.stderr_capture.data),
+                               stopped_early=self.stopped_early,
+                               stdout_spool=self.stdout_capture.spooled())
+        if self.rusage is not None:
+            result.set_rusage(self.end_time - self.start_time, self.rusage)
+        return result
+
+
+def run_process_streaming(cmd: List[str],
+                          timeout_seconds: Optional[float],
+                          env: Optional[Dict[AnyStr, AnyStr]] = None,
+                          cwd: Path = None,
+                          stop_predicate: Callable[[str], bool] = None,
+                          capture_limit_bytes: Optional[int] = DEFAULT_CAPTURE_LIMIT_BYTES,
+                          stdout_spool: Optional[Path] = None,
+                          watchdog: Optional[ProgressWatchdog] = None,
+                          on_line: Callable[[str], None] = None) -> Optional[ProcessResult]:
+    '''
+    Like run_process_with_timeout, but stdout is passed line by line to
+    on_line and then to stop_predicate as it arrives. on_line only observes
+    the output (e.g. to record or time it). As soon as stop_predicate
+    returns True the whole process group is terminated and the result is
+    marked stopped_early. Output beyond capture_limit_bytes is not kept in
+    memory; stdout beyond the limit is spooled to stdout_spool (gzip) if
+    given.
+    Returns None on timeout, including when the watchdog finds the run
+    silent (watchdog.silenced tells the two apart).
+    '''
+    start_time = time.monotonic()
+    process = StreamingProcess(cmd, env=env, cwd=cwd,
+                               capture_limit_bytes=capture_limit_bytes,
+                               stdout_spool=stdout_spool)
     try:
-        process = subprocess.run(cmd,
-                                   start_new_session=True,
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE,
-                                   env=env,
-                                   cwd=cwd,
-                                   timeout=timeout_seconds)
-        return ProcessResult(returncode=process.returncode, stdout=process.stdout, stderr=process.stderr)
-    except subprocess.TimeoutExpired:
-        return None
+        for line in process.lines(timeout_seconds, watchdog):
+            if on_line is not None:
+                on_line(line)
+            if stop_predicate is not None and stop_predicate(line):
+                process.stopped_early = True
+                process.terminate()
+                break
+    except BaseException:
+        process.terminate()
+        raise
+
+    remaining = None if timeout_seconds is None else max(0.0, timeout_seconds - (time.monotonic() - start_time))
+    return process.result(remaining)
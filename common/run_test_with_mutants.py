@@ -1,15 +1,23 @@
 from enum import Enum
+import hashlib
 import os
 from pathlib import Path
-from typing import List
+from typing import Callable, List, Optional
 
-from common.run_process_with_timeout import ProcessResult, run_process_with_timeout
-from run.cts.utils import get_failures, get_single_tests_from_stdout
+from common.async_runner import AsyncExecutionEngine
+from common.constants import (MIN_SILENCE_TIMEOUT_FOR_MUTANT_EXECUTION, MIN_TIMEOUT_FOR_MUTANT_COMPILATION,
+                              MIN_TIMEOUT_FOR_MUTANT_EXECUTION, SILENCE_TIMEOUT_MULTIPLIER_FOR_MUTANT_EXECUTION,
+                              TIMEOUT_MULTIPLIER_FOR_MUTANT_COMPILATION, TIMEOUT_MULTIPLIER_FOR_MUTANT_EXECUTION)
+from common.cts_output import is_result_line, parse_result_line
+from common.run_process_with_timeout import ProcessResult, ProgressWatchdog
 
 class CTSKillStatus(Enum):
     SURVIVED = 1
     KILL_TEST_FAIL = 2
     TEST_TIMEOUT = 3
+    # Persistent worker runs only: a test hung past its deadline, or the worker could not be (re)started
+    KILL_TEST_TIMEOUT = 4
+    KILL_WORKER_CRASH = 5
 
 class KillStatus(Enum):
     SURVIVED_IDENTICAL = 1
@@ -21,32 +29,116 @@ class KillStatus(Enum):
     KILL_DIFFERENT_STDOUT = 7
     KILL_DIFFERENT_STDERR = 8
 
-def run_wgslsmith_test_with_mutants(mutants: List[int],
+def get_mutated_environment(mutants: List[int], env=None) -> dict:
+    # Copy so that concurrent runs never share (and overwrite) an environment
+    if env:
+        mutated_environment = dict(env)
+    else:
+        mutated_environment = os.environ.copy()
+    mutated_environment["DREDD_ENABLED_MUTATION"] = ','.join([str(m) for m in mutants])
+    return mutated_environment
+
+def get_adaptive_timeout(unmutated_time: float,
+                         minimum: float,
+                         multiplier: float,
+                         limit: Optional[float] = None,
+                         concurrency: int = 1) -> float:
+    '''
+    A multiple of the time taken without mutants, at least minimum and at
+    most limit (e.g. the configured timeout) if given. The time without
+    mutants is measured with the run on its own, so when up to concurrency
+    mutant runs share the machine it is scaled up by that many, so that a
+    run slowed only by the others is not taken to have timed out.
+    '''
+    timeout = max(minimum, multiplier * unmutated_time * concurrency)
+    return timeout if limit is None else min(limit, timeout)
+
+def get_execution_timeout(unmutated_run_time: float,
+                          limit: Optional[float] = None,
+                          concurrency: int = 1) -> float:
+    return get_adaptive_timeout(unmutated_run_time,
+                                MIN_TIMEOUT_FOR_MUTANT_EXECUTION,
+                                TIMEOUT_MULTIPLIER_FOR_MUTANT_EXECUTION,
+                                limit,
+                                concurrency)
+
+def get_compilation_timeout(unmutated_run_time: float, limit: Optional[float] = None) -> float:
+    return get_adaptive_timeout(unmutated_run_time,
+                                MIN_TIMEOUT_FOR_MUTANT_COMPILATION,
+                                TIMEOUT_MULTIPLIER_FOR_MUTANT_COMPILATION,
+                                limit)
+
+def get_silence_timeout(unmutated_longest_silence: float, concurrency: int = 1) -> float:
+    '''
+    How long a mutant run may go without progress before it is treated as
+    hung, from the longest the unmutated run of the same tests went without
+    progress.
+    '''
+    return get_adaptive_timeout(unmutated_longest_silence,
+                                MIN_SILENCE_TIMEOUT_FOR_MUTANT_EXECUTION,
+                                SILENCE_TIMEOUT_MULTIPLIER_FOR_MUTANT_EXECUTION,
+                                concurrency=concurrency)
+
+def get_mutant_stdout_spool(output_directory: Path, mutants: List[int]) -> Path:
+    '''
+    File to which the stdout of a run with the given mutants enabled is
+    spooled (gzip) beyond the capture limit; it is only created if the
+    output overflows. Batches are named by a hash of their mutants.
+    '''
+    if len(mutants) == 1:
+        name = str(mutants[0])
+    else:
+        name = 'batch_' + hashlib.sha1(','.join([str(m) for m in mutants]).encode('utf-8')).hexdigest()[:16]
+    return Path(output_directory, f'mutant_stdout_{name}.gz')
+
+def get_mutant_spool_info(mutated_result: Optional[ProcessResult]) -> Optional[str]:
+    # For kill info: the spooled stdout of the killing run, if it overflowed
+    if mutated_result is None or mutated_result.stdout_spool is None:
+        return None
+    return str(mutated_result.stdout_spool)
+
+def get_mutant_watchdog(is_progress: Callable[[str], bool],
+                        silence_timeout_seconds: Optional[float]) -> Optional[ProgressWatchdog]:
+    if silence_timeout_seconds is None:
+        return None
+    return ProgressWatchdog(is_progress, silence_timeout_seconds)
+
+async def run_wgslsmith_test_with_mutants_async(engine: AsyncExecutionEngine,
+                          mutants: List[int],
                           compiler_path: str,
                           compiler_args: List[str],
                           compile_time: float,
                           run_time: float,
                           execution_result_non_mutated: ProcessResult,
-                          mutant_exe_path: Path,
-                          env=None) -> tuple[KillStatus, ProcessResult]:
-    if env:
-        mutated_environment = env
-    else:
-        mutated_environment = os.environ.copy()
-    mutated_environment["DREDD_ENABLED_MUTATION"] = ','.join([str(m) for m in mutants])
-    
-    if mutant_exe_path.exists():
-        os.remove(mutant_exe_path)
-    
+                          env=None,
+                          silence_timeout_seconds: Optional[float] = None,
+                          stdout_spool: Optional[Path] = None) -> tuple[KillStatus, ProcessResult]:
+    mutated_environment = get_mutated_environment(mutants, env)
+
     mutated_cmd = [compiler_path] + compiler_args
 
-    mutated_result: ProcessResult = run_process_with_timeout(
+    # The harness compiles and runs the program in one process, so the unmutated
+    # run time covers both; the compile time allowed is an upper bound. The
+    # unmutated run is made alone, but mutant runs share the machine
+    watchdog = get_mutant_watchdog(None, silence_timeout_seconds)
+    mutated_result: ProcessResult = await engine.run_process(
             cmd = mutated_cmd,
-            timeout_seconds=compile_time,
-            env=mutated_environment)
-    
+            timeout_seconds=get_execution_timeout(run_time, limit=compile_time, concurrency=engine.max_in_flight),
+            env=mutated_environment,
+            stdout_spool=stdout_spool,
+            watchdog=watchdog)
+
+    return get_wgslsmith_kill_status(mutated_result, execution_result_non_mutated,
+                                     silenced=watchdog is not None and watchdog.silenced)
+
+def get_wgslsmith_kill_status(mutated_result: ProcessResult,
+                          execution_result_non_mutated: ProcessResult,
+                          silenced: bool = False) -> tuple[KillStatus, ProcessResult]:
 
     if mutated_result is None:
+        # Killed by the watchdog: the program hung rather than the compiler running slowly
+        if silenced:
+            return (KillStatus.KILL_RUNTIME_TIMEOUT, None)
         return (KillStatus.KILL_COMPILER_TIMEOUT, None)
 
     if mutated_result.returncode != 0:
@@ -77,41 +169,69 @@ def run_wgslsmith_test_with_mutants(mutants: List[int],
     
     return (KillStatus.SURVIVED_IDENTICAL, mutated_result)
 
-def run_webgpu_cts_test_with_mutants(mutants: List[int],
+def get_unmutated_reliable_passes(unmutated_results : dict[str, str], reliable_tests) -> set[str]:
+    '''
+    Tests that passed with unmutated Dawn and are known to pass reliably.
+    Only a failure of one of these kills a mutant, so this is computed once
+    per query and shared by all mutant runs for it. reliable_tests should
+    support fast membership tests (a set or a ReliableTestIndex).
+    '''
+    return set([test for (test,status) in unmutated_results.items() if status=='pass' and test in reliable_tests])
+
+class CTSFailureCheck:
+    '''
+    Checks streamed CTS output for tests that passed reliably with
+    unmutated Dawn but fail with the mutants enabled, stopping the run at
+    the first such failure.
+    '''
+    def __init__(self, unmutated_reliable_pass : set[str]):
+        self.unmutated_reliable_pass = unmutated_reliable_pass
+        self.mutated_fail = set()
+
+    def reliable_test_failed(self, line : str) -> bool:
+        result = parse_result_line(line)
+        if result is None or result.status != 'fail':
+            return False
+        if result.test not in self.unmutated_reliable_pass:
+            return False
+        self.mutated_fail.add(result.test)
+        return True
+
+    def kill_status(self, mutated_result : ProcessResult) -> tuple[CTSKillStatus, list, ProcessResult]:
+        # The mutated result is passed on so that callers can record its resource usage
+        if len(self.mutated_fail) != 0:
+            return (CTSKillStatus.KILL_TEST_FAIL, self.mutated_fail, mutated_result)
+
+        if mutated_result is None:
+            return (CTSKillStatus.TEST_TIMEOUT, [], None)
+
+        return (CTSKillStatus.SURVIVED, [], mutated_result)
+
+async def run_webgpu_cts_test_with_mutants_async(engine: AsyncExecutionEngine,
+                          mutants: List[int],
                           mutated_cmd : str,
                           timeout_seconds : int,
-                          unmutated_results : dict[str, str],
-                          reliable_tests : list[str],
-                          env = None) -> tuple[CTSKillStatus, list]:
-
-    if env:
-        mutated_environment = env
-    else:
-        mutated_environment = os.environ.copy()
-    mutated_environment["DREDD_ENABLED_MUTATION"] = ','.join([str(m) for m in mutants])
-    
-    mutated_result: ProcessResult = run_process_with_timeout(
-            cmd = mutated_cmd,
-            env=mutated_environment,
-            timeout_seconds=timeout_seconds)
+                          unmutated_reliable_pass : set[str],
+                          env = None,
+                          silence_timeout_seconds : Optional[float] = None,
+                          stdout_spool : Optional[Path] = None) -> tuple[CTSKillStatus, list, ProcessResult]:
 
-    if mutated_result is None:
-        return (CTSKillStatus.TEST_TIMEOUT, [])
-    
-    # Check test results against unmutated test results
-    # If any previously passing test fails, then the mutant is killed
-    mutated_results = get_single_tests_from_stdout(mutated_result.stdout.decode('utf-8').split('\n'))
+    mutated_environment = get_mutated_environment(mutants, env)
 
-    mutated_fail = set([test for (test,status) in mutated_results.items() if status=='fail'])
+    # Check test results against unmutated test results as the output streams in
+    # If any previously passing test fails, then the mutant is killed and the run is stopped
+    check = CTSFailureCheck(unmutated_reliable_pass)
 
-    unmutated_pass = set([test for (test,status) in unmutated_results.items() if status=='pass'])
-
-    unmutated_reliable_pass = unmutated_pass.intersection(set(reliable_tests))
-
-    if len(unmutated_reliable_pass.intersection(mutated_fail)) != 0:
-        return (CTSKillStatus.KILL_TEST_FAIL, unmutated_reliable_pass.intersection(mutated_fail))
+    # A run in which no test completes within the silence timeout is hung and is stopped as a timeout
+    mutated_result: ProcessResult = await engine.run_process(
+            cmd = mutated_cmd,
+            env=mutated_environment,
+            timeout_seconds=timeout_seconds,
+            stop_predicate=check.reliable_test_failed,
+            stdout_spool=stdout_spool,
+            watchdog=get_mutant_watchdog(is_result_line, silence_timeout_seconds))
 
-    return (CTSKillStatus.SURVIVED, [])
+    return check.kill_status(mutated_result)
 
 def get_wgslsmith_output(stdout) -> list[int]:
     
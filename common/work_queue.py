@@ -0,0 +1,230 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+DEFAULT_LEASE_SECONDS: float = 300.0
+DEFAULT_MAX_ATTEMPTS: int = 3
+BUSY_TIMEOUT_SECONDS: float = 60.0
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def get_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class WorkItem:
+    def __init__(self, key: str, payload: dict, attempts: int):
+        self.key: str = key
+        self.payload: dict = payload
+        self.attempts: int = attempts
+
+
+class WorkQueue:
+    '''
+    Work queue shared by the kill processes on a node, kept in a SQLite
+    file so that it survives any one of them. Items are leased to a worker
+    for lease_seconds and the lease is renewed while the worker is alive
+    (see LeaseKeeper). Items whose lease expires, because their worker
+    crashed or hung, are handed out again; an item that has been leased
+    max_attempts times without completing is marked failed.
+    '''
+
+    def __init__(self, path: Path,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path: Path = Path(path)
+        self.lease_seconds: float = lease_seconds
+        self.max_attempts: int = max_attempts
+        self._connection = self._connect()
+        with self._connection:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS work_items (
+                    key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    worker TEXT,
+                    lease_expiry REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT
+                )''')
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can
+        # never lease the same item
+        self._connection.execute('BEGIN IMMEDIATE')
+        return self._connection
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def add_items(self, items: Dict[str, dict]) -> None:
+        '''
+        Adds items that are not already in the queue, so every worker can
+        add the same items at start-up.
+        '''
+        connection = self._transaction()
+        try:
+            connection.executemany('INSERT OR IGNORE INTO work_items (key, payload, state) VALUES (?, ?, ?)',
+                                   [(key, json.dumps(payload), PENDING) for (key, payload) in items.items()])
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _expire_leases(self, connection: sqlite3.Connection) -> None:
+        connection.execute('UPDATE work_items SET state = ?, worker = NULL WHERE state = ? AND lease_expiry < ? '
+                           'AND attempts >= ?', (FAILED, LEASED, time.time(), self.max_attempts))
+        connection.execute('UPDATE work_items SET state = ?, worker = NULL WHERE state = ? AND lease_expiry < ?',
+                           (PENDING, LEASED, time.time()))
+
+    def _lease_rows(self, connection: sqlite3.Connection, worker: str, rows) -> List[WorkItem]:
+        expiry = time.time() + self.lease_seconds
+        connection.executemany('UPDATE work_items SET state = ?, worker = ?, lease_expiry = ?, attempts = attempts + 1 '
+                               'WHERE key = ?', [(LEASED, worker, expiry, key) for (key, _, _) in rows])
+        return [WorkItem(key, json.loads(payload), attempts + 1) for (key, payload, attempts) in rows]
+
+    def lease(self, worker: str, limit: int = 1) -> List[WorkItem]:
+        '''
+        Leases up to limit pending items, in the order they were added.
+        '''
+        connection = self._transaction()
+        try:
+            self._expire_leases(connection)
+            rows = connection.execute('SELECT key, payload, attempts FROM work_items WHERE state = ? '
+                                      'ORDER BY rowid LIMIT ?', (PENDING, limit)).fetchall()
+            items = self._lease_rows(connection, worker, rows)
+            connection.execute('COMMIT')
+            return items
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def lease_keys(self, worker: str, keys: Iterable[str]) -> List[WorkItem]:
+        '''
+        Leases whichever of the given items are pending.
+        '''
+        keys = list(keys)
+        connection = self._transaction()
+        try:
+            self._expire_leases(connection)
+            rows = []
+            for key in keys:
+                rows.extend(connection.execute('SELECT key, payload, attempts FROM work_items WHERE key = ? '
+                                               'AND state = ?', (key, PENDING)).fetchall())
+            items = self._lease_rows(connection, worker, rows)
+            connection.execute('COMMIT')
+            return items
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def renew(self, worker: str) -> None:
+        with self._connection:
+            self._connection.execute('UPDATE work_items SET lease_expiry = ? WHERE state = ? AND worker = ?',
+                                     (time.time() + self.lease_seconds, LEASED, worker))
+
+    def complete(self, worker: str, key: str, result: dict) -> bool:
+        '''
+        Records the result of a leased item. Returns False if the lease had
+        been lost (the item was reassigned), in which case the result is
+        dropped.
+        '''
+        with self._connection:
+            cursor = self._connection.execute('UPDATE work_items SET state = ?, result = ?, worker = NULL '
+                                              'WHERE key = ? AND state = ? AND worker = ?',
+                                              (DONE, json.dumps(result), key, LEASED, worker))
+        return cursor.rowcount == 1
+
+    def release(self, worker: str, key: str) -> None:
+        '''
+        Returns a leased item to the queue without counting the attempt,
+        e.g. a mutant that survived one program but may be killed by another.
+        '''
+        with self._connection:
+            self._connection.execute('UPDATE work_items SET state = ?, worker = NULL, attempts = attempts - 1 '
+                                     'WHERE key = ? AND state = ? AND worker = ?', (PENDING, key, LEASED, worker))
+
+    def is_drained(self) -> bool:
+        '''
+        True once no item is pending or leased.
+        '''
+        connection = self._transaction()
+        try:
+            self._expire_leases(connection)
+            (count,) = connection.execute('SELECT COUNT(*) FROM work_items WHERE state IN (?, ?)',
+                                          (PENDING, LEASED)).fetchone()
+            connection.execute('COMMIT')
+            return count == 0
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def results(self) -> Dict[str, dict]:
+        rows = self._connection.execute('SELECT key, result FROM work_items WHERE state = ?', (DONE,)).fetchall()
+        return {key: json.loads(result) for (key, result) in rows}
+
+    def failed_keys(self) -> List[str]:
+        rows = self._connection.execute('SELECT key FROM work_items WHERE state = ?', (FAILED,)).fetchall()
+        return [key for (key,) in rows]
+
+
+class LeaseKeeper:
+    '''
+    Renews a worker's leases from a background thread while the worker is
+    alive. A crashed worker stops renewing, so its items are reassigned
+    once their leases expire.
+    '''
+
+    def __init__(self, queue: WorkQueue, worker: str):
+        self._queue_path: Path = queue.path
+        self._lease_seconds: float = queue.lease_seconds
+        self._worker: str = worker
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        # SQLite connections cannot be shared between threads
+        queue = WorkQueue(self._queue_path, lease_seconds=self._lease_seconds)
+        try:
+            while not self._stopped.wait(self._lease_seconds / 3):
+                queue.renew(self._worker)
+        finally:
+            queue.close()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+
+def drain(queue: WorkQueue, worker: str, limit: int = 1, wait_seconds: float = 10.0) -> Iterator[List[WorkItem]]:
+    '''
+    Leases up to limit items at a time until the queue is drained. While
+    other workers hold all remaining items this yields an empty list every
+    wait_seconds, so the caller can decide to stop, and picks up any items
+    whose leases expire.
+    '''
+    while True:
+        items = queue.lease(worker, limit)
+        if items:
+            yield items
+            continue
+        if queue.is_drained():
+            return
+        yield []
+        time.sleep(wait_seconds)
@@ -6,9 +6,14 @@ from pathlib import Path
 from random import sample
 import time
 
+from common.mutation_tree_cache import load_cached_mutation_tree
+from common.results_store import ResultsStore, import_output_directory
 from cts.utils import get_mutant_coverage
+from cts.query_catalogue import QueryCatalogue
+from cts.query_sharding import write_query_shards
 import wgslsmith.kill_mutants
 import cts.kill_mutants
+import cts.coverage_matrix
 
 def main():
 
@@ -46,6 +51,11 @@ def main():
 
     covered_mutants_path = Path(output_dir, '__dredd_covered_mutants')
     reliable_tests = Path(output_dir, 'reliable_tests.json')
+    coverage_matrix = Path(output_dir, 'coverage_matrix.json')
+    cts_work_queue = Path(output_dir, 'cts_work_queue.sqlite')
+    results_store = Path(output_dir, 'results.sqlite')
+    query_runtimes = Path(output_dir, 'query_runtimes.sqlite')
+    wgslsmith_work_queue = Path(output_dir, 'wgslsmith_work_queue.sqlite')
     query = 'webgpu:*'
     #query = 'webgpu:shader,execution,flow_control,*' # CTS query to use
 
@@ -57,7 +67,10 @@ def main():
     cts_killing_completed : bool = True # param to select whether cts mutant killing has already been completed
     delete_covered_mutants_path : bool = False # param to select whether we refresh the covered mutants path
     n_processes = 1 # param for number of processes to run in parallel for mutant killing
+    batch_size = 1 # param for max number of compatible mutants to enable together in a single test run
+    max_in_flight = 1 # param for max number of mutant runs each process keeps executing concurrently
     sampling = True # param to choose to select a sample of mutants to kill
+    targeted = False # param to run each sampled mutant only against the CTS queries that cover it (uses a coverage matrix)
     get_mutants_covered_by_wgslsmith = True # param to get a list of mutants covered by 50 wgslsmith tests, so we target mutants with the cts
     # that are likely to be killable by wgslsmith (to avoid finding a bunch of surviving mutants that aren't even covered by wgslsmith)
 
@@ -99,6 +112,16 @@ def main():
         build_wgslsmith(wgslsmith_mutated, dawn_mutated)
         build_wgslsmith(wgslsmith_coverage, dawn_coverage)
 
+    # Populate the mutation tree caches up front so that the kill processes
+    # map the cached trees instead of each parsing the mutation info files
+    load_cached_mutation_tree(mutation_info_file)
+    load_cached_mutation_tree(mutation_info_file_for_coverage)
+
+    # Bring results from earlier runs into the results store, which the kill processes use to look up kills
+    if not results_store.exists() and output_dir.exists():
+        with ResultsStore(results_store) as store:
+            import_output_directory(store, output_dir)
+
     wgslsmith_args =[str(mutation_info_file),
             str(mutation_info_file_for_coverage),
             f'{str(wgslsmith_mutated)}/target/release/wgslsmith',
@@ -113,6 +136,12 @@ def main():
             vk_icd,
             '--dawn_vk',
             dawn_vk,
+            '--batch_size',
+            str(batch_size),
+            '--max_in_flight',
+            str(max_in_flight),
+            '--results_store',
+            str(results_store),
         ]
     
     # Option 1: Kill uncovered mutants
@@ -215,11 +244,33 @@ def main():
                     vk_icd,
                     '--reliable_tests',
                     str(reliable_tests),
+                    '--batch_size',
+                    str(batch_size),
+                    '--max_in_flight',
+                    str(max_in_flight),
+                    '--results_store',
+                    str(results_store),
+                    '--query_runtimes',
+                    str(query_runtimes),
             ]
 
             if sampling:
                 cts_args.append('--mutant_sample')
                 cts_args.extend(mutant_sample)
+
+            if targeted:
+                if not coverage_matrix.exists():
+                    print('Collecting per-query CTS mutant coverage...')
+                    cts.coverage_matrix.main([str(dawn_coverage),
+                        str(cts_repo),
+                        str(coverage_matrix),
+                        '--query',
+                        query,
+                        '--vk_icd',
+                        vk_icd,
+                        '--max_in_flight',
+                        str(max_in_flight)])
+                cts_args.extend(['--coverage_matrix', str(coverage_matrix)])
             
             if not cts_killing_completed:
                 print('Killing mutants with the CTS...')
@@ -228,9 +279,23 @@ def main():
                     cts.kill_mutants.main(cts_args)
                 
                 elif n_processes > 1:
+                    if sampling:
+                        # The processes share the work through a queue rather than each running everything
+                        cts_args.extend(['--work_queue', str(cts_work_queue)])
+                        process_args = [cts_args] * n_processes
+                    else:
+                        # Each process runs one shard of the file-level queries, balanced by their recorded runtimes
+                        shard_files = write_query_shards(QueryCatalogue(cts_repo).file_queries(query),
+                                                         query_runtimes,
+                                                         n_processes,
+                                                         output_dir)
+                        query_source = cts_args.index('arg')
+                        process_args = [cts_args[:query_source] + ['file'] + cts_args[query_source + 1:]
+                                        + ['--query_file', str(shard_file)] for shard_file in shard_files]
+
                     cts_processes = []
-                    for i in range(n_processes):
-                        p = multiprocessing.Process(target=cts.kill_mutants.main, args=((cts_args,)))
+                    for args in process_args:
+                        p = multiprocessing.Process(target=cts.kill_mutants.main, args=((args,)))
                         cts_processes.append(p)
                         p.start()
 
@@ -244,7 +309,7 @@ def main():
 
         print('Killing surviving mutants with WGSLsmith...')
 
-        mutants_to_kill = get_surviving_mutants(output_dir)
+        mutants_to_kill = get_surviving_mutants(results_store)
 
         wgslsmith_args.extend(['--mutants_to_kill',
             ','.join([str(m) for m in mutants_to_kill])])
@@ -253,6 +318,7 @@ def main():
             wgslsmith.kill_mutants.main(wgslsmith_args)
 
         elif n_processes > 1:
+            wgslsmith_args.extend(['--work_queue', str(wgslsmith_work_queue)])
             processes = []
             for i in range(n_processes):
                 p = multiprocessing.Process(target=wgslsmith.kill_mutants.main, args=((wgslsmith_args,)))
@@ -262,11 +328,10 @@ def main():
             for p in processes:
                 p.join()
 
-def get_surviving_mutants(output_dir : Path) -> list[int]:
-    
-    with open(Path(output_dir, 'surviving_mutants.txt'),'r') as f:
-        data = f.read()
-        return data.split('\n')
+def get_surviving_mutants(results_store : Path) -> list[int]:
+
+    with ResultsStore(results_store) as store:
+        return store.surviving_mutants()
 
 
 def make_dawn_clean(mutated : Path, coverage : Path) -> bool :
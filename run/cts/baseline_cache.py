@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import time
+
+from pathlib import Path
+from typing import Dict, Optional
+
+BUSY_TIMEOUT_SECONDS: float = 60.0
+BASELINE_CACHE_FILE_NAME = 'baseline_cache.sqlite'
+
+
+class BaselineKey:
+    '''
+    Everything an unmutated run of a query depends on: the Dawn build (see
+    get_build_fingerprint), the CTS revision (see get_cts_revision), the
+    Vulkan driver (see get_icd_fingerprint) and the query itself.
+    '''
+    __slots__ = ('build', 'cts_revision', 'icd', 'query')
+
+    def __init__(self, build: str, cts_revision: str, icd: str, query: str):
+        self.build: str = build
+        self.cts_revision: str = cts_revision
+        self.icd: str = icd
+        self.query: str = query
+
+    def to_tuple(self) -> tuple:
+        return (self.build, self.cts_revision, self.icd, self.query)
+
+
+class UnmutatedBaseline:
+    def __init__(self,
+                 results: Dict[str, str],
+                 test_times: Dict[str, float],
+                 wall_time: float,
+                 longest_silence: Optional[float],
+                 resource_usage: Optional[dict]):
+        # Status of each test in the query (pass, fail or skip)
+        self.results: Dict[str, str] = results
+        # Seconds from the previous test result to each test's result
+        self.test_times: Dict[str, float] = test_times
+        self.wall_time: float = wall_time
+        self.longest_silence: Optional[float] = longest_silence
+        self.resource_usage: Optional[dict] = resource_usage
+
+
+class BaselineCache:
+    '''
+    Results of unmutated CTS runs, in a SQLite file that can be shared by
+    the kill processes of several campaigns. An entry is only found again
+    for the same build, CTS revision, driver and query, so a query is only
+    rerun unmutated when something its results depend on has changed.
+    '''
+
+    def __init__(self, path: Path):
+        self.path: Path = Path(path)
+        self._connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS baseline_results (
+                build TEXT NOT NULL,
+                cts_revision TEXT NOT NULL,
+                icd TEXT NOT NULL,
+                query TEXT NOT NULL,
+                results TEXT NOT NULL,
+                test_times TEXT NOT NULL,
+                wall_time REAL NOT NULL,
+                longest_silence REAL,
+                resource_usage TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (build, cts_revision, icd, query)
+            )''')
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'BaselineCache':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def record(self, key: BaselineKey, baseline: UnmutatedBaseline) -> None:
+        with self._connection:
+            self._connection.execute('''
+                INSERT OR REPLACE INTO baseline_results
+                    (build, cts_revision, icd, query, results, test_times, wall_time, longest_silence,
+                     resource_usage, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                key.to_tuple() + (json.dumps(baseline.results),
+                                  json.dumps(baseline.test_times),
+                                  baseline.wall_time,
+                                  baseline.longest_silence,
+                                  json.dumps(baseline.resource_usage),
+                                  time.time()))
+
+    def get(self, key: BaselineKey) -> Optional[UnmutatedBaseline]:
+        row = self._connection.execute('''
+            SELECT results, test_times, wall_time, longest_silence, resource_usage FROM baseline_results
+            WHERE build = ? AND cts_revision = ? AND icd = ? AND query = ?''', key.to_tuple()).fetchone()
+        if row is None:
+            return None
+        (results, test_times, wall_time, longest_silence, resource_usage) = row
+        return UnmutatedBaseline(json.loads(results), json.loads(test_times), wall_time, longest_silence,
+                                 json.loads(resource_usage))
+
+
+def get_default_baseline_cache_path(mutant_kill_path: Path) -> Path:
+    return Path(mutant_kill_path, BASELINE_CACHE_FILE_NAME)
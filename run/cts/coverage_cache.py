@@ -0,0 +1,103 @@
+import json
+import sqlite3
+import time
+
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from common.build_fingerprint import get_build_fingerprint, get_icd_fingerprint
+from run.cts.baseline_cache import BaselineKey
+from run.cts.query_catalogue import get_cts_revision
+
+BUSY_TIMEOUT_SECONDS: float = 60.0
+COVERAGE_CACHE_FILE_NAME = 'coverage_cache.sqlite'
+
+
+class CachedCoverage:
+    def __init__(self, covered: List[int], resource_usage: Optional[dict]):
+        self.covered: List[int] = covered
+        # Resource usage of the tracking run the coverage came from
+        self.resource_usage: Optional[dict] = resource_usage
+
+
+class CoverageCache:
+    '''
+    Mutants covered by each CTS query, as found by runs of the mutant
+    tracking build, in a SQLite file shared by the kill processes and by
+    campaigns using the same tracking build. Entries are keyed like
+    unmutated baselines (see BaselineKey), with the tracking build's
+    fingerprint as the build, so coverage is only collected again when the
+    tracking build, the CTS or the driver changes. Only complete tracking
+    runs are recorded, as a run that timed out may have missed mutants.
+    '''
+
+    def __init__(self, path: Path):
+        self.path: Path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS mutant_coverage (
+                build TEXT NOT NULL,
+                cts_revision TEXT NOT NULL,
+                icd TEXT NOT NULL,
+                query TEXT NOT NULL,
+                covered TEXT NOT NULL,
+                resource_usage TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (build, cts_revision, icd, query)
+            )''')
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'CoverageCache':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def record(self, key: BaselineKey, covered: Iterable[int], resource_usage: Optional[dict] = None) -> None:
+        with self._connection:
+            self._connection.execute('''
+                INSERT OR REPLACE INTO mutant_coverage
+                    (build, cts_revision, icd, query, covered, resource_usage, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                key.to_tuple() + (json.dumps(sorted(set(covered))), json.dumps(resource_usage), time.time()))
+
+    def get(self, key: BaselineKey) -> Optional[CachedCoverage]:
+        row = self._connection.execute('''
+            SELECT covered, resource_usage FROM mutant_coverage
+            WHERE build = ? AND cts_revision = ? AND icd = ? AND query = ?''', key.to_tuple()).fetchone()
+        if row is None:
+            return None
+        return CachedCoverage(json.loads(row[0]), json.loads(row[1]))
+
+
+class CoverageKeys:
+    '''
+    Makes the cache keys for tracking runs of one tracking build against one
+    CTS checkout and driver. The fingerprints are taken once, as hashing the
+    build is too slow to repeat for every query. No keys are made if the CTS
+    is not a git checkout, as its revision is then unknown.
+    '''
+
+    def __init__(self, tracking_path: Path, cts_repo: Path, vk_icd: Optional[str]):
+        self.cts_revision: Optional[str] = get_cts_revision(cts_repo)
+        self.build: Optional[str] = None
+        self.icd: Optional[str] = None
+        if self.cts_revision is None:
+            print('The CTS is not a git checkout, so mutant coverage is not cached')
+            return
+        self.build = get_build_fingerprint(tracking_path)
+        self.icd = get_icd_fingerprint(vk_icd)
+
+    def key(self, query: str) -> Optional[BaselineKey]:
+        if self.cts_revision is None:
+            return None
+        return BaselineKey(self.build, self.cts_revision, self.icd, query)
+
+
+def get_default_coverage_cache_path(tracking_path: Path) -> Path:
+    # Kept with the tracking build, so every campaign using the build shares it
+    return Path(tracking_path, 'out', COVERAGE_CACHE_FILE_NAME)
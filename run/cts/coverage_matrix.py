@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import tempfile
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+from common.async_runner import AsyncExecutionEngine
+from common.run_process_with_timeout import ProcessResult
+from run.cts.coverage_cache import CoverageCache, CoverageKeys, get_default_coverage_cache_path
+from run.cts.query_catalogue import QueryCatalogue
+
+MATRIX_VERSION = 1
+
+
+def read_covered_mutants(tracking_file: Path) -> Set[int]:
+    '''
+    Reads a Dredd mutant tracking file. Mutant ids are whitespace
+    separated; some lines hold more than one id.
+    '''
+    with open(tracking_file, 'r') as f:
+        return set([int(mutant) for mutant in f.read().split()])
+
+
+class CoverageMatrix:
+    '''
+    Records which mutants are covered by which CTS queries (leaf queries or
+    individual tests), so that a mutant only needs to be run against the
+    queries that cover it. Each query's covered mutants are stored as a
+    sorted list; the inverse mapping is built on load.
+    '''
+
+    def __init__(self, coverage: Dict[str, Iterable[int]]):
+        self.queries: List[str] = sorted(coverage)
+        self.covered: List[List[int]] = [sorted(set(coverage[query])) for query in self.queries]
+        self._queries_for_mutant: Dict[int, List[int]] = {}
+        for (query_index, mutants) in enumerate(self.covered):
+            for mutant in mutants:
+                self._queries_for_mutant.setdefault(mutant, []).append(query_index)
+
+    def mutants_covered_by(self, query: str) -> List[int]:
+        return self.covered[self.queries.index(query)]
+
+    def queries_covering(self, mutant: int) -> List[str]:
+        return [self.queries[i] for i in self._queries_for_mutant.get(mutant, [])]
+
+    def queries_covering_any(self, mutants: Iterable[int]) -> List[str]:
+        query_indices = set()
+        for mutant in mutants:
+            query_indices.update(self._queries_for_mutant.get(mutant, []))
+        return [self.queries[i] for i in sorted(query_indices)]
+
+    def covered_mutants(self) -> List[int]:
+        return sorted(self._queries_for_mutant)
+
+    def save(self, matrix_file: Path) -> None:
+        matrix_file = Path(matrix_file)
+        (fd, temp_path) = tempfile.mkstemp(dir=matrix_file.parent, prefix=matrix_file.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"version": MATRIX_VERSION,
+                           "queries": self.queries,
+                           "covered": self.covered}, f)
+            os.replace(temp_path, matrix_file)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, matrix_file: Path) -> 'CoverageMatrix':
+        with open(matrix_file, 'r') as f:
+            data = json.load(f)
+        assert data["version"] == MATRIX_VERSION, f'Unsupported coverage matrix version in {matrix_file}'
+        return cls(dict(zip(data["queries"], data["covered"])))
+
+
+def read_partial_coverage(partial_file: Path) -> Dict[str, List[int]]:
+    '''
+    Reads the per-query results recorded so far by collect_coverage_matrix,
+    ignoring a final line left incomplete by an interrupted run.
+    '''
+    coverage = {}
+    if not Path(partial_file).exists():
+        return coverage
+    with open(partial_file, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            coverage[entry["query"]] = entry["covered"]
+    return coverage
+
+
+def collect_coverage_matrix(queries: List[str],
+                            tracking_path: Path,
+                            cts_repo: Path,
+                            work_dir: Path,
+                            vk_icd: str = '',
+                            timeout_seconds: int = None,
+                            max_in_flight: int = 1,
+                            coverage_cache: CoverageCache = None) -> CoverageMatrix:
+    '''
+    Runs each query with mutant tracking Dawn, each with its own
+    DREDD_MUTANT_TRACKING_FILE, to find the mutants it covers. Results are
+    appended to work_dir/partial_coverage.jsonl as each query completes, so
+    an interrupted collection resumes where it stopped. Queries found in
+    coverage_cache are not run, and complete runs are added to it.
+    '''
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    partial_file = Path(work_dir, 'partial_coverage.jsonl')
+
+    coverage = read_partial_coverage(partial_file)
+    coverage_keys = None if coverage_cache is None else CoverageKeys(tracking_path, cts_repo, vk_icd)
+    if coverage_keys is not None:
+        cached_queries = 0
+        for query in queries:
+            key = coverage_keys.key(query)
+            cached = None if query in coverage or key is None else coverage_cache.get(key)
+            if cached is not None:
+                coverage[query] = cached.covered
+                cached_queries += 1
+        print(f'Using cached coverage for {cached_queries} queries')
+
+    queries_to_run = [query for query in queries if query not in coverage]
+    print(f'Collecting coverage for {len(queries_to_run)} of {len(queries)} queries')
+
+    engine = AsyncExecutionEngine(max_in_flight)
+
+    async def run_query(query_index: int) -> ProcessResult:
+        query = queries_to_run[query_index]
+        tracking_file = Path(work_dir, f'tracking_{query_index}.txt')
+        if tracking_file.exists():
+            os.remove(tracking_file)
+
+        tracking_environment = os.environ.copy()
+        tracking_environment["DREDD_MUTANT_TRACKING_FILE"] = str(tracking_file)
+        tracking_environment["VK_ICD_FILENAMES"] = f'{vk_icd}'
+        tracking_cmd = [f'{tracking_path}/tools/run',
+                'run-cts',
+                '--verbose',
+                f'--bin={tracking_path}/out/Debug',
+                f'--cts={cts_repo}',
+                query]
+
+        return await engine.run_process(cmd=tracking_cmd,
+                                        timeout_seconds=timeout_seconds,
+                                        env=tracking_environment)
+
+    try:
+        with open(partial_file, 'a') as partial:
+            for (query_index, result) in engine.map_unordered(run_query, range(len(queries_to_run))):
+                query = queries_to_run[query_index]
+                tracking_file = Path(work_dir, f'tracking_{query_index}.txt')
+
+                # A query that timed out still covers the mutants it reached
+                covered = read_covered_mutants(tracking_file) if tracking_file.exists() else set()
+                if tracking_file.exists():
+                    os.remove(tracking_file)
+                if result is None:
+                    print(f'Coverage run timed out for query {query}')
+
+                print(f'Query {query} covers {len(covered)} mutants')
+                coverage[query] = sorted(covered)
+                key = None if coverage_keys is None else coverage_keys.key(query)
+                if key is not None and result is not None:
+                    coverage_cache.record(key, covered, result.resource_usage())
+                partial.write(json.dumps({"query": query,
+                                          "covered": coverage[query],
+                                          "timed_out": result is None}) + '\n')
+                partial.flush()
+    finally:
+        engine.close()
+
+    return CoverageMatrix({query: coverage[query] for query in queries if query in coverage})
+
+
+def main(raw_args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tracking_path",
+                        help="Path to the Dawn checkout instrumented to track mutant coverage.",
+                        type=Path)
+    parser.add_argument("cts_repo",
+                        help="Path to a checkout of the WebGPU CTS.",
+                        type=Path)
+    parser.add_argument("coverage_matrix",
+                        help="File in which to save the query to covered mutants matrix.",
+                        type=Path)
+    parser.add_argument("--query",
+                        default='webgpu:*',
+                        type=str,
+                        help="Base query; coverage is collected separately for each leaf (file-level) query "
+                             "under it.")
+    parser.add_argument("--query_file",
+                        default=None,
+                        type=Path,
+                        help="Optional json list of queries (e.g. individual tests) to collect coverage for "
+                             "instead of the leaf queries under --query.")
+    parser.add_argument("--query_catalogue",
+                        default=None,
+                        type=Path,
+                        help="Cached listing of the CTS queries (see run/cts/query_catalogue.py). Defaults to "
+                             "out/query_catalogue.json in the CTS repo.")
+    parser.add_argument("--vk_icd",
+                        default='',
+                        type=str,
+                        help="Value to set VK_ICD_FILENAMES environment variable, which specifies a particular GPU driver.")
+    parser.add_argument("--timeout",
+                        default=None,
+                        help="Time in seconds to allow for each query.",
+                        type=int)
+    parser.add_argument("--max_in_flight",
+                        default=1,
+                        help="Maximum number of queries to run concurrently. Default is 1.",
+                        type=int)
+    parser.add_argument("--coverage_cache",
+                        default=None,
+                        type=Path,
+                        help="SQLite cache of the mutants covered by each query, keyed by the tracking build, CTS "
+                             "revision and Vulkan driver. Defaults to out/coverage_cache.sqlite in tracking_path.")
+    args = parser.parse_args(raw_args)
+
+    if args.query_file is not None:
+        with open(args.query_file, 'r') as f:
+            queries = json.load(f)
+    else:
+        queries = QueryCatalogue(args.cts_repo, args.query_catalogue).file_queries(args.query)
+
+    work_dir = Path(args.coverage_matrix.parent, f'{args.coverage_matrix.stem}_work')
+    coverage_cache = CoverageCache(args.coverage_cache if args.coverage_cache is not None
+                                   else get_default_coverage_cache_path(args.tracking_path))
+    matrix = collect_coverage_matrix(queries,
+                                     args.tracking_path,
+                                     args.cts_repo,
+                                     work_dir,
+                                     vk_icd=args.vk_icd,
+                                     timeout_seconds=args.timeout,
+                                     max_in_flight=args.max_in_flight,
+                                     coverage_cache=coverage_cache)
+    matrix.save(args.coverage_matrix)
+
+    print(f'{len(matrix.covered_mutants())} mutants are covered by {len(matrix.queries)} queries')
+
+    return matrix
+
+
+if __name__ == '__main__':
+    main()
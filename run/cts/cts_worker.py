@@ -0,0 +1,250 @@
+import json
+import os
+import selectors
+import signal
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+from typing import AnyStr, Callable, Dict, List, Optional
+
+from common.process_reaper import reap_session
+from common.run_process_with_timeout import READ_CHUNK_SIZE, TERMINATE_GRACE_SECONDS, wait_for_exit
+
+WORKER_SERVER_SCRIPT: Path = Path(__file__).parent / 'cts_worker_server.py'
+WORKER_START_TIMEOUT_SECONDS: float = 120.0
+# Status given by run_tests_to_completion to a test that the worker hung on
+TIMEOUT_STATUS = 'timeout'
+
+# Protocol, one JSON object per line:
+#   worker -> client  {"ready": true}                          once started
+#   client -> worker  {"id": n, "tests": [test, ...]}          run individual CTS tests
+#   worker -> client  {"id": n, "test": test, "status": s}     per test, s is pass/fail/skip
+#   worker -> client  {"id": n, "done": true}                  after the last test
+# The worker exits when its stdin is closed.
+
+
+class RestartPolicy:
+    '''
+    Allows a worker to be restarted after a crash or timeout at most
+    max_restarts times within window_seconds.
+    '''
+
+    def __init__(self, max_restarts: int = 5, window_seconds: float = 600.0):
+        self.max_restarts: int = max_restarts
+        self.window_seconds: float = window_seconds
+        self._restart_times: List[float] = []
+
+    def allow_restart(self) -> bool:
+        now = time.monotonic()
+        self._restart_times = [t for t in self._restart_times if now - t < self.window_seconds]
+        if len(self._restart_times) >= self.max_restarts:
+            return False
+        self._restart_times.append(now)
+        return True
+
+
+class WorkerResult:
+    def __init__(self):
+        self.statuses: Dict[str, str] = {}
+        self.crashed: bool = False
+        self.timed_out: bool = False
+        self.stopped_early: bool = False
+        # The test that was running when the worker crashed or timed out
+        self.interrupted_test: Optional[str] = None
+
+
+def get_cts_worker_cmd(dawn_path: Path, cts_repo: Path) -> List[str]:
+    return [sys.executable, str(WORKER_SERVER_SCRIPT),
+            '--dawn_path', str(dawn_path),
+            '--cts_repo', str(cts_repo)]
+
+
+class CTSWorker:
+    '''
+    Client for a long-lived CTS worker process, so that Node start-up,
+    TypeScript loading and Dawn adapter creation are paid once for many
+    tests run in the same environment (e.g. with the same mutants
+    enabled). The worker is started on first use and restarted after a
+    crash or timeout, subject to the restart policy.
+    '''
+
+    def __init__(self, cmd: List[str],
+                 env: Optional[Dict[AnyStr, AnyStr]] = None,
+                 cwd: Path = None,
+                 restart_policy: RestartPolicy = None):
+        self.cmd: List[str] = cmd
+        self.env = env
+        self.cwd = cwd
+        self.restart_policy: RestartPolicy = restart_policy if restart_policy is not None else RestartPolicy()
+        self.process: Optional[subprocess.Popen] = None
+        self._pending: bytes = b''
+        self._next_id: int = 0
+        self._needs_restart: bool = False
+
+    def __enter__(self) -> 'CTSWorker':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _start(self) -> None:
+        if self._needs_restart and not self.restart_policy.allow_restart():
+            raise RuntimeError(f'CTS worker restarted too often: {" ".join(self.cmd)}')
+        self._needs_restart = False
+        self._pending = b''
+        self.process = subprocess.Popen(self.cmd,
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        env=self.env,
+                                        cwd=self.cwd,
+                                        start_new_session=True)
+        message = self._read_message(time.monotonic() + WORKER_START_TIMEOUT_SECONDS)
+        if message is None or not message.get("ready"):
+            self._kill()
+            self._needs_restart = True
+            raise RuntimeError(f'CTS worker failed to start: {" ".join(self.cmd)}')
+
+    def _kill(self) -> None:
+        if self.process is None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            if not wait_for_exit(self.process, TERMINATE_GRACE_SECONDS):
+                os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        # Swept before the worker is reaped, while its pid still names the session
+        wait_for_exit(self.process)
+        reap_session(self.process.pid)
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+        self.process = None
+
+    def stop(self) -> None:
+        '''
+        Asks the worker to exit by closing its stdin, killing it if it does
+        not.
+        '''
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        wait_for_exit(self.process, TERMINATE_GRACE_SECONDS)
+        self._kill()
+
+    def _read_message(self, deadline: Optional[float]) -> Optional[dict]:
+        '''
+        Returns the next message, or None if the worker closed its output
+        or the deadline passed (distinguished by the caller via the clock).
+        '''
+        while True:
+            while b'\n' not in self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                with selectors.DefaultSelector() as selector:
+                    selector.register(self.process.stdout, selectors.EVENT_READ)
+                    if not selector.select(timeout=remaining):
+                        return None
+                chunk = os.read(self.process.stdout.fileno(), READ_CHUNK_SIZE)
+                if not chunk:
+                    return None
+                self._pending += chunk
+            (line, self._pending) = self._pending.split(b'\n', 1)
+            try:
+                return json.loads(line)
+            except ValueError:
+                # Not part of the protocol (e.g. stray output from the CTS)
+                continue
+
+    def run_tests(self, tests: List[str],
+                  timeout_seconds: Optional[float] = None,
+                  stop_predicate: Callable[[str, str], bool] = None,
+                  test_timeout_seconds: Optional[float] = None) -> WorkerResult:
+        '''
+        Runs individual CTS tests in the worker. stop_predicate is called
+        with each test and its status as results arrive; if it returns True
+        the worker is stopped (and restarted for the next request) without
+        running the remaining tests. timeout_seconds bounds the whole request
+        and test_timeout_seconds each test, the time from the previous result.
+        '''
+        result = WorkerResult()
+        if not tests:
+            return result
+        if self.process is None:
+            self._start()
+
+        request_id = self._next_id
+        self._next_id += 1
+        request_deadline = None if timeout_seconds is None else time.monotonic() + timeout_seconds
+
+        def next_deadline() -> Optional[float]:
+            if test_timeout_seconds is None:
+                return request_deadline
+            test_deadline = time.monotonic() + test_timeout_seconds
+            return test_deadline if request_deadline is None else min(request_deadline, test_deadline)
+
+        deadline = next_deadline()
+
+        try:
+            self.process.stdin.write((json.dumps({"id": request_id, "tests": tests}) + '\n').encode('utf-8'))
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            pass
+
+        while True:
+            message = self._read_message(deadline)
+            if message is None:
+                if deadline is not None and time.monotonic() >= deadline:
+                    result.timed_out = True
+                else:
+                    result.crashed = True
+                unreported = [test for test in tests if test not in result.statuses]
+                result.interrupted_test = unreported[0] if unreported else None
+                self._kill()
+                self._needs_restart = True
+                return result
+
+            if message.get("id") != request_id:
+                continue
+            if message.get("done"):
+                return result
+
+            result.statuses[message["test"]] = message["status"]
+            deadline = next_deadline()
+            if stop_predicate is not None and stop_predicate(message["test"], message["status"]):
+                result.stopped_early = True
+                # Not a failure of the worker, so this restart does not count against the policy
+                self._kill()
+                return result
+
+
+def run_tests_to_completion(worker: CTSWorker,
+                            tests: List[str],
+                            timeout_seconds: Optional[float] = None,
+                            stop_predicate: Callable[[str, str], bool] = None,
+                            test_timeout_seconds: Optional[float] = None) -> Dict[str, str]:
+    '''
+    Runs tests in the worker until all have a status or stop_predicate
+    returns True. If the worker crashes, the test it was running is recorded
+    as failing, and if it hangs, as TIMEOUT_STATUS; either way the worker is
+    restarted for the rest.
+    '''
+    statuses: Dict[str, str] = {}
+    remaining = list(tests)
+    while remaining:
+        result = worker.run_tests(remaining, timeout_seconds, stop_predicate, test_timeout_seconds)
+        statuses.update(result.statuses)
+        if result.stopped_early or result.interrupted_test is None:
+            break
+        status = TIMEOUT_STATUS if result.timed_out else 'fail'
+        statuses[result.interrupted_test] = status
+        if stop_predicate is not None and stop_predicate(result.interrupted_test, status):
+            break
+        remaining = [test for test in remaining if test not in statuses]
+    return statuses
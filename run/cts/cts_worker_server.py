@@ -0,0 +1,147 @@
+'''
+Worker side of the protocol in run/cts/cts_worker.py. Starts the CTS test
+server (src/common/runtime/server.ts) once, with Dawn as the GPU provider,
+and runs each requested test through it over HTTP. Any output other than
+protocol messages goes to stderr.
+
+With --stub_results the CTS is not used: tests get the status recorded for
+them in a json file (default pass), so the protocol and restart handling
+can be tried locally. A status of "crash" makes the stub exit and "hang"
+makes it stop responding.
+'''
+
+import argparse
+import http.client
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from pathlib import Path
+from urllib.parse import quote
+
+SERVER_START_TIMEOUT_SECONDS: float = 120.0
+CTS_STATUSES = {'pass': 'pass', 'warn': 'pass', 'skip': 'skip'}
+
+
+class CTSServerRunner:
+    def __init__(self, dawn_path: Path, cts_repo: Path, node: str):
+        self.server = subprocess.Popen([node,
+                                        '-e',
+                                        "require('./src/common/tools/setup-ts-in-node.js');"
+                                        "require('./src/common/runtime/server.ts');",
+                                        '--',
+                                        'placeholder-arg',
+                                        '--gpu-provider',
+                                        f'{dawn_path}/out/Debug/cts.js'],
+                                       cwd=cts_repo,
+                                       stdout=subprocess.PIPE,
+                                       text=True)
+        (self.host, self.port) = self._wait_for_address()
+
+        # Keep draining the server's output so that it never blocks on a full pipe
+        threading.Thread(target=self._forward_output, daemon=True).start()
+
+    def _wait_for_address(self) -> tuple[str, int]:
+        deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            line = self.server.stdout.readline()
+            if not line:
+                break
+            print(line, end='', file=sys.stderr)
+            matched = re.search(r'Server listening at \[\[(.*)\]\]', line)
+            if matched:
+                address = matched.group(1)
+                if address.isdigit():
+                    return ('localhost', int(address))
+                (host, port) = address.rsplit(':', 1)
+                return (host, int(port))
+        raise RuntimeError('CTS server did not start')
+
+    def _forward_output(self) -> None:
+        for line in self.server.stdout:
+            print(line, end='', file=sys.stderr)
+
+    def run(self, test: str) -> str:
+        connection = http.client.HTTPConnection(self.host, self.port)
+        try:
+            connection.request('GET', '/run?' + quote(test, safe=':,;=*'))
+            response = json.loads(connection.getresponse().read())
+        finally:
+            connection.close()
+        return CTS_STATUSES.get(response.get('status'), 'fail')
+
+    def close(self) -> None:
+        self.server.terminate()
+        self.server.wait()
+
+
+class StubRunner:
+    def __init__(self, results_file: Path):
+        with open(results_file, 'r') as f:
+            self.results: dict[str, str] = json.load(f)
+
+    def run(self, test: str) -> str:
+        status = self.results.get(test, 'pass')
+        if status == 'crash':
+            sys.exit(1)
+        if status == 'hang':
+            while True:
+                time.sleep(60)
+        return status
+
+    def close(self) -> None:
+        pass
+
+
+def main(raw_args=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dawn_path",
+                        help="Path to the Dawn checkout to test.",
+                        type=Path)
+    parser.add_argument("--cts_repo",
+                        help="Path to a checkout of the WebGPU CTS.",
+                        type=Path)
+    parser.add_argument("--node",
+                        default='node',
+                        help="Node executable.")
+    parser.add_argument("--stub_results",
+                        default=None,
+                        type=Path,
+                        help="Json file mapping tests to statuses; serve these instead of running the CTS.")
+    args = parser.parse_args(raw_args)
+
+    # Only protocol messages may go to stdout
+    protocol = sys.stdout
+    sys.stdout = sys.stderr
+
+    def send(message: dict) -> None:
+        protocol.write(json.dumps(message) + '\n')
+        protocol.flush()
+
+    if args.stub_results is not None:
+        runner = StubRunner(args.stub_results)
+    else:
+        runner = CTSServerRunner(args.dawn_path, args.cts_repo, args.node)
+
+    send({"ready": True})
+    try:
+        for line in sys.stdin:
+            request = json.loads(line)
+            for test in request["tests"]:
+                try:
+                    status = runner.run(test)
+                except (ConnectionError, http.client.HTTPException) as e:
+                    # The CTS server died (e.g. a crash in mutated Dawn); the client restarts the worker
+                    print(f'CTS server failed running {test}: {e}')
+                    sys.exit(1)
+                send({"id": request["id"], "test": test, "status": status})
+            send({"id": request["id"], "done": True})
+    finally:
+        runner.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,4 @@
 from enum import Enum
-import platform
 import sys
 import os
 import json
@@ -7,8 +6,11 @@ import argparse
 import tempfile
 
 from common.constants import DEFAULT_COMPILATION_TIMEOUT, DEFAULT_RUNTIME_TIMEOUT
-from common.run_process_with_timeout import ProcessResult, run_process_with_timeout
-from run.cts.utils import kill_gpu_processes, get_single_tests_from_stdout, get_single_tests_from_file
+from common.run_process_with_timeout import ProcessResult, run_process_streaming
+from common.cts_output import parse_result_line
+from run.cts.utils import get_single_tests_from_stdout, get_single_tests_from_file
+from run.cts.cts_worker import CTSWorker, get_cts_worker_cmd, run_tests_to_completion
+from run.cts.query_catalogue import QueryCatalogue
 
 from pathlib import Path
 
@@ -16,6 +18,16 @@ class Plat(Enum):
     LINUX=1
     MACOS=2
 
+def collect_test_line(line : str, test_lines : list, output = None) -> None:
+    '''
+    Streaming stdout callback: keeps individual test result lines and
+    optionally writes every line to an output file.
+    '''
+    if output is not None:
+        output.write(line)
+    if parse_result_line(line) is not None:
+        test_lines.append(line)
+
 def main(raw_args=None):
 
     parser = argparse.ArgumentParser()
@@ -37,6 +49,10 @@ def main(raw_args=None):
                         default=False,
                         action=argparse.BooleanOptionalAction,
                         help="Update CTS individual tests instead of getting from existing list. Default is false.")
+    parser.add_argument("--query_catalogue",
+                        type=Path,
+                        help="Cached listing of the CTS queries used by --update_queries. Defaults to "
+                             "out/query_catalogue.json in the CTS repo.")
     parser.add_argument("--query_file",
                         help="Filepath to .json file with a list of existing individual queries.")
     parser.add_argument("--n_runs",
@@ -49,6 +65,16 @@ def main(raw_args=None):
                         help="Parse existing stdout without re-running tests.")
     parser.add_argument("--vk_icd",
                         default=None)
+    parser.add_argument("--persistent_worker",
+                        default=False,
+                        action=argparse.BooleanOptionalAction,
+                        help="Run the individual tests of each round in one long-lived CTS worker instead of "
+                             "starting the CTS for every test. Requires individual test queries. Default is false.")
+    parser.add_argument("--test_timeout",
+                        default=DEFAULT_RUNTIME_TIMEOUT,
+                        help="Time in seconds to allow for each test run in a persistent worker; a test that takes "
+                             f"longer is stopped and is not reliable. Default is {DEFAULT_RUNTIME_TIMEOUT}.",
+                        type=float)
 
     args = parser.parse_args(raw_args)
 
@@ -63,60 +89,25 @@ def main(raw_args=None):
     reliable_tests_file : Path = Path(args.output_path, 'reliable_tests.json')
     
     if args.update_queries:
-        
-        cts_queries = [args.query_base]
-        #cts_queries = ['webgpu:*']
-        #cts_queries = ['webgpu:shader,execution,expression,call,builtin,textureDimensions:*']
-        #cts_queries = ['webgpu:shader,execution,expression,call,builtin,textureDimensions:sampled_and_multisampled:format="r32sint";aspect="all";samples=1']
-
-        individual_cts_queries = []
 
         if manual_check_file.exists():
             os.remove(manual_check_file)
 
-        for query in cts_queries:        
-            cmd = [f'{args.dawn_path}/tools/run',
-                'run-cts', 
-                '--verbose',
-                f'--bin={args.dawn_path}/out/Debug',
-                f'--cts={args.cts_path}',
-                query]
-
-            env = os.environ.copy()
-            if args.vk_icd is not None:
-                env['VK_ICD_FILENAMES']=args.vk_icd
-           
-            print(f'Get individual tests from query:\n{query}')
-            result: ProcessResult = run_process_with_timeout(
-                    cmd=cmd, timeout_seconds=None, env=env)
-
-            stderr = result.stderr.decode('utf-8')
-            stdout = result.stdout.decode('utf-8')
-            
-            std_dump = stdout.split('\n')
-            std_dump.extend(stderr.split('\n'))
-
-            # Kill gpu processes - sometimes this is not done automatically
-            # when running tests individually, which messes up
-            # future tests
-            if 'Linux' in platform.platform():
-                kill_gpu_processes('node')
-            
-            # Parse stdout to get a list of individual tests and their statuses
-            queries = list(get_single_tests_from_stdout(std_dump).keys())
-            individual_cts_queries.extend(queries) 
-            print(f'Number of individual tests: {len(queries)}')
-            print(f'Running total of individual tests: {len(individual_cts_queries)}')
-
-            # Record any file level queries that resulted in zero individual queries
-            # for manual checking. This can happen if a file exists that does not export
-            # any tests, e.g. while it is still under development
-            if len(queries) == 0:
-                with open(manual_check_file, 'a') as f:
-                    f.write(f'File query resulted in zero individual queries: {query}')
-                    f.write(result.stderr.decode('utf-8'))
-                    f.write(result.stdout.decode('utf-8'))
-                    f.write('END\n')
+        # Cases are listed by the CTS without running them, and only for spec files that are new or
+        # have changed since the catalogue was last updated
+        print(f'Get individual tests from query:\n{args.query_base}')
+        catalogue = QueryCatalogue(args.cts_path, args.query_catalogue)
+        failed_files = []
+        individual_cts_queries = catalogue.case_queries(args.query_base, failed_files)
+        print(f'Number of individual tests: {len(individual_cts_queries)}')
+
+        # Record any file level queries that resulted in zero individual queries
+        # for manual checking. This can happen if a file exists that does not export
+        # any tests, e.g. while it is still under development
+        if failed_files:
+            with open(manual_check_file, 'a') as f:
+                for query in failed_files:
+                    f.write(f'File query resulted in zero individual queries: {query}\n')
 
         # Exit if there are no individual queries to run
         if len(individual_cts_queries) == 0:
@@ -156,6 +147,21 @@ def main(raw_args=None):
             if args.vk_icd is not None:
                 env['VK_ICD_FILENAMES']=args.vk_icd  
 
+            if args.persistent_worker:
+                print(f'Run round {i} of {len(individual_cts_queries)} tests in a persistent worker')
+                with CTSWorker(get_cts_worker_cmd(args.dawn_path, args.cts_path), env=env) as worker:
+                    query_status = run_tests_to_completion(worker, individual_cts_queries,
+                                                           test_timeout_seconds=args.test_timeout)
+
+                # Same format as the verbose CTS output, so the results are collected below as usual
+                with open(output_file, 'w') as f:
+                    for (query,status) in query_status.items():
+                        f.write(f'{query} - {status}\n')
+                with open(summary_file, 'w') as f:
+                    for (query,status) in query_status.items():
+                        f.write(f'{query} - {status}\n')
+                continue
+
             for query in individual_cts_queries:        
                 cmd = [f'{args.dawn_path}/tools/run',
                     'run-cts', 
@@ -165,24 +171,20 @@ def main(raw_args=None):
                     query]
             
                 print(f'Run query round {i}: {query}')
-                result: ProcessResult = run_process_with_timeout(
-                        cmd=cmd, timeout_seconds=None, env=env)
 
-                # Kill gpu processes - this is not always done automatically
-                # when running tests individually, which messes up
-                # future tests
-                if 'Linux' in platform.platform():
-                    kill_gpu_processes('node')
+                # Stream stdout straight to the output file rather than holding it in memory
+                test_lines = []
+                with open(output_file, 'a') as f:
+                    result: ProcessResult = run_process_streaming(
+                            cmd=cmd, timeout_seconds=None, env=env,
+                            on_line=lambda line: collect_test_line(line, test_lines, f))
 
                 try:
-                    # Record stdout and outcomes
+                    # Record stderr and outcomes
                     with open(output_file, 'a') as f:
                         f.write(result.stderr.decode('utf-8'))
-                        f.write(result.stdout.decode('utf-8'))
-
-                    output = result.stdout.decode('utf-8').split('\n')
 
-                    query_status = get_single_tests_from_stdout(output)
+                    query_status = get_single_tests_from_stdout(test_lines)
 
                     with open(summary_file, 'a') as f:
                         for (query,status) in query_status.items():
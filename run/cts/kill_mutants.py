@@ -1,4 +1,5 @@
 import argparse
+import asyncio
 import shutil
 import subprocess
 import logging
@@ -12,15 +13,36 @@ import time
 import datetime
 
 from common.constants import DEFAULT_COMPILATION_TIMEOUT, DEFAULT_RUNTIME_TIMEOUT
-from common.mutation_tree import MutationTree
-from common.run_process_with_timeout import ProcessResult, run_process_with_timeout
-from common.run_test_with_mutants import run_webgpu_cts_test_with_mutants, KillStatus, CTSKillStatus
-from run.cts.utils import get_queries_from_cts, get_reliable_tests, kill_gpu_processes, get_tests, get_passes, get_failures, get_unrun_tests, get_single_tests_from_stdout, get_completed_queries
+from common.async_runner import AsyncExecutionEngine
+from common.baseline_timings import CTS, BaselineTiming, BaselineTimings, get_default_baseline_timings_path
+from common.build_fingerprint import get_build_fingerprint, get_icd_fingerprint
+from common.group_testing import group_test_mutants_async, pack_compatible_mutants
+from common.mutation_tree_cache import get_mutation_tree_digest, load_cached_mutation_tree
+from common.run_process_with_timeout import (ProcessResult, ProgressWatchdog, ResourceUsage, get_resource_usage,
+                                             run_process_streaming, run_process_with_timeout)
+from common.cts_output import is_result_line, parse_result_line
+from common.process_reaper import leak_report
+from common.campaign_journal import KILLED, SURVIVED, UNCOVERED, CampaignJournal, claim_test_directory, get_journal_file
+from common.results_store import ResultsStore, is_noted_as_killed, note_kill
+from common.work_queue import LeaseKeeper, WorkQueue, drain, get_worker_id
+from common.run_test_with_mutants import (get_compilation_timeout, get_execution_timeout, get_mutant_spool_info,
+                                         get_mutant_stdout_spool, get_mutant_watchdog, get_silence_timeout,
+                                         get_unmutated_reliable_passes,
+                                         run_webgpu_cts_test_with_mutants_async, KillStatus, CTSKillStatus)
+from run.cts.baseline_cache import BaselineCache, BaselineKey, UnmutatedBaseline, get_default_baseline_cache_path
+from run.cts.coverage_cache import CoverageCache, CoverageKeys, get_default_coverage_cache_path
+from run.cts.coverage_matrix import CoverageMatrix
+from run.cts.cts_worker import TIMEOUT_STATUS, CTSWorker, get_cts_worker_cmd, run_tests_to_completion
+from run.cts.query_catalogue import get_cts_revision
+from run.cts.query_sharding import QueryRuntimes, get_default_query_runtimes_path
+from run.cts.test_ordering import load_kill_history
+from run.cts.reliable_test_index import ReliableTestIndex, load_reliable_test_index
+from run.cts.utils import get_queries_from_cts, get_reliable_tests, get_tests, get_passes, get_failures, get_unrun_tests, get_single_tests_from_stdout
 
 import run.cts.flaky_test_finder.find_non_flaky_cts_tests as find_non_flaky_cts_tests
 
 from pathlib import Path
-from typing import List, Set
+from typing import Dict, List, Optional, Set
 
 
 def still_testing(start_time_for_overall_testing: float,
@@ -34,6 +56,215 @@ def still_testing(start_time_for_overall_testing: float,
     return True
 
 
+def get_run_cts_cmd(dawn_path: Path, cts_repo: Path, query: str) -> List[str]:
+    return [f'{dawn_path}/tools/run',
+        'run-cts', 
+        '--verbose',
+        f'--bin={dawn_path}/out/Debug',
+        '--cts',
+        str(cts_repo),
+        query]
+
+
+async def get_unmutated_timing(engine: AsyncExecutionEngine,
+                               baseline_timings: BaselineTimings,
+                               mutated_path: Path,
+                               cts_repo: Path,
+                               query: str,
+                               vk_icd: str,
+                               timeout_seconds: int) -> Optional[BaselineTiming]:
+    '''
+    Timing of a CTS query without mutants, from which the timeouts for
+    mutant runs of it are derived. A query that has not been timed before
+    is run with no mutants enabled and the run is recorded in the baseline
+    timings. Returns None if that run timed out.
+    '''
+    timing = baseline_timings.get(CTS, query)
+    if timing is not None and timing.longest_silence is not None:
+        return timing
+
+    env = os.environ.copy()
+    env["VK_ICD_FILENAMES"] = f'{vk_icd}'
+
+    watchdog = ProgressWatchdog(is_result_line)
+    start_time = time.monotonic()
+    result = await engine.run_process(cmd=get_run_cts_cmd(mutated_path, cts_repo, query),
+        timeout_seconds=timeout_seconds,
+        env=env,
+        watchdog=watchdog)
+    if result is None:
+        print(f'Unmutated run of {query} timed out')
+        return None
+
+    wall_time = result.wall_time if result.wall_time is not None else time.monotonic() - start_time
+    print(f'Unmutated run of {query} completed {watchdog.progress_lines} tests in {wall_time:.1f}s, '
+          f'longest silence {watchdog.longest_silence:.1f}s')
+    return baseline_timings.record(CTS, query, wall_time, watchdog.longest_silence)
+
+
+def run_unmutated_baseline(dawn_path: Path,
+                           cts_repo: Path,
+                           query: str,
+                           vk_icd: str,
+                           timeout_seconds: Optional[float],
+                           tracking_file: Optional[Path] = None) -> tuple[Optional[UnmutatedBaseline], Optional[ProcessResult]]:
+    '''
+    Runs a CTS query with no mutants enabled, recording the status of each
+    test and the time from the previous test result to its result. With
+    tracking_file, dawn_path is the mutant tracking build and the mutants
+    the run covers are written to tracking_file, so one run gives both the
+    baseline and the coverage. Returns (None, None) if the run timed out.
+    '''
+    env = os.environ.copy()
+    env["VK_ICD_FILENAMES"] = f'{vk_icd}'
+    if tracking_file is not None:
+        env["DREDD_MUTANT_TRACKING_FILE"] = str(tracking_file)
+
+    test_times: Dict[str, float] = {}
+    last_result_time = time.monotonic()
+
+    def time_test(line: str) -> None:
+        nonlocal last_result_time
+        result = parse_result_line(line)
+        if result is not None:
+            now = time.monotonic()
+            test_times[result.test] = now - last_result_time
+            last_result_time = now
+
+    watchdog = ProgressWatchdog(is_result_line)
+    start_time = time.monotonic()
+    result: ProcessResult = run_process_streaming(
+        cmd=get_run_cts_cmd(dawn_path, cts_repo, query),
+        timeout_seconds=timeout_seconds,
+        env=env,
+        on_line=time_test,
+        capture_limit_bytes=None,
+        watchdog=watchdog)
+    if result is None:
+        return (None, None)
+
+    results = get_single_tests_from_stdout(result.stdout.decode('utf-8').split('\n'))
+    return (UnmutatedBaseline(results=results,
+                              test_times={test: test_times[test] for test in results if test in test_times},
+                              wall_time=time.monotonic() - start_time,
+                              longest_silence=watchdog.longest_silence,
+                              resource_usage=result.resource_usage()),
+            result)
+
+
+def get_baseline_divergence(tracking_results: Dict[str, str], mutated_results: Dict[str, str]) -> List[str]:
+    '''
+    Tests whose unmutated status differs between the tracking build and the
+    mutated build, including tests that only one of them ran.
+    '''
+    return sorted([test for test in set(tracking_results) | set(mutated_results)
+                   if tracking_results.get(test) != mutated_results.get(test)])
+
+
+async def run_cts_with_mutants_live(engine: AsyncExecutionEngine,
+                              mutants: List[int],
+                              mutated_path: Path,
+                              cts_repo: Path,
+                              query: str,
+                              vk_icd: str,
+                              reliable_tests : ReliableTestIndex,
+                              timeout_seconds: Optional[float] = None,
+                              silence_timeout_seconds: Optional[float] = None,
+                              stdout_spool: Optional[Path] = None) -> tuple[CTSKillStatus, str, ProcessResult]:
+    '''
+    Runs a CTS query with the given mutants enabled, parsing stdout live and
+    stopping the run as soon as a reliable test fails, or as a timeout if it
+    runs for timeout_seconds or no test completes within
+    silence_timeout_seconds. Output beyond the capture limit goes to
+    stdout_spool.
+    '''
+    env = os.environ.copy()
+    env["VK_ICD_FILENAMES"] = f'{vk_icd}'
+    env["DREDD_ENABLED_MUTATION"] = ','.join([str(m) for m in mutants])
+
+    mutated_cmd = get_run_cts_cmd(mutated_path, cts_repo, query)
+
+    print(' '.join(mutated_cmd))
+
+    mutant_result = CTSKillStatus.SURVIVED
+    failing_tests = None
+
+    # Parse stdout live and kill the process if the 
+    # mutant is killed by a reliable test that fails
+    def reliable_test_failed(line : str) -> bool:
+        nonlocal mutant_result, failing_tests
+        print(line)
+        result = parse_result_line(line)
+        if result is not None and result.status == 'fail' and result.test in reliable_tests:
+            mutant_result = CTSKillStatus.KILL_TEST_FAIL
+            failing_tests = result.test
+            return True
+        return False
+
+    watchdog = get_mutant_watchdog(is_result_line, silence_timeout_seconds)
+    mutated_result: ProcessResult = await engine.run_process(cmd=mutated_cmd,
+        timeout_seconds=timeout_seconds,
+        env=env,
+        stop_predicate=reliable_test_failed,
+        stdout_spool=stdout_spool,
+        watchdog=watchdog)
+    if mutated_result is None and mutant_result != CTSKillStatus.KILL_TEST_FAIL:
+        if watchdog is not None and watchdog.silenced:
+            print(f'No test completed for {silence_timeout_seconds:.1f}s; treating the run as hung')
+        else:
+            print(f'Run timed out after {timeout_seconds}s')
+        mutant_result = CTSKillStatus.TEST_TIMEOUT
+
+    return (mutant_result, failing_tests, mutated_result)
+
+
+# Statuses of a reliable test in a persistent worker that kill the enabled mutants
+KILLING_STATUSES = frozenset(['fail', TIMEOUT_STATUS])
+
+
+def run_cts_queries_in_worker(mutants: List[int],
+                              queries: List[str],
+                              mutated_path: Path,
+                              cts_repo: Path,
+                              vk_icd: str,
+                              reliable_tests : ReliableTestIndex,
+                              record_query_run,
+                              test_timeouts: Dict[str, float]) -> tuple[CTSKillStatus, str, ProcessResult, str]:
+    '''
+    Runs the reliable tests under each query in a single persistent CTS
+    worker with the given mutants enabled, stopping at the first reliable
+    test that fails or hangs for longer than the query's entry in
+    test_timeouts. A worker that cannot be started with the mutants enabled
+    kills them, as a crashed CTS run would. record_query_run is called with
+    each query, whether it killed and its wall time.
+    '''
+    env = os.environ.copy()
+    env["VK_ICD_FILENAMES"] = f'{vk_icd}'
+    env["DREDD_ENABLED_MUTATION"] = ','.join([str(m) for m in mutants])
+
+    with CTSWorker(get_cts_worker_cmd(mutated_path, cts_repo), env=env) as worker:
+        for query in queries:
+            start_time = time.monotonic()
+            try:
+                # Reliable tests pass with unmutated Dawn, so any failure kills
+                statuses = run_tests_to_completion(worker,
+                                                   reliable_tests.tests_under(query),
+                                                   stop_predicate=lambda test, status: status in KILLING_STATUSES,
+                                                   test_timeout_seconds=test_timeouts[query])
+            except RuntimeError as error:
+                print(f'{error}; treating mutants {mutants} as killed')
+                record_query_run(query, True, time.monotonic() - start_time)
+                return (CTSKillStatus.KILL_WORKER_CRASH, None, None, query)
+            failing_tests = [test for (test, status) in statuses.items() if status in KILLING_STATUSES]
+            record_query_run(query, len(failing_tests) != 0, time.monotonic() - start_time)
+            if failing_tests:
+                kill_status = (CTSKillStatus.KILL_TEST_TIMEOUT if statuses[failing_tests[0]] == TIMEOUT_STATUS
+                               else CTSKillStatus.KILL_TEST_FAIL)
+                return (kill_status, failing_tests[0], None, query)
+
+    return (CTSKillStatus.SURVIVED, None, None, None)
+
+
 def main(raw_args = None):
     start_time_for_overall_testing: float = time.time()
     time_of_last_kill: float = start_time_for_overall_testing
@@ -114,6 +345,93 @@ def main(raw_args = None):
                         type=int,
                         default=None # default if nothing is provided
                         )
+    parser.add_argument("--batch_size",
+                        default=1,
+                        help="Maximum number of mutually compatible mutants to enable in a single run. A batch that "
+                             "does not survive is bisected to find the killed mutants. Default is 1 (no batching).",
+                        type=int)
+    parser.add_argument("--max_in_flight",
+                        default=1,
+                        help="Maximum number of mutant runs to execute concurrently from this process. Default is 1.",
+                        type=int)
+    parser.add_argument("--coverage_matrix",
+                        default=None,
+                        type=Path,
+                        help="Coverage matrix from run/cts/coverage_matrix.py. If given, each mutant in the sample "
+                             "is only run against the queries that cover it rather than the whole of --query.")
+    parser.add_argument("--persistent_worker",
+                        default=False,
+                        action=argparse.BooleanOptionalAction,
+                        help="With --coverage_matrix, run all queries for a mutant in one long-lived CTS worker "
+                             "instead of starting the CTS for every query. Only the reliable tests under each query "
+                             "are run. Default is false.")
+    parser.add_argument("--order_by_kill_history",
+                        default=True,
+                        action=argparse.BooleanOptionalAction,
+                        help="With --coverage_matrix, run the queries covering a mutant in order of runtime per "
+                             "expected kill, learned from earlier kill summaries in mutant_kill_path. Default is true.")
+    parser.add_argument("--results_store",
+                        default=None,
+                        type=Path,
+                        help="SQLite results store shared by kill processes. When given, kills are claimed and "
+                             "looked up in the store and runs and kill summaries are recorded in it, as well as in "
+                             "the usual files. Import existing results into it first (python -m "
+                             "common.results_store).")
+    parser.add_argument("--work_queue",
+                        default=None,
+                        type=Path,
+                        help="SQLite work queue shared by kill processes on this node. With --mutant_sample, the "
+                             "batches of the sample are leased from the queue, so each is evaluated by one process "
+                             "and batches from a crashed process are reassigned.")
+    parser.add_argument("--mutation_tree_cache_dir",
+                        default=None,
+                        type=Path,
+                        help="Directory in which to cache parsed mutation trees. Defaults to a mutation_tree_cache "
+                             "directory next to each mutation info file.")
+    parser.add_argument("--baseline_timings",
+                        default=None,
+                        type=Path,
+                        help="SQLite table of unmutated query runtimes, from which mutant run timeouts are derived "
+                             "(at most --compile_timeout). Kept across campaigns, so queries timed before are not "
+                             "rerun just to set timeouts. Defaults to baseline_timings.sqlite in mutant_kill_path.")
+    parser.add_argument("--query_runtimes",
+                        default=None,
+                        type=Path,
+                        help="SQLite table in which the time taken to process each query is recorded, used to split "
+                             "queries between kill processes (see run/cts/query_sharding.py). Defaults to "
+                             "query_runtimes.sqlite in mutant_kill_path.")
+    parser.add_argument("--query_catalogue",
+                        default=None,
+                        type=Path,
+                        help="Cached listing of the CTS queries, kept up to date with the CTS revision, used with "
+                             "query_source 'cts_repo' (see run/cts/query_catalogue.py). Defaults to "
+                             "out/query_catalogue.json in the CTS repo.")
+    parser.add_argument("--baseline_cache",
+                        default=None,
+                        type=Path,
+                        help="SQLite cache of unmutated query results, keyed by the Dawn build, CTS revision, "
+                             "Vulkan driver and query, so a query is only rerun unmutated when one of those "
+                             "changes. Can be shared between campaigns. Defaults to baseline_cache.sqlite in "
+                             "mutant_kill_path.")
+    parser.add_argument("--coverage_cache",
+                        default=None,
+                        type=Path,
+                        help="SQLite cache of the mutants covered by each query, keyed by the tracking build, CTS "
+                             "revision and Vulkan driver, so a query is only run with the tracking build when one of "
+                             "those changes. Shared by campaigns using the same tracking build. Defaults to "
+                             "out/coverage_cache.sqlite in tracking_path.")
+    parser.add_argument("--tracking_baseline",
+                        default=False,
+                        action=argparse.BooleanOptionalAction,
+                        help="Take each query's unmutated test results from its mutant tracking run instead of a "
+                             "separate unmutated run, so a query is set up with one run rather than two. Default "
+                             "is false.")
+    parser.add_argument("--tracking_baseline_cross_check_interval",
+                        default=10,
+                        type=int,
+                        help="With --tracking_baseline, also run every this many queries unmutated on the mutated "
+                             "build and compare the results. On any difference the tracking baseline is given up "
+                             "for the rest of the run. Default is 10.")
     args = parser.parse_args(raw_args)
 
 
@@ -124,21 +442,12 @@ def main(raw_args = None):
     elif args.query_source == 'cts_repo':
         assert Path(args.cts_repo).exists()
 
-    cts_base = Path(args.cts_repo,'src')
-
     print("Building the real mutation tree...")
-    with open(args.mutation_info_file, 'r') as json_input:
-        mutation_tree = MutationTree(json.load(json_input))
-    print("Built!")
-    print("Building the mutation tree associated with mutant coverage tracking...")
-    with open(args.mutation_info_file_for_mutant_coverage_tracking, 'r') as json_input:
-        mutation_tree_for_coverage_tracking = MutationTree(json.load(json_input))
+    mutation_tree = load_cached_mutation_tree(args.mutation_info_file, args.mutation_tree_cache_dir)
     print("Built!")
-    print("Checking that the two mutation trees match...")
-    assert mutation_tree.mutation_id_to_node_id == mutation_tree_for_coverage_tracking.mutation_id_to_node_id
-    assert mutation_tree.parent_map == mutation_tree_for_coverage_tracking.parent_map
-    assert mutation_tree.num_nodes == mutation_tree_for_coverage_tracking.num_nodes
-    assert mutation_tree.num_mutations == mutation_tree_for_coverage_tracking.num_mutations
+    print("Checking that the mutation tree associated with mutant coverage tracking matches...")
+    assert mutation_tree.digest == get_mutation_tree_digest(args.mutation_info_file_for_mutant_coverage_tracking,
+                                                            args.mutation_tree_cache_dir)
     print("Check complete!")
 
     if args.seed is not None:
@@ -156,7 +465,8 @@ def main(raw_args = None):
 
     logging.info('Start')
 
-    with tempfile.TemporaryDirectory() as temp_dir_for_generated_code:
+    with tempfile.TemporaryDirectory() as temp_dir_for_generated_code, \
+            AsyncExecutionEngine(args.max_in_flight) as engine:
         #with Path('/data/dev/dredd-compiler-testing/dredd_test_runners/wgslsmith_runner/temp') as temp_dir_for_generated_code:
         dredd_covered_mutants_path: Path = Path(temp_dir_for_generated_code, '__dredd_covered_mutants')
 
@@ -172,17 +482,21 @@ def main(raw_args = None):
         Path(args.mutant_kill_path,"tracking").mkdir(exist_ok=True)
         Path(args.mutant_kill_path,"tests").mkdir(exist_ok=True)
 
+        results_store = ResultsStore(args.results_store) if args.results_store is not None else None
+
+        baseline_timings = BaselineTimings(args.baseline_timings if args.baseline_timings is not None
+                                           else get_default_baseline_timings_path(args.mutant_kill_path))
+
+        # Replayed so that a query interrupted by a crash resumes at the mutant it stopped on
+        journal = CampaignJournal(get_journal_file(args.mutant_kill_path))
+
         # Get list of test queries
         if args.query_source == "cts_repo":
-            test_queries = get_queries_from_cts(query,
-                cts_base,
+            test_queries = get_queries_from_cts(args.query,
+                args.cts_repo,
                 args.unittests_only,
                 args.cts_only,
-                args.reliable_tests,
-                args.mutated_path,
-                args.cts_repo,
-                args.mutant_kill_path,
-                args.vk_icd)
+                args.query_catalogue)
 
         elif args.query_source == "file":
             with open(args.query_file, 'r') as f:
@@ -191,13 +505,19 @@ def main(raw_args = None):
         elif args.query_source == "arg":
             test_queries = [args.query]
 
-        # Get reliably passing tests
-        reliable_tests = get_reliable_tests(args.query,
-            args.mutated_path,
-            args.cts_repo,
-            args.mutant_kill_path,
-            args.vk_icd,
-            args.reliable_tests)
+        # Find the reliably passing tests if they have not been found before
+        reliable_tests = None
+        if not Path(args.reliable_tests).exists():
+            reliable_tests = get_reliable_tests(args.query,
+                args.mutated_path,
+                args.cts_repo,
+                args.mutant_kill_path,
+                args.vk_icd,
+                args.reliable_tests)
+
+        # Looked up for every line of CTS output; built once and persisted next to the reliable tests file, which
+        # is then not read again
+        reliable_tests : ReliableTestIndex = load_reliable_test_index(args.reliable_tests, reliable_tests)
 
         print(f'There are {len(reliable_tests)} reliable tests and the query to run is {test_queries}')
         
@@ -211,132 +531,343 @@ def main(raw_args = None):
             killed_mutants : Set(int) = set()
             already_killed_by_other_tests : list(int) = []
             killed_by_this_test : list(int) = []
+            uncovered_mutants : list(int) = []
 
-            for mutant in args.mutant_sample:
-                
-                # Check whether mutant has already been killed by another process
-                mutant_path = Path(args.mutant_kill_path,f'killed_mutants/{str(mutant)}')
-                if mutant_path.exists():
-                    print("Skipping mutant " + str(mutant) + " as it is noted as already killed.")
-                    unkilled_mutants.remove(mutant)
-                    killed_mutants.add(mutant)
-                    already_killed_by_other_tests.append(mutant)
-                    print(f'Unkilled mutants: {unkilled_mutants}')
-                    continue
-                
-                print("Trying mutant " + str(mutant))
-                
-                env = os.environ.copy()
-                env["VK_ICD_FILENAMES"] = f'{args.vk_icd}'
-                env["DREDD_ENABLED_MUTATION"] = str(mutant)
-
-                mutated_cmd = [f'{args.mutated_path}/tools/run',
-                    'run-cts', 
-                    '--verbose',
-                    f'--bin={args.mutated_path}/out/Debug',
-                    '--cts',
-                    str(args.cts_repo),
-                    f"'{args.query}'"]  
-
-                shell_cmd = ' '.join(mutated_cmd)  
-                print(shell_cmd)
-
-                with subprocess.Popen(shell_cmd, 
-                    stdout=subprocess.PIPE, 
-                    universal_newlines=True, 
-                    shell=True,
-                    preexec_fn=os.setsid,
-                    env=env) as p:
-                    
-                    # Parse stdout live and kill the process if the 
-                    # mutant is killed by a reliable test that fails
-                    mutant_result = CTSKillStatus.SURVIVED
-
-                    for line in p.stdout:
-                        print(line)
-                        if f' - fail' in line:
-                            test = line[:line.index(' ')] 
-                            if test in reliable_tests:
-                                os.killpg(os.getpgid(p.pid), signal.SIGTERM)
-                                mutant_result = CTSKillStatus.KILL_TEST_FAIL
-                                failing_tests = test
-                
-                kill_gpu_processes('node')
+            sample_test = f'mutant_sample:{args.query}'
+            query_output_directory = Path(args.mutant_kill_path,'tests',args.query.replace('*','').replace(':','-'))
+            query_output_directory.mkdir(exist_ok=True)
+            sample_outcomes = journal.outcomes(sample_test)
+            if sample_outcomes:
+                print(f'Resuming mutant sample: {len(sample_outcomes)} mutants were decided before an interruption')
+            journal.record_start(sample_test)
 
-                print(f'Mutant result: {mutant_result}')
+            # Targeted testing: only run the queries that cover the enabled mutants
+            coverage_matrix = None
+            kill_history = None
+            if args.coverage_matrix is not None:
+                coverage_matrix = CoverageMatrix.load(args.coverage_matrix)
+                print(f'Using coverage matrix with {len(coverage_matrix.queries)} queries')
+                if args.order_by_kill_history:
+                    kill_history = load_kill_history(args.mutant_kill_path)
+                    print(f'Loaded kill history for {len(kill_history.stats)} queries')
 
-                if mutant_result == CTSKillStatus.SURVIVED or mutant_result == CTSKillStatus.TEST_TIMEOUT:
-                    print(f'Mutant ID {mutant} survived!')
-                    covered_but_not_killed_by_this_test.append(mutant)
-                    with open(f"{str(args.mutant_kill_path)}/surviving_mutants.txt", 'a') as outfile:
-                        outfile.write(f'{mutant}\n')
-                    continue
+            # Resource usage of every mutant run, including the runs needed to bisect batches
+            mutant_runs_usage = ResourceUsage()
+            mutant_resource_usage = {}
+            query_runs_usage = {}
+
+            # Timeouts for the mutant runs of each query, from its baseline timing. A query
+            # that has not been timed is run once without mutants, by whichever batch needs it first
+            unmutated_timing_tasks: Dict[str, asyncio.Task] = {}
+            query_timeouts: Dict[str, dict] = {}
+
+            async def get_query_timeouts(query: str) -> tuple[float, Optional[float]]:
+                if query not in unmutated_timing_tasks:
+                    unmutated_timing_tasks[query] = asyncio.ensure_future(get_unmutated_timing(engine,
+                            baseline_timings,
+                            args.mutated_path,
+                            args.cts_repo,
+                            query,
+                            args.vk_icd,
+                            args.run_timeout))
+                # Shielded so that cancelling one waiting batch does not cancel the run for the others
+                timing = await asyncio.shield(unmutated_timing_tasks[query])
+                if timing is None:
+                    # Without a baseline, mutant runs get the configured timeout and are not watched for silence
+                    timeouts = {"timeout": args.compile_timeout, "silence_timeout": None}
+                else:
+                    timeouts = {"timeout": get_execution_timeout(timing.wall_time, limit=args.compile_timeout,
+                                                                 concurrency=args.max_in_flight),
+                                "silence_timeout": get_silence_timeout(timing.longest_silence,
+                                                                       concurrency=args.max_in_flight)}
+                query_timeouts[query] = timeouts
+                return (timeouts["timeout"], timeouts["silence_timeout"])
+
+            async def run_mutants(mutants: List[int]) -> tuple[CTSKillStatus, str, ProcessResult, str]:
+                if coverage_matrix is None:
+                    queries = [args.query]
+                else:
+                    queries = coverage_matrix.queries_covering_any(mutants)
+                    if kill_history is not None:
+                        queries = kill_history.order(queries)
+                    print(f'Mutants {mutants} are covered by {len(queries)} queries')
+
+                if args.persistent_worker and coverage_matrix is not None:
+                    def record_query_run(query: str, killed: bool, wall_time: float) -> None:
+                        mutant_runs_usage.add_wall_time(wall_time)
+                        query_runs_usage.setdefault(query, ResourceUsage()).add_wall_time(wall_time)
+                        if kill_history is not None:
+                            kill_history.record_run(query, killed=killed, wall_time=wall_time)
 
-                unkilled_mutants.remove(mutant)
-                killed_mutants.add(mutant)
-                killed_by_this_test.append(mutant)
-                print(f"Kill! Mutants killed so far: {len(killed_mutants)}")
-                print(f"Mutant killed is ID {mutant}")
+                    # Each test may go as long without a result as the unmutated run of its query went
+                    # between results, or the run timeout if the query has no baseline
+                    test_timeouts = {}
+                    for query in queries:
+                        silence_timeout = (await get_query_timeouts(query))[1]
+                        test_timeouts[query] = silence_timeout if silence_timeout is not None else args.run_timeout
+
+                    return await engine.run_blocking(run_cts_queries_in_worker,
+                            mutants,
+                            queries,
+                            args.mutated_path,
+                            args.cts_repo,
+                            args.vk_icd,
+                            reliable_tests,
+                            record_query_run,
+                            test_timeouts)
+
+                # Stop at the first query that kills. A timeout does not stop the search, as a later query may
+                # still kill, but is the result if none does
+                result = (CTSKillStatus.SURVIVED, None, None, None)
+                for query in queries:
+                    (timeout, silence_timeout) = await get_query_timeouts(query)
+                    (mutant_result, failing_tests, mutated_result) = await run_cts_with_mutants_live(engine=engine,
+                            mutants=mutants,
+                            mutated_path=args.mutated_path,
+                            cts_repo=args.cts_repo,
+                            query=query,
+                            vk_icd=args.vk_icd,
+                            reliable_tests=reliable_tests,
+                            timeout_seconds=timeout,
+                            silence_timeout_seconds=silence_timeout,
+                            stdout_spool=get_mutant_stdout_spool(query_output_directory, mutants))
+                    mutant_runs_usage.add(mutated_result)
+                    query_runs_usage.setdefault(query, ResourceUsage()).add(mutated_result)
+                    if kill_history is not None:
+                        kill_history.record_run(query,
+                                                killed=mutant_result == CTSKillStatus.KILL_TEST_FAIL,
+                                                wall_time=None if mutated_result is None else mutated_result.wall_time)
+                    if mutant_result == CTSKillStatus.KILL_TEST_FAIL:
+                        return (mutant_result, failing_tests, mutated_result, query)
+                    if result[0] != CTSKillStatus.TEST_TIMEOUT:
+                        result = (mutant_result, failing_tests, mutated_result, query)
+                return result
+
+            async def evaluate_batch(mutants: List[int]) -> dict:
+                return await group_test_mutants_async(mutants,
+                    run_mutants=run_mutants,
+                    survived=lambda result: result[0] == CTSKillStatus.SURVIVED)
+
+            def get_mutants_to_try(batch: List[int]) -> List[int]:
+                mutants_to_try: List[int] = []
+                for mutant in batch:
+                    # Mutants decided before an interruption are not run again
+                    if mutant in sample_outcomes:
+                        if sample_outcomes[mutant]["outcome"] == KILLED:
+                            unkilled_mutants.remove(mutant)
+                            killed_mutants.add(mutant)
+                            killed_by_this_test.append(mutant)
+                        elif sample_outcomes[mutant]["outcome"] == UNCOVERED:
+                            uncovered_mutants.append(mutant)
+                        else:
+                            covered_but_not_killed_by_this_test.append(mutant)
+                        continue
+                    # Check whether mutant has already been killed by another process
+                    if is_noted_as_killed(args.mutant_kill_path, results_store, mutant):
+                        print("Skipping mutant " + str(mutant) + " as it is noted as already killed.")
+                        unkilled_mutants.remove(mutant)
+                        killed_mutants.add(mutant)
+                        already_killed_by_other_tests.append(mutant)
+                        print(f'Unkilled mutants: {unkilled_mutants}')
+                        continue
+                    # No query can kill a mutant that none covers, so it is not run; it is recorded apart from
+                    # the mutants that were run and survived
+                    if coverage_matrix is not None and not coverage_matrix.queries_covering(mutant):
+                        print(f'Mutant {mutant} is not covered by any query in the coverage matrix')
+                        uncovered_mutants.append(mutant)
+                        journal.record_outcome(sample_test, mutant, UNCOVERED, UNCOVERED)
+                        with open(f"{str(args.mutant_kill_path)}/uncovered_mutants.txt", 'a') as outfile:
+                            outfile.write(f'{mutant}\n')
+                        continue
+                    mutants_to_try.append(mutant)
+                return mutants_to_try
+
+            # Mutants that cannot be enabled together are kept in separate batches;
+            # a batch is only split up if running it does not survive
+            sample_batches = pack_compatible_mutants(args.mutant_sample, mutation_tree, args.batch_size)
+
+            def evaluate_queued_batches():
+                '''
+                Leases batches of the sample from the shared work queue until it
+                is drained, evaluating up to max_in_flight at a time. A batch is
+                marked complete once its results have been recorded.
+                '''
+                work_queue = WorkQueue(args.work_queue)
+                work_queue.add_items({','.join([str(m) for m in batch]): {"mutants": batch} for batch in sample_batches})
+                worker = get_worker_id()
+                lease_keeper = LeaseKeeper(work_queue, worker)
+                batches = {}
                 try:
-                    mutant_path.mkdir()
+                    for items in drain(work_queue, worker, limit=args.max_in_flight):
+                        if not items:
+                            print('Waiting for batches leased by other processes...')
+                            continue
+                        batches = {}
+                        for item in items:
+                            mutants_to_try = get_mutants_to_try(item.payload["mutants"])
+                            if mutants_to_try:
+                                batches[item.key] = mutants_to_try
+                            else:
+                                work_queue.complete(worker, item.key, {})
+                        for (key, batch_results) in engine.map_unordered(
+                                lambda key: evaluate_batch(batches[key]), list(batches)):
+                            yield (batches[key], batch_results)
+                            work_queue.complete(worker, key, {str(m): str(batch_results[m][0]) for m in batches[key]})
+                finally:
+                    lease_keeper.stop()
+                    # Batches left unfinished by an error go straight back to the queue for other processes,
+                    # rather than waiting for their leases to expire; completed batches are not affected
+                    for key in batches:
+                        work_queue.release(worker, key)
+                    work_queue.close()
+
+            if args.work_queue is not None:
+                evaluated_batches = evaluate_queued_batches()
+            else:
+                batches_to_try = [mutants_to_try for mutants_to_try in map(get_mutants_to_try, sample_batches)
+                                  if mutants_to_try]
+                evaluated_batches = engine.map_unordered(evaluate_batch, batches_to_try)
+
+            # Batches are evaluated concurrently; results are recorded as each batch completes
+            for (mutants_to_try, batch_results) in evaluated_batches:
+
+                for mutant in mutants_to_try:
+                    (mutant_result, failing_tests, mutated_result, killing_query) = batch_results[mutant]
+                    mutant_resource_usage[mutant] = get_resource_usage(mutated_result)
+                    if results_store is not None:
+                        results_store.record_run(args.query, mutant, str(mutant_result), mutant_resource_usage[mutant])
+
+                    print(f'Mutant {mutant} result: {mutant_result}')
+
+                    if mutant_result == CTSKillStatus.SURVIVED or mutant_result == CTSKillStatus.TEST_TIMEOUT:
+                        print(f'Mutant ID {mutant} survived!')
+                        covered_but_not_killed_by_this_test.append(mutant)
+                        journal.record_outcome(sample_test, mutant, SURVIVED, str(mutant_result))
+                        with open(f"{str(args.mutant_kill_path)}/surviving_mutants.txt", 'a') as outfile:
+                            outfile.write(f'{mutant}\n')
+                        continue
+
+                    unkilled_mutants.remove(mutant)
+                    killed_mutants.add(mutant)
+                    killed_by_this_test.append(mutant)
+                    print(f"Kill! Mutants killed so far: {len(killed_mutants)}")
+                    print(f"Mutant killed is ID {mutant}")
                     print("Writing kill info to file.")
-                    with open(mutant_path / "kill_info.json", "w") as outfile:
-                        json.dump({"killing_query": args.query,
-                                   "killing_tests" : failing_tests,
-                                   "kill_type": str(mutant_result)}, outfile)
-                except FileExistsError:
-                    print(f"Mutant {mutant} was independently discovered to be killed.")
-                    continue
+                    noted = note_kill(args.mutant_kill_path, results_store, mutant, killing_query,
+                                      {"killing_query": killing_query,
+                                       "killing_tests" : failing_tests,
+                                       "kill_type": str(mutant_result),
+                                       "stdout_spool": get_mutant_spool_info(mutated_result),
+                                       "resource_usage": mutant_resource_usage[mutant]})
+                    journal.record_outcome(sample_test, mutant, KILLED, str(mutant_result))
+                    if not noted:
+                        print(f"Mutant {mutant} was independently discovered to be killed.")
+                        continue
 
 
             all_considered_mutants = killed_by_this_test \
                 + covered_but_not_killed_by_this_test \
-                + already_killed_by_other_tests
+                + already_killed_by_other_tests \
+                + uncovered_mutants
             all_considered_mutants.sort()
             
             killed_by_this_test.sort()
             covered_but_not_killed_by_this_test.sort()
             already_killed_by_other_tests.sort()
+            uncovered_mutants.sort()
             
-            query_output_directory = Path(args.mutant_kill_path,'tests',args.query.replace('*','').replace(':','-'))
-            query_output_directory.mkdir(exist_ok=True)
-            
-            with open(Path(query_output_directory,'kill_summary.json'), "w") as outfile:
-                json.dump({"query": args.query,
-                           "mutant_sample": args.mutant_sample,
-                           "killed_mutants": killed_by_this_test,
-                           "skipped_mutants": already_killed_by_other_tests,
-                           "survived_mutants": covered_but_not_killed_by_this_test}, outfile)
+            # Processes sharing a work queue each evaluate part of the sample
+            summary_name = 'kill_summary.json' if args.work_queue is None else f'kill_summary_{os.getpid()}.json'
             
-        print('EXITING!!!')
-        exit()
+            kill_summary = {"query": args.query,
+                            "coverage_matrix": None if args.coverage_matrix is None else str(args.coverage_matrix),
+                            "mutant_sample": args.mutant_sample,
+                            "killed_mutants": killed_by_this_test,
+                            "skipped_mutants": already_killed_by_other_tests,
+                            "survived_mutants": covered_but_not_killed_by_this_test,
+                            "uncovered_mutants": uncovered_mutants,
+                            "resource_usage": {"mutant_runs": mutant_runs_usage.to_json()},
+                            "query_runs": {query: usage.to_json() for (query, usage) in query_runs_usage.items()},
+                            "query_timeouts": query_timeouts,
+                            "leaked_processes": leak_report.to_json(),
+                            "mutant_resource_usage": mutant_resource_usage}
+            with open(Path(query_output_directory,summary_name), "w") as outfile:
+                json.dump(kill_summary, outfile)
+            if results_store is not None:
+                results_store.record_test_summary(args.query, 'cts', kill_summary)
+            journal.record_done(sample_test)
+            return
+
+        completed_queries : Set[str] = journal.completed_tests()
+
+        query_runtimes = QueryRuntimes(args.query_runtimes if args.query_runtimes is not None
+                                       else get_default_query_runtimes_path(args.mutant_kill_path))
+
+        baseline_cache = BaselineCache(args.baseline_cache if args.baseline_cache is not None
+                                       else get_default_baseline_cache_path(args.mutant_kill_path))
+        dawn_build: str = get_build_fingerprint(args.mutated_path)
+        icd: str = get_icd_fingerprint(args.vk_icd)
+        cts_revision: Optional[str] = get_cts_revision(args.cts_repo)
+        if cts_revision is None:
+            print('The CTS is not a git checkout, so unmutated results are not cached')
+        coverage_cache = CoverageCache(args.coverage_cache if args.coverage_cache is not None
+                                       else get_default_coverage_cache_path(args.tracking_path))
+        coverage_keys = CoverageKeys(args.tracking_path, args.cts_repo, args.vk_icd)
+
+        # With --tracking_baseline, queries baselined by their tracking run since the last cross-check
+        # against the mutated build; the tracking baseline is given up after a divergence
+        tracking_baselines_since_cross_check: int = 0
+        tracking_baseline_diverged: bool = False
+
+        def finish_query(query: str, query_start_time: float, reason: str = 'complete') -> None:
+            journal.record_done(query, reason)
+            # Queries skipped part way are timed too, so that shards are balanced on the time actually spent
+            query_runtimes.record(query, time.time() - query_start_time)
+        query_lock = None
 
         # Loop over tests to determine which mutants are killed by the tests
         for query in test_queries:
 
+            # Release the previous query's lock
+            if query_lock is not None:
+                query_lock.close()
+                query_lock = None
+
             print(f'PID: {os.getpid()} Query: {query}')
-            with open(f'/data/work/webgpu/log_{os.getpid()}.txt','a') as f:
-                f.write(f'Starting query {query} from pid {os.getpid()}')
+            logger.info(f'Starting query {query} from pid {os.getpid()}')
 
             # Check if query has already been run (where we have read in queries from list)
             if query in completed_queries:
                 print(f"Query '{query}' already completed")
                 continue
 
-            # Try to create a directory for the test; if it already exists then skip this
-            # test as that means the results for this test have already been computed or
-            # are being computed in parallel by another process
+            # Lock the directory for the test while running it; if another process holds the lock it is
+            # computing the results for this test. A query left unfinished by a crashed process is resumed.
             query_output_directory = Path(args.mutant_kill_path,'tests',query.replace('\*','').replace(':','-'))
 
-            try:
-                query_output_directory.mkdir()
-            except FileExistsError:
-                print(f"Skipping query {query} as a directory for it already exists")
+            query_lock = claim_test_directory(query_output_directory)
+            if query_lock is None:
+                print(f"Skipping query {query} as another process is running it")
+                continue
+            if Path(query_output_directory,'kill_summary.json').exists():
+                print(f"Query '{query}' already completed by another process")
                 continue
+
+            if results_store is not None:
+                results_store.claim_test(query, 'cts', str(os.getpid()))
+            journal.record_start(query)
+            query_start_time: float = time.time()
  
             test_id = hash(query)
 
             test_name = 'unit' if 'unittests:' in query else 'cts'
+
+            # A mutant can only be killed by a reliable test, so there is no point running a query without any
+            if reliable_tests.count_under(query) == 0:
+                print(f'No reliable tests under query {query}; skipping query')
+                logger.info('No reliable tests under query; skipping query')
+                finish_query(query, query_start_time, 'no_reliable_tests')
+                continue
             
             if dredd_covered_mutants_path.exists():
                 os.remove(dredd_covered_mutants_path)
@@ -346,152 +877,293 @@ def main(raw_args = None):
             logger.info(f'test_type: {test_name}')
             logger.info(f'test_id: {test_id}')
             
-            # Run tests with unmutated Dawn to find the list of tests that pass
-            env = os.environ.copy()
-            env["VK_ICD_FILENAMES"] = f'{args.vk_icd}'
-            run_unmutated_cmd = [f'{args.mutated_path}/tools/run',
-                    'run-cts', 
-                    '--verbose',
-                    f'--bin={args.mutated_path}/out/Debug',
-                    f'--cts={args.cts_repo}',
-                    query]
-            
-            print("Running with unmutated Dawn...")
-            run_time_start: float = time.time()
-            regular_execution_result: ProcessResult = run_process_with_timeout(
-                cmd=run_unmutated_cmd, 
-                timeout_seconds=args.run_timeout,
-                env=env)
-            run_time_end: float = time.time()
-            run_time = run_time_end - run_time_start
-        
-            if regular_execution_result is None:
-                print("Runtime timeout.")
-                logger.info('Runtime timeout')
-                continue
+            # Covered mutants are taken from the coverage cache if this query has been tracked against this
+            # tracking build, CTS revision and driver before
+            coverage_key = coverage_keys.key(query)
+            cached_coverage = None if coverage_key is None else coverage_cache.get(coverage_key)
+            tracking_cached: bool = cached_coverage is not None
+            mutant_tracking_result : Optional[ProcessResult] = None
 
-            # Parse stdout to find which tests ran and what their outcome was
-            out : list[str] = regular_execution_result.stdout.decode('utf-8').split('\n')
+            # Find the list of tests that pass with unmutated Dawn, running them only if they have not been
+            # run against this build, CTS revision and driver before
+            baseline_key = None if cts_revision is None else BaselineKey(dawn_build, cts_revision, icd, query)
+            unmutated_baseline = None if baseline_key is None else baseline_cache.get(baseline_key)
+            unmutated_cached: bool = unmutated_baseline is not None
+            baseline_source: str = 'cache' if unmutated_cached else 'mutated'
+            baseline_divergence: List[str] = []
+            if unmutated_cached:
+                print(f'Using cached unmutated results for {len(unmutated_baseline.results)} tests')
+                baseline_timing = baseline_timings.get(CTS, query)
+                if baseline_timing is None:
+                    baseline_timing = baseline_timings.record(CTS, query, unmutated_baseline.wall_time,
+                                                              unmutated_baseline.longest_silence)
 
-            unmutated_results : dict[str,str] = get_single_tests_from_stdout(out)
+            # The tracking run has to be made anyway, so its results can stand in for the unmutated run
+            elif args.tracking_baseline and not tracking_cached and not tracking_baseline_diverged:
+                print("Running with mutant tracking compiler as the baseline...")
+                (unmutated_baseline, mutant_tracking_result) = run_unmutated_baseline(args.tracking_path,
+                                                                                      args.cts_repo,
+                                                                                      query,
+                                                                                      args.vk_icd,
+                                                                                      args.run_timeout,
+                                                                                      dredd_covered_mutants_path)
 
-            print(f"Std out:\n {regular_execution_result.stdout.decode('utf-8')}\n")
-            print(f"Std err:\n {regular_execution_result.stderr.decode('utf-8')}\n")
+                if unmutated_baseline is None:
+                    print("Runtime timeout.")
+                    logger.info('Runtime timeout')
+                    finish_query(query, query_start_time, 'runtime_timeout')
+                    continue
+
+                baseline_source = 'tracking'
+                tracking_baselines_since_cross_check += 1
+
+                # The tracking build is instrumented and so slower; its runs are not recorded as baseline
+                # timings, but give the timeouts of a query that has not been timed before
+                baseline_timing = baseline_timings.get(CTS, query)
+                if baseline_timing is None:
+                    baseline_timing = BaselineTiming(1, unmutated_baseline.wall_time, unmutated_baseline.longest_silence)
+
+                # Periodically check that the mutated build agrees with the tracking build, as a reliable test
+                # that only fails on the mutated build would be taken to kill every mutant tried against it
+                if tracking_baselines_since_cross_check >= args.tracking_baseline_cross_check_interval:
+                    tracking_baselines_since_cross_check = 0
+                    print("Cross-checking the tracking baseline against unmutated Dawn...")
+                    (mutated_baseline, _) = run_unmutated_baseline(args.mutated_path,
+                                                                  args.cts_repo,
+                                                                  query,
+                                                                  args.vk_icd,
+                                                                  args.run_timeout)
+                    if mutated_baseline is None:
+                        print("Cross-check timed out; keeping the tracking baseline.")
+                        logger.info('Tracking baseline cross-check timed out')
+                    else:
+                        if baseline_key is not None:
+                            baseline_cache.record(baseline_key, mutated_baseline)
+                        baseline_timing = baseline_timings.record(CTS, query, mutated_baseline.wall_time,
+                                                                  mutated_baseline.longest_silence)
+                        baseline_divergence = get_baseline_divergence(unmutated_baseline.results,
+                                                                      mutated_baseline.results)
+                        if baseline_divergence:
+                            print(f'WARNING: the tracking and mutated builds disagree on {len(baseline_divergence)} '
+                                  f'tests, e.g. {baseline_divergence[:5]}; using unmutated runs of the mutated build '
+                                  f'as the baseline from now on')
+                            logger.info(f'Tracking baseline diverged on {len(baseline_divergence)} tests')
+                            tracking_baseline_diverged = True
+                        unmutated_baseline = mutated_baseline
+                        baseline_source = 'mutated'
+
+            else:
+                print("Running with unmutated Dawn...")
+                (unmutated_baseline, regular_execution_result) = run_unmutated_baseline(args.mutated_path,
+                                                                                        args.cts_repo,
+                                                                                        query,
+                                                                                        args.vk_icd,
+                                                                                        args.run_timeout)
+
+                if unmutated_baseline is None:
+                    print("Runtime timeout.")
+                    logger.info('Runtime timeout')
+                    finish_query(query, query_start_time, 'runtime_timeout')
+                    continue
+
+                print(f"Std out:\n {regular_execution_result.stdout.decode('utf-8')}\n")
+                print(f"Std err:\n {regular_execution_result.stderr.decode('utf-8')}\n")
+
+                if baseline_key is not None:
+                    baseline_cache.record(baseline_key, unmutated_baseline)
+
+                # Timeouts for this query are derived from the slowest unmutated run recorded for it, in this
+                # campaign or an earlier one; the longest it goes without completing a test sets how long mutant
+                # runs may
+                baseline_timing = baseline_timings.record(CTS, query, unmutated_baseline.wall_time,
+                                                          unmutated_baseline.longest_silence)
+
+            # The unmutated run is made alone, but up to max_in_flight mutant runs share the machine
+            mutant_timeout: float = get_execution_timeout(baseline_timing.wall_time, limit=args.compile_timeout,
+                                                          concurrency=args.max_in_flight)
+            tracking_timeout: float = get_compilation_timeout(baseline_timing.wall_time, limit=args.compile_timeout)
+            silence_timeout: float = get_silence_timeout(baseline_timing.longest_silence,
+                                                         concurrency=args.max_in_flight)
+            print(f'Unmutated run took {unmutated_baseline.wall_time:.1f}s (slowest recorded '
+                  f'{baseline_timing.wall_time:.1f}s), longest silence {unmutated_baseline.longest_silence:.1f}s; '
+                  f'timeouts: tracking {tracking_timeout:.1f}s, mutant runs {mutant_timeout:.1f}s, '
+                  f'silence {silence_timeout:.1f}s')
+
+            unmutated_results : dict[str,str] = unmutated_baseline.results
 
             # If all tests in the query fail with the unmutated dawn, then move on to next query
             if 'pass' not in unmutated_results.values():
                 print('No tests pass with unmutated Dawn; skipping query')
                 logger.info('No tests pass with unmutated Dawn; skipping query')
+                finish_query(query, query_start_time, 'no_unmutated_passes')
                 continue
 
-            # Run the test with mutant tracking enabled
-            print("Running with mutant tracking compiler...")
-            tracking_environment = os.environ.copy()
-            tracking_environment["DREDD_MUTANT_TRACKING_FILE"] = str(dredd_covered_mutants_path)
-            tracking_environment["VK_ICD_FILENAMES"] = f'{args.vk_icd}'
-            tracking_compile_cmd = [f'{args.tracking_path}/tools/run',
-                    'run-cts', 
-                    '--verbose',
-                    f'--bin={args.tracking_path}/out/Debug',
-                    f'--cts={args.cts_repo}',
-                    query]            
-            
-            mutant_tracking_result : ProcessResult = run_process_with_timeout(cmd=tracking_compile_cmd, 
-                                                                              timeout_seconds=args.compile_timeout, 
-                                                                              env=tracking_environment) 
-            
-            if mutant_tracking_result is None:
-                print("Mutant tracking compilation timed out.")
-                logger.info('Mutant tracking compilation timed out')
+            # Only a failure of one of these tests kills a mutant; mutant runs for
+            # this query stop at the first such failure
+            unmutated_reliable_pass : Set[str] = get_unmutated_reliable_passes(unmutated_results, reliable_tests)
+            if not unmutated_reliable_pass:
+                print('No reliable tests pass with unmutated Dawn; skipping query')
+                logger.info('No reliable tests pass with unmutated Dawn; skipping query')
+                finish_query(query, query_start_time, 'no_unmutated_reliable_passes')
                 continue
-            
-            elif not dredd_covered_mutants_path.exists():
-                print(f"Std out:\n {mutant_tracking_result.stdout.decode('utf-8')}\n")
-                print(f"Std err:\n {mutant_tracking_result.stderr.decode('utf-8')}\n")
-                print("No mutant tracking file created.")
-                logger.info('No mutant tracking file created')
-                with open(Path(args.mutant_kill_path,f'tracking/no_tracking_file_{test_name}_{test_id}.txt'), 'w') as f:
-                    f.write(query)
-                continue
-            
+
+            if tracking_cached:
+                print(f"Using cached mutant coverage: {len(cached_coverage.covered)} mutants")
+                covered_mutants_info = ''.join([f'{mutant}\n' for mutant in cached_coverage.covered])
+                mutant_tracking_usage = cached_coverage.resource_usage
             else:
+                # Run the test with mutant tracking enabled, unless it was run as the baseline
+                if mutant_tracking_result is None:
+                    print("Running with mutant tracking compiler...")
+                    tracking_environment = os.environ.copy()
+                    tracking_environment["DREDD_MUTANT_TRACKING_FILE"] = str(dredd_covered_mutants_path)
+                    tracking_environment["VK_ICD_FILENAMES"] = f'{args.vk_icd}'
+                    tracking_compile_cmd = [f'{args.tracking_path}/tools/run',
+                            'run-cts', 
+                            '--verbose',
+                            f'--bin={args.tracking_path}/out/Debug',
+                            f'--cts={args.cts_repo}',
+                            query]            
+                    
+                    mutant_tracking_result = run_process_with_timeout(cmd=tracking_compile_cmd, 
+                                                                      timeout_seconds=tracking_timeout, 
+                                                                      env=tracking_environment) 
+                
+                if mutant_tracking_result is None:
+                    print("Mutant tracking compilation timed out.")
+                    logger.info('Mutant tracking compilation timed out')
+                    finish_query(query, query_start_time, 'tracking_timeout')
+                    continue
+                
+                elif not dredd_covered_mutants_path.exists():
+                    print(f"Std out:\n {mutant_tracking_result.stdout.decode('utf-8')}\n")
+                    print(f"Std err:\n {mutant_tracking_result.stderr.decode('utf-8')}\n")
+                    print("No mutant tracking file created.")
+                    logger.info('No mutant tracking file created')
+                    with open(Path(args.mutant_kill_path,f'tracking/no_tracking_file_{test_name}_{test_id}.txt'), 'w') as f:
+                        f.write(query)
+                    finish_query(query, query_start_time, 'no_tracking_file')
+                    continue
+                
                 print("Mutant tracking compilation complete")
+                print(f"Std out:\n {mutant_tracking_result.stdout.decode('utf-8')}\n")
+                print(f"Std err:\n {mutant_tracking_result.stderr.decode('utf-8')}\n")
                 with open(dredd_covered_mutants_path, 'r') as f:
                     covered_mutants_info = f.read()
-                with open(Path(args.mutant_kill_path,f'tracking/mutant_tracking_file_{test_name}_{test_id}.txt'), 'w') as f:
-                    f.write(query)
-                    f.write(covered_mutants_info)
+                mutant_tracking_usage = mutant_tracking_result.resource_usage()
 
-            print(f"Std out:\n {mutant_tracking_result.stdout.decode('utf-8')}\n")
-            print(f"Std err:\n {mutant_tracking_result.stderr.decode('utf-8')}\n")
-            
-            # Load covered mutants into a list. We go from list to set to list to eliminate duplicates.
-            covered_by_this_test: List[int] = list(set([int(line.strip()) for line in
-                                                        open(dredd_covered_mutants_path, 'r').readlines()]))
-            covered_by_this_test.sort()
+            with open(Path(args.mutant_kill_path,f'tracking/mutant_tracking_file_{test_name}_{test_id}.txt'), 'w') as f:
+                f.write(query)
+                f.write(covered_mutants_info)
+
+            # Load covered mutants into a sorted list without duplicates; some lines of a tracking file hold more than one
+            covered_by_this_test: List[int] = sorted(set([int(mutant) for mutant in covered_mutants_info.split()]))
+            if coverage_key is not None and not tracking_cached:
+                coverage_cache.record(coverage_key, covered_by_this_test, mutant_tracking_usage)
             candidate_mutants_for_this_test: List[int] = ([m for m in covered_by_this_test if m not in killed_mutants])
             
             print("Number of mutants to try: " + str(len(candidate_mutants_for_this_test)))
             already_killed_by_other_tests: List[int] = ([m for m in covered_by_this_test if m in killed_mutants])
             killed_by_this_test: List[int] = []
             covered_but_not_killed_by_this_test: List[int] = []
+
+            # Mutants decided before an interruption are not run again
+            resumed_outcomes = journal.outcomes(query)
+            if resumed_outcomes:
+                print(f'Resuming query {query}: {len(resumed_outcomes)} mutants were decided before an interruption')
+                logger.info(f'Resuming with {len(resumed_outcomes)} mutants decided')
+            for mutant in [m for m in candidate_mutants_for_this_test if m in resumed_outcomes]:
+                if resumed_outcomes[mutant]["outcome"] == KILLED:
+                    unkilled_mutants.remove(mutant)
+                    killed_mutants.add(mutant)
+                    killed_by_this_test.append(mutant)
+                else:
+                    covered_but_not_killed_by_this_test.append(mutant)
+            candidate_mutants_for_this_test = [m for m in candidate_mutants_for_this_test if m not in resumed_outcomes]
                        
             logger.info(f'Number of mutants to try: {str(len(candidate_mutants_for_this_test))}')
 
-            # Enable mutants one at a time
-            # Check whether any tests within the current query that previously passed now fail
-            for mutant in candidate_mutants_for_this_test:
+            env = os.environ.copy()
+            env["VK_ICD_FILENAMES"] = f'{args.vk_icd}'
+            mutated_cmd = [f'{args.mutated_path}/tools/run',
+                'run-cts', 
+                '--verbose',
+                f'--bin={args.mutated_path}/out/Debug',
+                '--cts',
+                str(args.cts_repo),
+                query]    
 
-                mutant_path = Path(args.mutant_kill_path,f'killed_mutants/{str(mutant)}')
-                if mutant_path.exists():
-                    print("Skipping mutant " + str(mutant) + " as it is noted as already killed.")
-                    unkilled_mutants.remove(mutant)
-                    killed_mutants.add(mutant)
-                    already_killed_by_other_tests.append(mutant)
-                    print(f'Unkilled mutants: {unkilled_mutants}')
-                    continue
-                
-                print("Trying mutant " + str(mutant))
-                
-                env = os.environ.copy()
-                env["VK_ICD_FILENAMES"] = f'{args.vk_icd}'
-                mutated_cmd = [f'{args.mutated_path}/tools/run',
-                    'run-cts', 
-                    '--verbose',
-                    f'--bin={args.mutated_path}/out/Debug',
-                    '--cts',
-                    str(args.cts_repo),
-                    query]    
-
-                (mutant_result, failing_tests) = run_webgpu_cts_test_with_mutants(mutants=[mutant],
+            # Resource usage of every mutant run, including the runs needed to bisect batches
+            mutant_runs_usage = ResourceUsage()
+            mutant_resource_usage = {}
+
+            async def run_mutants(mutants: List[int]) -> tuple[CTSKillStatus, list, ProcessResult]:
+                result = await run_webgpu_cts_test_with_mutants_async(engine=engine,
+                        mutants=mutants,
                         mutated_cmd=mutated_cmd,
-                        timeout_seconds=args.compile_timeout,
-                        unmutated_results = unmutated_results,
-                        reliable_tests = reliably_passing_tests,
-                        env=env)
-                
-                #kill_gpu_processes('node')
+                        timeout_seconds=mutant_timeout,
+                        unmutated_reliable_pass = unmutated_reliable_pass,
+                        env=env,
+                        silence_timeout_seconds=silence_timeout,
+                        stdout_spool=get_mutant_stdout_spool(query_output_directory, mutants))
+                mutant_runs_usage.add(result[2])
+                return result
 
-                print(f'Mutant result: {mutant_result}')
+            async def evaluate_batch(mutants: List[int]) -> dict:
+                return await group_test_mutants_async(mutants,
+                    run_mutants=run_mutants,
+                    survived=lambda result: result[0] == CTSKillStatus.SURVIVED)
 
-                if mutant_result == CTSKillStatus.SURVIVED or mutant_result == CTSKillStatus.TEST_TIMEOUT:
-                    covered_but_not_killed_by_this_test.append(mutant)
-                    continue
+            # Enable compatible mutants together, bisecting a batch only if it does not survive
+            # Check whether any tests within the current query that previously passed now fail
+            batches_to_try: List[List[int]] = []
+            for batch in pack_compatible_mutants(candidate_mutants_for_this_test, mutation_tree, args.batch_size):
 
-                unkilled_mutants.remove(mutant)
-                killed_mutants.add(mutant)
-                killed_by_this_test.append(mutant)
-                print(f"Kill! Mutants killed so far: {len(killed_mutants)}")
-                try:
-                    mutant_path.mkdir()
+                mutants_to_try: List[int] = []
+                for mutant in batch:
+                    if is_noted_as_killed(args.mutant_kill_path, results_store, mutant):
+                        print("Skipping mutant " + str(mutant) + " as it is noted as already killed.")
+                        unkilled_mutants.remove(mutant)
+                        killed_mutants.add(mutant)
+                        already_killed_by_other_tests.append(mutant)
+                        print(f'Unkilled mutants: {unkilled_mutants}')
+                        continue
+                    mutants_to_try.append(mutant)
+
+                if mutants_to_try:
+                    batches_to_try.append(mutants_to_try)
+
+            # Batches are evaluated concurrently; results are recorded as each batch completes
+            for (mutants_to_try, batch_results) in engine.map_unordered(evaluate_batch, batches_to_try):
+
+                for mutant in mutants_to_try:
+                    (mutant_result, failing_tests, mutated_result) = batch_results[mutant]
+                    mutant_resource_usage[mutant] = get_resource_usage(mutated_result)
+                    if results_store is not None:
+                        results_store.record_run(query, mutant, str(mutant_result), mutant_resource_usage[mutant])
+
+                    print(f'Mutant {mutant} result: {mutant_result}')
+
+                    if mutant_result == CTSKillStatus.SURVIVED or mutant_result == CTSKillStatus.TEST_TIMEOUT:
+                        covered_but_not_killed_by_this_test.append(mutant)
+                        journal.record_outcome(query, mutant, SURVIVED, str(mutant_result))
+                        continue
+
+                    unkilled_mutants.remove(mutant)
+                    killed_mutants.add(mutant)
+                    killed_by_this_test.append(mutant)
+                    print(f"Kill! Mutants killed so far: {len(killed_mutants)}")
                     print("Writing kill info to file.")
-                    with open(mutant_path / "kill_info.json", "w") as outfile:
-                        json.dump({"killing_query": query,
-                                   "killing_tests" : list(failing_tests),
-                                   "kill_type": str(mutant_result)}, outfile)
-                except FileExistsError:
-                    print(f"Mutant {mutant} was independently discovered to be killed.")
-                    continue
+                    noted = note_kill(args.mutant_kill_path, results_store, mutant, query,
+                                      {"killing_query": query,
+                                       "killing_tests" : list(failing_tests),
+                                       "kill_type": str(mutant_result),
+                                       "stdout_spool": get_mutant_spool_info(mutated_result),
+                                       "resource_usage": mutant_resource_usage[mutant]})
+                    journal.record_outcome(query, mutant, KILLED, str(mutant_result))
+                    if not noted:
+                        print(f"Mutant {mutant} was independently discovered to be killed.")
+                        continue
 
             all_considered_mutants = killed_by_this_test \
                 + covered_but_not_killed_by_this_test \
@@ -501,12 +1173,27 @@ def main(raw_args = None):
             killed_by_this_test.sort()
             covered_but_not_killed_by_this_test.sort()
             already_killed_by_other_tests.sort()
+            kill_summary = {"query": query,
+                            "covered_mutants": covered_by_this_test,
+                            "killed_mutants": killed_by_this_test,
+                            "skipped_mutants": already_killed_by_other_tests,
+                            "survived_mutants": covered_but_not_killed_by_this_test,
+                            "unmutated_cached": unmutated_cached,
+                            "baseline_source": baseline_source,
+                            "baseline_divergence": baseline_divergence,
+                            "tracking_cached": tracking_cached,
+                            "resource_usage": {"unmutated": unmutated_baseline.resource_usage,
+                                               "mutant_tracking": mutant_tracking_usage,
+                                               "mutant_runs": mutant_runs_usage.to_json()},
+                            "timeouts": {"mutant_tracking": tracking_timeout,
+                                         "mutant_runs": mutant_timeout,
+                                         "silence": silence_timeout},
+                            "mutant_resource_usage": mutant_resource_usage}
             with open(Path(query_output_directory,'kill_summary.json'), "w") as outfile:
-                json.dump({"query": query,
-                           "covered_mutants": covered_by_this_test,
-                           "killed_mutants": killed_by_this_test,
-                           "skipped_mutants": already_killed_by_other_tests,
-                           "survived_mutants": covered_but_not_killed_by_this_test}, outfile)
+                json.dump(kill_summary, outfile)
+            if results_store is not None:
+                results_store.record_test_summary(query, 'cts', kill_summary)
+            finish_query(query, query_start_time)
             
             logger.info('Query complete')
 
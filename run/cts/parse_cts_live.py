@@ -4,6 +4,9 @@ import signal
 from pathlib import Path
 import time
 
+from common.cts_output import CTSOutputParser, TestResult
+from run.cts.reliable_test_index import load_reliable_test_index
+
 def execute(cmd):
     popen = subprocess.Popen(cmd,
             stdout=subprocess.PIPE,
@@ -24,6 +27,7 @@ def main():
     cts = Path('/data/dev/webgpu_cts')
     dawn = Path('/data/dev/dawn_mutated')
     vk_icd="/data/dev/mesa/build/install/share/vulkan/icd.d/lvp_icd.x86_64.json" 
+    reliable_tests = load_reliable_test_index(Path('/data/work/webgpu/testing/out_spirv/reliable_tests.json'))
 
     # Run CTS query and parse stdout live
     env = os.environ.copy()
@@ -40,6 +44,7 @@ def main():
 
     
     start_time = time.time()
+    parser = CTSOutputParser()
     with subprocess.Popen(shell_cmd, 
         stdout=subprocess.PIPE, 
         universal_newlines=True, 
@@ -49,11 +54,12 @@ def main():
         for line in p.stdout:
             print(line,end='')
 
-            if f' - fail' in line:
-                test = line[:line.index(' ')] 
-                if test in reliable_tests
+            failed = [event.test for event in parser.feed_line(line.rstrip('\n'))
+                      if isinstance(event, TestResult) and event.status == 'fail']
+            if any(test in reliable_tests for test in failed):
                 print('EXITING!!!')
                 os.killpg(os.getpgid(p.pid), signal.SIGTERM)
+                break
 
     
     end_time = time.time()
@@ -0,0 +1,292 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from common.run_process_with_timeout import ProcessResult, run_process_with_timeout
+
+QUERY_CATALOGUE_FILE_NAME = 'query_catalogue.json'
+SPEC_FILE_SUFFIX = '.spec.ts'
+
+# Time allowed for the CTS to list the cases of one file
+LIST_CASES_TIMEOUT_SECONDS: float = 300.0
+
+
+def git(cts_repo: Path, *args: str) -> Optional[str]:
+    '''
+    Output of a git command run in cts_repo, or None if it fails, e.g.
+    because the CTS is not a git checkout.
+    '''
+    try:
+        result = subprocess.run(['git', '-C', str(cts_repo)] + list(args), capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.decode('utf-8', errors='replace')
+
+
+def hash_blob(path: Path) -> str:
+    '''
+    Hash git would give the file's content, so that a modified file that is
+    changed back matches its committed version again.
+    '''
+    with open(path, 'rb') as f:
+        data = f.read()
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def get_dirty_files(cts_repo: Path) -> List[str]:
+    '''
+    Modified and untracked files under src, relative to the CTS repo.
+    '''
+    status = git(cts_repo, 'status', '--porcelain', '-z', '--untracked-files=all', '--', 'src')
+    if status is None:
+        return []
+    entries = status.split('\0')
+    paths = []
+    index = 0
+    while index < len(entries):
+        entry = entries[index]
+        index += 1
+        if len(entry) < 4:
+            continue
+        paths.append(entry[3:])
+        # Renames are followed by the path they were renamed from
+        if entry[0] in 'RC':
+            index += 1
+    return sorted(paths)
+
+
+def get_cts_revision(cts_repo: Path) -> Optional[str]:
+    '''
+    Identifies the state of the CTS sources: the git HEAD, plus the content
+    of any modified or untracked files under src. Returns None if the CTS is
+    not a git checkout.
+    '''
+    head = git(cts_repo, 'rev-parse', 'HEAD')
+    if head is None:
+        return None
+    dirty_files = get_dirty_files(cts_repo)
+    if not dirty_files:
+        return head.strip()
+
+    sha = hashlib.sha256()
+    for path in dirty_files:
+        full_path = Path(cts_repo, path)
+        sha.update(path.encode('utf-8'))
+        sha.update(hash_blob(full_path).encode('ascii') if full_path.is_file() else b'deleted')
+    return f'{head.strip()}+{sha.hexdigest()[:16]}'
+
+
+def get_spec_file_hashes(cts_repo: Path) -> Dict[str, str]:
+    '''
+    Content hash of every .spec.ts file under src, keyed by its path
+    relative to src. Committed files take their hash from the git index, so
+    only modified files are read.
+    '''
+    src = Path(cts_repo, 'src')
+    listing = git(cts_repo, 'ls-files', '-s', '-z', '--', 'src')
+    if listing is None:
+        return {str(path.relative_to(src)): hash_blob(path) for path in src.rglob(f'*{SPEC_FILE_SUFFIX}')}
+
+    hashes = {}
+    for entry in listing.split('\0'):
+        # <mode> <object> <stage>\t<path>
+        (info, _, path) = entry.partition('\t')
+        if path.endswith(SPEC_FILE_SUFFIX):
+            hashes[str(Path(path).relative_to('src'))] = info.split(' ')[1]
+    for path in get_dirty_files(cts_repo):
+        if not path.endswith(SPEC_FILE_SUFFIX):
+            continue
+        relative_path = str(Path(path).relative_to('src'))
+        full_path = Path(cts_repo, path)
+        if full_path.is_file():
+            hashes[relative_path] = hash_blob(full_path)
+        else:
+            hashes.pop(relative_path, None)
+    return hashes
+
+
+def spec_file_query(relative_path: str) -> str:
+    '''
+    File-level query for a spec file, e.g. webgpu/shader/foo.spec.ts gives
+    webgpu:shader,foo:*
+    '''
+    (suite, *parts) = relative_path.removesuffix(SPEC_FILE_SUFFIX).split('/')
+    return f'{suite}:{",".join(parts)}:*'
+
+
+def is_file_query(query: str) -> bool:
+    '''
+    Whether a query names a single spec file, e.g. webgpu:shader,foo:*,
+    rather than a directory (webgpu:shader,*) or a whole suite (webgpu:*).
+    '''
+    return query.endswith(':*') and query.count(':') == 2
+
+
+def list_cases(cts_repo: Path, query: str) -> Optional[List[str]]:
+    '''
+    Asks the CTS to list the cases matching a query, without running them.
+    Returns None if the listing fails.
+    '''
+    cmd = [str(Path(cts_repo, 'tools', 'run_node')), '--list', query]
+    result: ProcessResult = run_process_with_timeout(cmd=cmd, timeout_seconds=LIST_CASES_TIMEOUT_SECONDS, cwd=cts_repo)
+    if result is None or result.returncode != 0:
+        return None
+    suite = query.partition(':')[0] + ':'
+    return [line.strip() for line in result.stdout.decode('utf-8', errors='replace').split('\n')
+            if line.startswith(suite)]
+
+
+class QueryCatalogue:
+    '''
+    File-level and case-level CTS queries, cached in a JSON file so they do
+    not have to be rediscovered for every campaign. Files are walked from
+    the git index rather than the file system, and the cases of a file are
+    listed by the CTS (without running them) the first time they are asked
+    for. Each spec file is stored with its content hash, so when the CTS
+    changes only the cases of the files that changed are listed again.
+    '''
+
+    def __init__(self, cts_repo: Path, path: Path = None):
+        self.cts_repo: Path = Path(cts_repo)
+        self.path: Path = Path(path) if path is not None else get_default_query_catalogue_path(cts_repo)
+        self.revision: Optional[str] = None
+        # Spec file path relative to src -> {"hash": h, "cases": [...] or None until listed}
+        self.files: Dict[str, dict] = {}
+        self._changed: bool = False
+        self._load()
+
+    def _load(self) -> None:
+        cached = {"revision": None, "files": {}}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    cached = json.load(f)
+            except ValueError:
+                print(f'Ignoring unreadable query catalogue {self.path}')
+
+        self.revision = get_cts_revision(self.cts_repo)
+        if self.revision is not None and self.revision == cached["revision"]:
+            self.files = cached["files"]
+            return
+
+        hashes = get_spec_file_hashes(self.cts_repo)
+        (kept, listed) = (0, 0)
+        for (relative_path, file_hash) in hashes.items():
+            entry = cached["files"].get(relative_path)
+            if entry is not None and entry["hash"] == file_hash:
+                kept += 1
+            else:
+                entry = {"hash": file_hash, "cases": None}
+            self.files[relative_path] = entry
+            if entry["cases"] is not None:
+                listed += 1
+        print(f'CTS changed since the query catalogue was saved: {len(hashes) - kept} of {len(hashes)} '
+              f'spec files are new or changed, {listed} still have their cases listed')
+        self._changed = True
+        self.save()
+
+    def save(self) -> None:
+        '''
+        Writes the catalogue if it has changed. The file is replaced
+        atomically, so concurrent readers never see a partial catalogue.
+        '''
+        if not self._changed:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        (fd, temp_path) = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"revision": self.revision, "files": self.files}, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._changed = False
+
+    def _matching_files(self, query: str) -> List[str]:
+        '''
+        Spec files holding tests matched by a query, in path order.
+        '''
+        prefix = query.removesuffix('*')
+        matching = []
+        for relative_path in sorted(self.files):
+            file_prefix = spec_file_query(relative_path).removesuffix('*')
+            if file_prefix.startswith(prefix) or prefix.startswith(file_prefix):
+                matching.append(relative_path)
+        return matching
+
+    def file_queries(self, query: str) -> List[str]:
+        '''
+        File-level queries for all tests matched by a query, e.g.
+        'webgpu:*' or 'webgpu:shader,*'. A query that already names a file is
+        returned as it is.
+        '''
+        if is_file_query(query):
+            return [query]
+        return [spec_file_query(relative_path) for relative_path in self._matching_files(query)]
+
+    def case_queries(self, query: str, failed_files: List[str] = None) -> List[str]:
+        '''
+        Individual test cases matched by a query, listing the cases of any
+        file that has not been listed at this CTS revision. The file-level
+        queries of files that could not be listed, or that have no cases,
+        are added to failed_files.
+        '''
+        if '*' not in query:
+            return [query]
+        prefix = query.removesuffix('*')
+        cases = []
+        for relative_path in self._matching_files(query):
+            entry = self.files[relative_path]
+            if entry["cases"] is None:
+                file_query = spec_file_query(relative_path)
+                print(f'Listing the cases of {file_query}')
+                listed = list_cases(self.cts_repo, file_query)
+                if listed is None:
+                    if failed_files is not None:
+                        failed_files.append(file_query)
+                    continue
+                entry["cases"] = listed
+                self._changed = True
+            if not entry["cases"] and failed_files is not None:
+                failed_files.append(spec_file_query(relative_path))
+            cases.extend([case for case in entry["cases"] if case.startswith(prefix)])
+        self.save()
+        return cases
+
+
+def get_default_query_catalogue_path(cts_repo: Path) -> Path:
+    # The CTS ignores its out directory, so the catalogue does not show up as a change to the CTS
+    return Path(cts_repo, 'out', QUERY_CATALOGUE_FILE_NAME)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("cts_repo",
+                        type=Path,
+                        help="Path to the WebGPU CTS.")
+    parser.add_argument("query",
+                        type=str,
+                        help="Query to list, e.g. 'webgpu:shader,*'.")
+    parser.add_argument("--cases",
+                        default=False,
+                        action=argparse.BooleanOptionalAction,
+                        help="List individual test cases rather than file-level queries. Default is false.")
+    parser.add_argument("--query_catalogue",
+                        type=Path,
+                        help="Cached query catalogue. Defaults to out/query_catalogue.json in the CTS repo.")
+    args = parser.parse_args()
+
+    catalogue = QueryCatalogue(args.cts_repo, args.query_catalogue)
+    queries = catalogue.case_queries(args.query) if args.cases else catalogue.file_queries(args.query)
+    print(json.dumps(queries, indent=4))
+
+
+if __name__ == '__main__':
+    main()
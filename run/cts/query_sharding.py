@@ -0,0 +1,152 @@
+import argparse
+import heapq
+import json
+import sqlite3
+import time
+
+from pathlib import Path
+from statistics import median
+from typing import Dict, List
+
+BUSY_TIMEOUT_SECONDS: float = 60.0
+QUERY_RUNTIMES_FILE_NAME = 'query_runtimes.sqlite'
+
+# Weight of the latest run in a query's expected runtime
+RECENT_RUN_WEIGHT: float = 0.5
+
+
+class QueryRuntimes:
+    '''
+    How long each leaf CTS query takes to process, kept in a SQLite file
+    that every kill process updates after each query and that is reused by
+    later campaigns. The expected runtime of a query is an exponentially
+    weighted average over its runs, so it follows changes in the build or
+    the node without being thrown by a single slow run.
+    '''
+
+    def __init__(self, path: Path):
+        self.path: Path = Path(path)
+        self._connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS query_runtimes (
+                query TEXT PRIMARY KEY,
+                runs INTEGER NOT NULL,
+                expected_wall_time REAL NOT NULL,
+                last_wall_time REAL NOT NULL,
+                updated REAL NOT NULL
+            )''')
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'QueryRuntimes':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def record(self, query: str, wall_time: float) -> None:
+        with self._connection:
+            self._connection.execute('''
+                INSERT INTO query_runtimes (query, runs, expected_wall_time, last_wall_time, updated)
+                VALUES (?, 1, ?, ?, ?)
+                ON CONFLICT (query) DO UPDATE SET
+                    runs = runs + 1,
+                    expected_wall_time = ? * excluded.last_wall_time + (1 - ?) * expected_wall_time,
+                    last_wall_time = excluded.last_wall_time,
+                    updated = excluded.updated''',
+                (query, wall_time, wall_time, time.time(), RECENT_RUN_WEIGHT, RECENT_RUN_WEIGHT))
+
+    def expected_wall_times(self) -> Dict[str, float]:
+        rows = self._connection.execute('SELECT query, expected_wall_time FROM query_runtimes').fetchall()
+        return {query: wall_time for (query, wall_time) in rows}
+
+
+def get_default_query_runtimes_path(mutant_kill_path: Path) -> Path:
+    return Path(mutant_kill_path, QUERY_RUNTIMES_FILE_NAME)
+
+
+def estimate_runtimes(queries: List[str], known_wall_times: Dict[str, float]) -> Dict[str, float]:
+    '''
+    Expected runtime of each query. Queries that have not been run before
+    are assumed to take the median time of those that have.
+    '''
+    known = [known_wall_times[query] for query in queries if query in known_wall_times]
+    default_wall_time = median(known) if known else 1.0
+    return {query: known_wall_times.get(query, default_wall_time) for query in queries}
+
+
+def shard_queries(queries: List[str], expected_wall_times: Dict[str, float], num_shards: int) -> List[List[str]]:
+    '''
+    Splits queries into num_shards shards with balanced expected runtime,
+    using longest-processing-time-first: queries are taken in decreasing
+    order of runtime and each goes to the shard with the least work so far.
+    The split only depends on its inputs, so processes given the same
+    queries and runtimes agree on it and can each take one shard. Each shard
+    lists its longest queries first.
+    '''
+    assert num_shards >= 1
+    shards: List[List[str]] = [[] for _ in range(num_shards)]
+    # (expected runtime so far, shard index)
+    loads = [(0.0, index) for index in range(num_shards)]
+    for query in sorted(set(queries), key=lambda query: (-expected_wall_times[query], query)):
+        (load, index) = heapq.heappop(loads)
+        shards[index].append(query)
+        heapq.heappush(loads, (load + expected_wall_times[query], index))
+    return shards
+
+
+def write_query_shards(queries: List[str],
+                       query_runtimes_path: Path,
+                       num_shards: int,
+                       output_dir: Path) -> List[Path]:
+    '''
+    Splits queries into num_shards shards balanced by their recorded
+    runtimes and writes each to a query file (for query_source 'file'),
+    returning the files. The split is made once, before the kill processes
+    start, so they share one plan even though they update the runtimes as
+    they go.
+    '''
+    known_wall_times = {}
+    if query_runtimes_path.exists():
+        with QueryRuntimes(query_runtimes_path) as query_runtimes:
+            known_wall_times = query_runtimes.expected_wall_times()
+    expected_wall_times = estimate_runtimes(queries, known_wall_times)
+
+    shard_files = []
+    for (index, shard) in enumerate(shard_queries(queries, expected_wall_times, num_shards)):
+        print(f'Shard {index}: {len(shard)} queries, expected runtime '
+              f'{sum([expected_wall_times[query] for query in shard]):.0f}s')
+        shard_file = Path(output_dir, f'query_shard_{index}_of_{num_shards}.json')
+        with open(shard_file, 'w') as f:
+            json.dump(shard, f, indent=4)
+        shard_files.append(shard_file)
+    return shard_files
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("query_file",
+                        type=Path,
+                        help="JSON list of the leaf CTS queries to split.")
+    parser.add_argument("num_shards",
+                        type=int,
+                        help="Number of shards, e.g. one per kill process.")
+    parser.add_argument("output_dir",
+                        type=Path,
+                        help="Directory in which to write a query file per shard.")
+    parser.add_argument("--query_runtimes",
+                        type=Path,
+                        required=True,
+                        help="Query runtimes recorded by earlier kill runs.")
+    args = parser.parse_args()
+
+    with open(args.query_file, 'r') as f:
+        queries = json.load(f)
+    for shard_file in write_query_shards(queries, args.query_runtimes, args.num_shards, args.output_dir):
+        print(shard_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+INDEX_VERSION = 2
+
+
+class ReliableTestIndex:
+    '''
+    Index over the individual CTS tests that pass reliably with unmutated
+    Dawn, held as a sorted list without duplicates. Membership, used for
+    every line of CTS output, is a binary search, and all tests under a CTS
+    query (e.g. 'webgpu:shader,*' or
+    'webgpu:shader,execution,flow_control,complex:*') form a contiguous
+    range that is found by binary search on the query's prefix. The sorted
+    list is all there is to the index, so a persisted index is used as read.
+    '''
+
+    def __init__(self, tests: Iterable[str]):
+        self.tests: List[str] = sorted(set(tests))
+
+    def __contains__(self, test) -> bool:
+        index = bisect_left(self.tests, test)
+        return index < len(self.tests) and self.tests[index] == test
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tests)
+
+    def __len__(self) -> int:
+        return len(self.tests)
+
+    def _range_under(self, query: str) -> range:
+        if not query.endswith('*'):
+            # An individual test
+            start = bisect_left(self.tests, query)
+            return range(start, start + 1 if query in self else start)
+        prefix = query[:-1]
+        start = bisect_left(self.tests, prefix)
+        # Smallest string greater than every string starting with prefix
+        end = bisect_left(self.tests, prefix + '\U0010ffff')
+        return range(start, end)
+
+    def tests_under(self, query: str) -> List[str]:
+        r = self._range_under(query)
+        return self.tests[r.start:r.stop]
+
+    def count_under(self, query: str) -> int:
+        return len(self._range_under(query))
+
+    def save(self, index_file: Path, source: dict = None) -> None:
+        '''
+        Writes the index to a temporary file that is renamed into place, so
+        concurrent readers never see a partial index.
+        '''
+        index_file = Path(index_file)
+        (fd, temp_path) = tempfile.mkstemp(dir=index_file.parent, prefix=index_file.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"version": INDEX_VERSION,
+                           "source": source,
+                           "tests": self.tests}, f)
+            os.replace(temp_path, index_file)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, index_file: Path, source: dict = None) -> Optional['ReliableTestIndex']:
+        '''
+        Reads an index written by save, or returns None if it is missing,
+        from another version or was built from a different source.
+        '''
+        try:
+            with open(index_file, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if data.get("version") != INDEX_VERSION or data.get("source") != source:
+            return None
+        index = cls.__new__(cls)
+        # Saved sorted and without duplicates
+        index.tests = data["tests"]
+        return index
+
+
+def get_index_file(reliable_tests_file: Path) -> Path:
+    return Path(reliable_tests_file).with_suffix('.index.json')
+
+
+def get_source(reliable_tests_file: Path) -> dict:
+    # The reliable tests file is only rewritten when the tests are found again, so its size and
+    # modification time identify its contents without reading it
+    stat = os.stat(reliable_tests_file)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_reliable_test_index(reliable_tests_file: Path, reliable_tests: List[str] = None) -> ReliableTestIndex:
+    '''
+    Returns the index for a reliable_tests.json file, reusing the index
+    persisted next to it if the file is unchanged since it was built, in
+    which case the file itself is not read. On a miss the index is built
+    (from reliable_tests if already loaded) and saved for later runs.
+    '''
+    source = get_source(reliable_tests_file)
+
+    index_file = get_index_file(reliable_tests_file)
+    index = ReliableTestIndex.load(index_file, source)
+    if index is not None:
+        print(f'Using reliable test index {index_file}')
+        return index
+
+    if reliable_tests is None:
+        with open(reliable_tests_file, 'r') as f:
+            reliable_tests = json.load(f)
+    index = ReliableTestIndex(reliable_tests)
+    try:
+        index.save(index_file, source)
+    except OSError as e:
+        print(f'Could not write reliable test index {index_file}: {e}')
+    return index
@@ -0,0 +1,108 @@
+import json
+
+from pathlib import Path
+from statistics import median
+from typing import Dict, Iterable, List, Optional
+
+
+class QueryStats:
+    def __init__(self):
+        self.runs: int = 0
+        self.kills: int = 0
+        # Total wall time of the runs that have a recorded time
+        self.wall_time: float = 0.0
+        self.timed_runs: int = 0
+
+    def kill_rate(self) -> float:
+        # Laplace smoothing, so queries without history start at 1/2
+        return (self.kills + 1) / (max(self.runs, self.kills) + 2)
+
+    def mean_wall_time(self) -> Optional[float]:
+        return self.wall_time / self.timed_runs if self.timed_runs else None
+
+
+class KillHistory:
+    '''
+    Per-query kill rates and runtimes learned from earlier mutant runs,
+    used to order the queries covering a mutant so that those most likely
+    to kill it per second of runtime run first. Running stops at the first
+    kill, so the order changes how quickly a mutant is killed but not
+    whether it is.
+    '''
+
+    def __init__(self):
+        self.stats: Dict[str, QueryStats] = {}
+
+    def _stats(self, query: str) -> QueryStats:
+        return self.stats.setdefault(query, QueryStats())
+
+    def record_run(self, query: str, killed: bool, wall_time: Optional[float] = None) -> None:
+        stats = self._stats(query)
+        stats.runs += 1
+        if killed:
+            stats.kills += 1
+        if wall_time is not None:
+            stats.wall_time += wall_time
+            stats.timed_runs += 1
+
+    def expected_cost(self, query: str, default_wall_time: float) -> float:
+        '''
+        Runtime per expected kill. Running queries in increasing order of
+        this minimises the expected time to the first kill.
+        '''
+        stats = self.stats.get(query, QueryStats())
+        wall_time = stats.mean_wall_time()
+        if wall_time is None:
+            wall_time = default_wall_time
+        return wall_time / stats.kill_rate()
+
+    def order(self, queries: Iterable[str]) -> List[str]:
+        known_times = [stats.mean_wall_time() for stats in self.stats.values()
+                       if stats.mean_wall_time() is not None]
+        default_wall_time = median(known_times) if known_times else 1.0
+        return sorted(queries, key=lambda query: (self.expected_cost(query, default_wall_time), query))
+
+
+def load_kill_history(mutant_kill_path: Path) -> KillHistory:
+    '''
+    Builds a KillHistory from the kill_summary.json files of earlier CTS
+    kill runs under mutant_kill_path. Kills are taken from the
+    killed_mutants/*/kill_info.json files, which also cover kills recorded
+    by other processes.
+    '''
+    history = KillHistory()
+
+    # Processes sharing a work queue write one summary each
+    for summary_file in Path(mutant_kill_path, 'tests').glob('*/kill_summary*.json'):
+        try:
+            with open(summary_file, 'r') as f:
+                summary = json.load(f)
+        except ValueError:
+            continue
+
+        if "query_runs" in summary:
+            # Runs of each query made for a mutant sample
+            for (query, runs) in summary["query_runs"].items():
+                stats = history._stats(query)
+                stats.runs += runs["runs"]
+                stats.wall_time += runs["wall_time"]
+                stats.timed_runs += runs["runs"] - runs["timeouts"]
+        elif "query" in summary and "covered_mutants" in summary:
+            # Per-query kill run: one run per mutant tried
+            stats = history._stats(summary["query"])
+            stats.runs += len(summary["killed_mutants"]) + len(summary["survived_mutants"])
+            mutant_runs = summary.get("resource_usage", {}).get("mutant_runs")
+            if mutant_runs is not None:
+                stats.wall_time += mutant_runs["wall_time"]
+                stats.timed_runs += mutant_runs["runs"] - mutant_runs["timeouts"]
+
+    for kill_info_file in Path(mutant_kill_path, 'killed_mutants').glob('*/kill_info.json'):
+        try:
+            with open(kill_info_file, 'r') as f:
+                kill_info = json.load(f)
+        except ValueError:
+            continue
+        if kill_info.get("killing_query") is not None:
+            history._stats(kill_info["killing_query"]).kills += 1
+
+    return history
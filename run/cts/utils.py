@@ -1,12 +1,14 @@
 import os
 import subprocess
-import re
 import json
 from enum import Enum
 from pathlib import Path
 
-from common.mutation_tree import MutationTree
-from run.cts.flaky_test_finder import find_non_flaky_cts_tests
+from common.cts_output import parse_file, parse_lines
+from common.mutation_tree import load_mutation_tree
+from run.cts.coverage_cache import CoverageCache, CoverageKeys, get_default_coverage_cache_path
+from run.cts.coverage_matrix import read_covered_mutants
+from run.cts.query_catalogue import QueryCatalogue
 
 class TestStatus(Enum):
     PASS = 1
@@ -15,20 +17,19 @@ class TestStatus(Enum):
 
 
 def get_queries_from_cts(query : str,
-            cts_base : Path,
+            cts_repo : Path,
             unittests_only : bool,
-            cts_only : bool):
+            cts_only : bool,
+            query_catalogue : Path = None):
 
-    # Get WebGPU CTS test queries as list
-    base_query_string = query
+    # File-level queries come from the cached catalogue rather than a walk of the CTS sources
+    catalogue = QueryCatalogue(cts_repo, query_catalogue)
 
-    cts_queries = get_tests(cts_base, base_query_string)
+    # Get WebGPU CTS test queries as list
+    cts_queries = catalogue.file_queries(query)
 
     # Get WebGPU unit test queries as list
-    unittests_path = Path(cts_base,'unittests')
-    unittest_query_string = 'unittests:*'
-
-    #unittest_queries = get_tests(cts_base, unittest_query_string)
+    unittest_queries = catalogue.file_queries('unittests:*')
 
     if unittests_only:
         test_queries = unittest_queries
@@ -54,6 +55,9 @@ def get_reliable_tests(query : str,
             reliably_passing_tests : list = json.load(f)
 
     else:
+        # Imported here as the flaky test finder itself imports this module
+        from run.cts.flaky_test_finder import find_non_flaky_cts_tests
+
         reliable_test_args = [str(mutated_path),
             str(cts_repo),
             str(mutant_killing_path),
@@ -76,49 +80,47 @@ def get_mutant_coverage(mutation_info_path,
         dawn_coverage : Path,
         cts_repo : Path,
         query : str,
-        vk_icd : str = '') -> (list[int], list[int]):
+        vk_icd : str = '',
+        coverage_cache : Path = None) -> (list[int], list[int]):
 
     covered = []
     uncovered = []
 
     # Run cts if we do not already have a mutant tracking file
-    if not dredd_covered_mutants_path.exists():
-    
-        mutant_tracking_result = run_cts(mutation_info_path,
-                dredd_covered_mutants_path,
-                dawn_coverage,
-                cts_repo,
-                query,
-                vk_icd)
-    
-        if not dredd_covered_mutants_path.exists():
-            print("No mutant tracking file created.")
-    
-        else:
-            print("Mutant tracking compilation complete")
-    
-    else:
+    if dredd_covered_mutants_path.exists():
         print("Getting covered mutants from existing dredd_covered_mutants path!")
+        covered = read_covered_mutants(dredd_covered_mutants_path)
+
+    else:
+        # Coverage is shared by all campaigns using this tracking build, CTS revision and driver
+        with CoverageCache(coverage_cache if coverage_cache is not None
+                           else get_default_coverage_cache_path(dawn_coverage)) as cache:
+            coverage_key = CoverageKeys(dawn_coverage, cts_repo, vk_icd).key(query)
+            cached = None if coverage_key is None else cache.get(coverage_key)
+
+            if cached is not None:
+                print("Getting covered mutants from the coverage cache!")
+                covered = cached.covered
 
-    with open(dredd_covered_mutants_path, 'r') as file:
-        data = file.readlines()
+            else:
+                mutant_tracking_result = run_cts(mutation_info_path,
+                        dredd_covered_mutants_path,
+                        dawn_coverage,
+                        cts_repo,
+                        query,
+                        vk_icd)
 
-    # TODO: check why some lines have multiple mutants
-    list_lines = [line for line in data if ' ' in line]
-    flat_lines = [line.split(' ') for line in list_lines]
-    flatter_lines = [
-        mutant
-        for mutants in flat_lines
-        for mutant in mutants
-    ]
+                if not dredd_covered_mutants_path.exists():
+                    print("No mutant tracking file created.")
 
-    data = [line for line in data if ' ' not in line]
-    data.extend(flatter_lines)
-    data.remove('')
+                else:
+                    print("Mutant tracking compilation complete")
 
-    covered : List[int] = list(set([int(mutant.strip()) for mutant in data]))
+                covered = read_covered_mutants(dredd_covered_mutants_path)
+                if coverage_key is not None:
+                    cache.record(coverage_key, covered)
 
-    covered.sort()
+    covered : list[int] = sorted(set(covered))
 
     all_mutants = get_all_mutants(mutation_info_path)
 
@@ -161,8 +163,7 @@ def run_cts(mutation_info_path,
     
 def get_all_mutants(mutation_info_file : Path) -> list[int]:
     
-    with open(mutation_info_file, 'r') as json_input:
-       mutation_tree = MutationTree(json.load(json_input))
+    mutation_tree = load_mutation_tree(mutation_info_file)
 
     all_mutants = list(range(0,mutation_tree.num_mutations + 1))
 
@@ -180,50 +181,6 @@ def get_completed_queries(log : Path) -> list[str]:
     # Remove final query since it will be unfinished
     return queries[:-1]
 
-def kill_gpu_processes(id : str):
-    print("Killing mutant GPU processes")
-                            
-    nvidia_smi = subprocess.Popen(
-            ["nvidia-smi"], 
-            stdout=subprocess.PIPE
-            )
-    processes = subprocess.Popen(
-            ["grep",id], 
-            stdin=nvidia_smi.stdout, 
-            stdout=subprocess.PIPE, 
-            text=True
-            )
-
-    p_output, p_error = processes.communicate()
-
-    if processes.returncode == 0:
-
-        nvidia_smi = subprocess.Popen(
-                ["nvidia-smi"], 
-                stdout=subprocess.PIPE
-                )
-        processes = subprocess.Popen(
-                ["grep","node"], 
-                stdin=nvidia_smi.stdout, 
-                stdout=subprocess.PIPE, 
-                text=True
-                )
-        pid_to_kill = subprocess.Popen(
-                ["awk","{ print $5 }"],
-                stdin=processes.stdout,
-                stdout=subprocess.PIPE,
-                text=True
-                )
-        kill = subprocess.Popen(
-                ["xargs", "-n1", "kill", "-9"],
-                stdin=pid_to_kill.stdout,
-                stdout=subprocess.PIPE,
-                text=True
-                )
-        
-        output, error = kill.communicate()
-        print('GPU processes dead!') 
-
 def get_single_tests_from_file(filename : Path) -> dict[str,str]:
     '''
     Parses file containing stdout from running the WebGPU CTS to retrieve a 
@@ -231,10 +188,7 @@ def get_single_tests_from_file(filename : Path) -> dict[str,str]:
     status (pass; fail; skip)
     '''
     
-    with open(filename, 'r') as f:
-        lines = f.readlines()
-
-    return get_single_tests_from_stdout(lines)
+    return parse_file(filename).test_results()
 
 
 
@@ -244,16 +198,7 @@ def get_single_tests_from_stdout(stdout : list) -> dict[str,str]:
     dictionary containing all individual tests and their
     status (pass; fail; skip)
     '''
-    test_lines = [i for i in stdout if ' - pass' in i or ' - fail' in i or ' - skip' in i]
-
-    tests = {t[:t.index(' ')] : t[t.index(' - ')+3:].replace(':','').strip() for t in test_lines}
-
-    # Check that the only values are pass/fail/skip
-    check = {k:v for (k,v) in tests.items() if v != 'pass' and v != 'fail' and v != 'skip'}
-
-    assert(len(check) == 0)
-
-    return tests
+    return parse_lines(stdout).test_results()
 
 
 def get_unrun_tests() -> list:
@@ -348,15 +293,11 @@ def test():
 
 def get_failures(stdout : str) -> int:
 
-    matched = re.search(r'(?<=FAIL: )\d+',stdout)
-
-    return int(matched.group())
+    return parse_lines(stdout.split('\n')).summary['fail']
 
 def get_passes(stdout : str) -> int:
 
-    matched = re.search(r'(?<=PASS: )\d+',stdout)
-
-    return int(matched.group())
+    return parse_lines(stdout.split('\n')).summary['pass']
 
 def check_queries():
     base = Path('/data/dev/webgpu_cts/src')
@@ -8,9 +8,18 @@ import tempfile
 import time
 
 from common.constants import DEFAULT_COMPILATION_TIMEOUT, DEFAULT_RUNTIME_TIMEOUT
-from common.mutation_tree import MutationTree
-from common.run_process_with_timeout import ProcessResult, run_process_with_timeout
-from common.run_test_with_mutants import run_wgslsmith_test_with_mutants, KillStatus
+from common.async_runner import AsyncExecutionEngine
+from common.baseline_timings import WGSLSMITH, BaselineTimings, get_default_baseline_timings_path
+from common.group_testing import group_test_mutants_async, pack_compatible_mutants
+from common.mutation_tree_cache import get_mutation_tree_digest, load_cached_mutation_tree
+from common.run_process_with_timeout import (ProcessResult, ProgressWatchdog, ResourceUsage, get_resource_usage,
+                                             run_process_streaming, run_process_with_timeout)
+from common.run_test_with_mutants import (get_compilation_timeout, get_execution_timeout, get_mutant_spool_info,
+                                         get_mutant_stdout_spool, get_silence_timeout,
+                                         run_wgslsmith_test_with_mutants_async, KillStatus)
+from common.campaign_journal import KILLED, SURVIVED, CampaignJournal, claim_test_directory, get_journal_file
+from common.results_store import ResultsStore, get_killing_test, is_noted_as_killed, note_kill
+from common.work_queue import LeaseKeeper, WorkQueue, get_worker_id
 
 from pathlib import Path
 from typing import List, Set
@@ -92,6 +101,37 @@ def main(raw_args=None):
     parser.add_argument("--coverage_check",
                         action=argparse.BooleanOptionalAction,
                         help="Runs 50 WGSLsmith programs with mutant tracking enabled to check whether any mutants are covered.")
+    parser.add_argument("--batch_size",
+                        default=1,
+                        help="Maximum number of mutually compatible mutants to enable in a single run. A batch that "
+                             "does not survive is bisected to find the killed mutants. Default is 1 (no batching).",
+                        type=int)
+    parser.add_argument("--max_in_flight",
+                        default=1,
+                        help="Maximum number of mutant runs to execute concurrently from this process. Default is 1.",
+                        type=int)
+    parser.add_argument("--results_store",
+                        default=None,
+                        type=Path,
+                        help="SQLite results store shared by kill processes. When given, kills are claimed and "
+                             "looked up in the store and runs and kill summaries are recorded in it, as well as in "
+                             "the usual files.")
+    parser.add_argument("--work_queue",
+                        default=None,
+                        type=Path,
+                        help="SQLite work queue shared by kill processes on this node. Each program's candidate "
+                             "mutants are leased from the queue, so no two processes try the same mutant at once, "
+                             "and testing stops once every mutant has been killed.")
+    parser.add_argument("--baseline_timings",
+                        default=None,
+                        type=Path,
+                        help="SQLite table of unmutated program runtimes, from which mutant run timeouts are derived "
+                             "(at most --compile_timeout). Defaults to baseline_timings.sqlite in mutant_kill_path.")
+    parser.add_argument("--mutation_tree_cache_dir",
+                        default=None,
+                        type=Path,
+                        help="Directory in which to cache parsed mutation trees. Defaults to a mutation_tree_cache "
+                             "directory next to each mutation info file.")
 
     args = parser.parse_args(raw_args)
     n_coverage_check_tests = 50
@@ -99,24 +139,18 @@ def main(raw_args=None):
     assert args.mutation_info_file != args.mutation_info_file_for_mutant_coverage_tracking
 
     print("Building the real mutation tree...")
-    with open(args.mutation_info_file, 'r') as json_input:
-        mutation_tree = MutationTree(json.load(json_input))
+    mutation_tree = load_cached_mutation_tree(args.mutation_info_file, args.mutation_tree_cache_dir)
     print("Built!")
-    print("Building the mutation tree associated with mutant coverage tracking...")
-    with open(args.mutation_info_file_for_mutant_coverage_tracking, 'r') as json_input:
-        mutation_tree_for_coverage_tracking = MutationTree(json.load(json_input))
-    print("Built!")
-    print("Checking that the two mutation trees match...")
-    assert mutation_tree.mutation_id_to_node_id == mutation_tree_for_coverage_tracking.mutation_id_to_node_id
-    assert mutation_tree.parent_map == mutation_tree_for_coverage_tracking.parent_map
-    assert mutation_tree.num_nodes == mutation_tree_for_coverage_tracking.num_nodes
-    assert mutation_tree.num_mutations == mutation_tree_for_coverage_tracking.num_mutations
+    print("Checking that the mutation tree associated with mutant coverage tracking matches...")
+    assert mutation_tree.digest == get_mutation_tree_digest(args.mutation_info_file_for_mutant_coverage_tracking,
+                                                            args.mutation_tree_cache_dir)
     print("Check complete!")
     
     if args.seed is not None:
         random.seed(args.seed)
 
-    with tempfile.TemporaryDirectory() as temp_dir_for_generated_code:
+    with tempfile.TemporaryDirectory() as temp_dir_for_generated_code, \
+            AsyncExecutionEngine(args.max_in_flight) as engine:
         #with Path('/data/work/tint_mutation_testing/temp') as temp_dir_for_generated_code:
         wgslsmith_generated_program: Path = Path(temp_dir_for_generated_code, '__prog.wgsl')
         wgslsmith_reconditioned_program: Path = Path(temp_dir_for_generated_code, '__reconditioned.wgsl')
@@ -141,6 +175,26 @@ def main(raw_args=None):
         Path(args.mutant_kill_path, "killed_mutants").mkdir(exist_ok=True)
         Path(args.mutant_kill_path, "tracking").mkdir(exist_ok=True)
 
+        results_store = ResultsStore(args.results_store) if args.results_store is not None else None
+
+        baseline_timings = BaselineTimings(args.baseline_timings if args.baseline_timings is not None
+                                           else get_default_baseline_timings_path(args.mutant_kill_path))
+
+        # Programs whose mutants were being tried when a kill process crashed are run again first, skipping the
+        # mutants already decided
+        journal = CampaignJournal(get_journal_file(args.mutant_kill_path))
+        interrupted_programs: List[str] = [test for test in journal.interrupted_tests()
+                                           if test.startswith("wgslsmith_")
+                                           and Path(args.mutant_kill_path, f'tests/{test}/prog.wgsl').exists()]
+        test_lock = None
+
+        # One item per mutant; an item is completed once the mutant is killed
+        work_queue = None
+        if args.work_queue is not None:
+            work_queue = WorkQueue(args.work_queue)
+            work_queue.add_items({str(mutant): {"mutant": mutant} for mutant in sorted(unkilled_mutants)})
+            worker = get_worker_id()
+
         if args.coverage_check:
             wgslsmith_covered = {}
 
@@ -157,21 +211,44 @@ def main(raw_args=None):
             if generated_program_exe_compiled_with_mutant_tracking.exists():
                 os.remove(generated_program_exe_compiled_with_mutant_tracking)
 
+            # Release the previous program's lock
+            if test_lock is not None:
+                test_lock.close()
+                test_lock = None
+
+            if work_queue is not None and work_queue.is_drained():
+                print('All mutants in the work queue have been killed.')
+                break
+
             if args.coverage_check:
                 print(f'len of dict is {len(wgslsmith_covered)}')
                 if len(wgslsmith_covered) > n_coverage_check_tests:
                     return wgslsmith_covered
-           
-            # Generate a WGSLsmith program
-            wgslsmith_seed = random.randint(0, 2 ** 32 - 1)
-            wgslsmith_cmd = [str(args.wgslsmith_root / "wgslsmith"), "gen", "-o",
-                          str(wgslsmith_generated_program)]
-            wgslsmith_test_name: str = "wgslsmith_" + str(wgslsmith_seed)
 
-            print("Generating...")
-            if run_process_with_timeout(cmd=wgslsmith_cmd, timeout_seconds=args.generator_timeout) is None:
-                print(f"WGSLsmith timed out (seed {wgslsmith_seed})")
-                continue
+            # Resume an interrupted program if one is not being resumed by another process
+            while interrupted_programs and test_lock is None:
+                wgslsmith_test_name: str = interrupted_programs.pop(0)
+                test_output_directory: Path = Path(args.mutant_kill_path, f'tests/{wgslsmith_test_name}')
+                test_lock = claim_test_directory(test_output_directory)
+                if test_lock is not None and Path(test_output_directory, "kill_summary.json").exists():
+                    test_lock.close()
+                    test_lock = None
+
+            if test_lock is not None:
+                wgslsmith_seed = int(wgslsmith_test_name[len("wgslsmith_"):])
+                print(f"Resuming interrupted program (seed {wgslsmith_seed})")
+                shutil.copy(src=test_output_directory / "prog.wgsl", dst=wgslsmith_generated_program)
+            else:
+                # Generate a WGSLsmith program
+                wgslsmith_seed = random.randint(0, 2 ** 32 - 1)
+                wgslsmith_cmd = [str(args.wgslsmith_root / "wgslsmith"), "gen", "-o",
+                              str(wgslsmith_generated_program)]
+                wgslsmith_test_name: str = "wgslsmith_" + str(wgslsmith_seed)
+
+                print("Generating...")
+                if run_process_with_timeout(cmd=wgslsmith_cmd, timeout_seconds=args.generator_timeout) is None:
+                    print(f"WGSLsmith timed out (seed {wgslsmith_seed})")
+                    continue
 
             # Extract inputs from WGSLsmith program
             with open(wgslsmith_generated_program) as f:
@@ -209,10 +286,14 @@ def main(raw_args=None):
             env = os.environ.copy()
             env["VK_ICD_FILENAMES"] = f'{args.vk_icd}'
 
-            regular_execution_result: ProcessResult = run_process_with_timeout(
+            # Any output is progress
+            unmutated_watchdog = ProgressWatchdog()
+            regular_execution_result: ProcessResult = run_process_streaming(
                 cmd=run_cmd, 
                 timeout_seconds=args.run_timeout,
-                env=env)
+                env=env,
+                capture_limit_bytes=None,
+                watchdog=unmutated_watchdog)
             run_time_end: float = time.time()
             run_time = run_time_end - run_time_start 
 
@@ -220,6 +301,7 @@ def main(raw_args=None):
             if regular_execution_result is None:
                 print("Runtime timeout.")
                 continue
+
             if regular_execution_result.returncode != 0:
                 print(f"Std out:\n {regular_execution_result.stdout.decode('utf-8')}\n")
                 #print(f"Std err:\n {regular_execution_result.stderr.decode('utf-8')}\n")
@@ -242,6 +324,15 @@ def main(raw_args=None):
             output = [int(o) for o in output]
 
             print(f"Output is: {output}")
+
+            # Only a run that completed normally is timed. Mutant runs are timed out relative to the slowest
+            # unmutated run recorded for this program; the longest that run goes without output sets how long
+            # mutant runs may
+            baseline_timing = baseline_timings.record(WGSLSMITH, wgslsmith_test_name, run_time,
+                                                      unmutated_watchdog.longest_silence)
+            tracking_timeout: float = get_compilation_timeout(baseline_timing.wall_time, limit=args.compile_timeout)
+            silence_timeout: float = get_silence_timeout(baseline_timing.longest_silence,
+                                                         concurrency=args.max_in_flight)
            
             # Compile the program with the mutant tracking compiler.
             print("Running with mutant tracking compiler...")
@@ -251,7 +342,7 @@ def main(raw_args=None):
 
             tracking_compile_cmd = [args.mutant_tracking_wgslsmith_executable]\
                 + compiler_args
-            mutant_tracking_result : ProcessResult = run_process_with_timeout(cmd=tracking_compile_cmd, timeout_seconds=args.compile_timeout, env=tracking_environment) 
+            mutant_tracking_result : ProcessResult = run_process_with_timeout(cmd=tracking_compile_cmd, timeout_seconds=tracking_timeout, env=tracking_environment) 
 
             if mutant_tracking_result is None:
                 print("Mutant tracking compilation timed out.")
@@ -309,64 +400,150 @@ def main(raw_args=None):
                 print(f'adding to dict candidate mutants: {candidate_mutants_for_this_test}')
                 wgslsmith_covered[wgslsmith_test_name] = candidate_mutants_for_this_test
                 continue
-             
-            for mutant in candidate_mutants_for_this_test:
 
-                if not still_testing(total_test_time=args.total_test_time,
-                                     maximum_time_since_last_kill=args.maximum_time_since_last_kill,
-                                     start_time_for_overall_testing=start_time_for_overall_testing,
-                                     time_of_last_kill=time_of_last_kill):
-                    break
-
-                mutant_path = Path(args.mutant_kill_path, f'killed_mutants/{str(mutant)}')
-                if mutant_path.exists():
-                    print("Skipping mutant " + str(mutant) + " as it is noted as already killed.")
+            # Keep the program, so that it can be resumed if this process crashes while trying mutants
+            test_output_directory: Path = Path(args.mutant_kill_path, f'tests/{wgslsmith_test_name}')
+            if test_lock is None:
+                # It is very unlikely that the directory already exists, but this could happen if two test
+                # workers pick the same seed. If that happens, this worker will skip the test.
+                try:
+                    test_output_directory.mkdir()
+                except FileExistsError:
+                    print(f"Skipping seed {wgslsmith_seed} as a directory for it already exists")
+                    continue
+                test_lock = claim_test_directory(test_output_directory)
+                shutil.copy(src=wgslsmith_generated_program, dst=test_output_directory / "prog.wgsl")
+                journal.record_start(wgslsmith_test_name)
+
+            # Mutants decided before an interruption are not run again
+            resumed_outcomes = journal.outcomes(wgslsmith_test_name)
+            if resumed_outcomes:
+                print(f'{len(resumed_outcomes)} mutants were decided before an interruption')
+            for mutant in [m for m in candidate_mutants_for_this_test if m in resumed_outcomes]:
+                if resumed_outcomes[mutant]["outcome"] == KILLED:
                     unkilled_mutants.remove(mutant)
                     killed_mutants.add(mutant)
-                    already_killed_by_other_tests.append(mutant)
-                    continue
-                
-                print("Trying mutant " + str(mutant))
+                    killed_by_this_test.append(mutant)
+                else:
+                    covered_but_not_killed_by_this_test.append(mutant)
+            candidate_mutants_for_this_test = [m for m in candidate_mutants_for_this_test if m not in resumed_outcomes]
+
+            # Mutants leased or completed by another process are not tried here
+            claimed_by_other_processes: List[int] = []
+            if work_queue is not None:
+                leased = set([int(item.key) for item in
+                              work_queue.lease_keys(worker, [str(m) for m in candidate_mutants_for_this_test])])
+                claimed_by_other_processes = [m for m in candidate_mutants_for_this_test if m not in leased]
+                candidate_mutants_for_this_test = [m for m in candidate_mutants_for_this_test if m in leased]
+                lease_keeper = LeaseKeeper(work_queue, worker)
+             
+            env = os.environ.copy()
+            env["VK_ICD_FILENAMES"] = f'{args.vk_icd}'
 
-                env = os.environ.copy()
-                env["VK_ICD_FILENAMES"] = f'{args.vk_icd}'
+            # Resource usage of every mutant run, including the runs needed to bisect batches
+            mutant_runs_usage = ResourceUsage()
+            mutant_resource_usage = {}
 
-                (mutant_result, mutant_result_stdout) = run_wgslsmith_test_with_mutants(mutants=[mutant],
+            async def run_mutants(mutants: List[int]) -> tuple[KillStatus, ProcessResult]:
+                result = await run_wgslsmith_test_with_mutants_async(engine=engine,
+                                                      mutants=mutants,
                                                       compiler_path=str(args.mutated_wgslsmith_executable),
                                                       compiler_args=compiler_args,
                                                       compile_time=args.compile_timeout,
-                                                      run_time=run_time,
+                                                      run_time=baseline_timing.wall_time,
                                                       execution_result_non_mutated=regular_execution_result,
-                                                      mutant_exe_path=mutant_exe,
-                                                      env=env)
-                print("Mutant result: " + str(mutant_result))
-                 
-                if mutant_result == KillStatus.SURVIVED_IDENTICAL \
-                        or mutant_result == KillStatus.SURVIVED_BINARY_DIFFERENCE:
-                    #or mutant_result == KillStatus.KILL_COMPILER_CRASH:
-                    covered_but_not_killed_by_this_test.append(mutant)
-                    continue
+                                                      env=env,
+                                                      silence_timeout_seconds=silence_timeout,
+                                                      stdout_spool=get_mutant_stdout_spool(test_output_directory,
+                                                                                           mutants))
+                mutant_runs_usage.add(result[1])
+                return result
+
+            async def evaluate_batch(mutants: List[int]) -> dict:
+                return await group_test_mutants_async(mutants,
+                    run_mutants=run_mutants,
+                    survived=lambda result: result[0] in [KillStatus.SURVIVED_IDENTICAL,
+                                                          KillStatus.SURVIVED_BINARY_DIFFERENCE])
+
+            # Mutants that cannot be enabled together are kept in separate batches;
+            # a batch is only split up if running it does not survive
+            batches_to_try: List[List[int]] = []
+            for batch in pack_compatible_mutants(candidate_mutants_for_this_test, mutation_tree, args.batch_size):
+
+                mutants_to_try: List[int] = []
+                for mutant in batch:
+                    if is_noted_as_killed(args.mutant_kill_path, results_store, mutant):
+                        print("Skipping mutant " + str(mutant) + " as it is noted as already killed.")
+                        unkilled_mutants.remove(mutant)
+                        killed_mutants.add(mutant)
+                        already_killed_by_other_tests.append(mutant)
+                        continue
+                    mutants_to_try.append(mutant)
+
+                if mutants_to_try:
+                    batches_to_try.append(mutants_to_try)
+
+            # Batches are evaluated concurrently; results are recorded as each batch completes
+            for (mutants_to_try, batch_results) in engine.map_unordered(evaluate_batch, batches_to_try):
+
+                for mutant in mutants_to_try:
+                    (mutant_result, mutant_result_stdout) = batch_results[mutant]
+                    mutant_resource_usage[mutant] = get_resource_usage(mutant_result_stdout)
+                    if results_store is not None:
+                        results_store.record_run(wgslsmith_test_name, mutant, str(mutant_result),
+                                                 mutant_resource_usage[mutant])
+                    print(f"Mutant {mutant} result: {mutant_result}")
+
+                    if mutant_result == KillStatus.SURVIVED_IDENTICAL \
+                            or mutant_result == KillStatus.SURVIVED_BINARY_DIFFERENCE:
+                        #or mutant_result == KillStatus.KILL_COMPILER_CRASH:
+                        covered_but_not_killed_by_this_test.append(mutant)
+                        journal.record_outcome(wgslsmith_test_name, mutant, SURVIVED, str(mutant_result))
+                        continue
 
-                unkilled_mutants.remove(mutant)
-                killed_mutants.add(mutant)
-                killed_by_this_test.append(mutant)
-                time_of_last_kill = time.time()
-                print(f"Kill! Mutants killed so far: {len(killed_mutants)}")
-                
+                    unkilled_mutants.remove(mutant)
+                    killed_mutants.add(mutant)
+                    killed_by_this_test.append(mutant)
+                    time_of_last_kill = time.time()
+                    print(f"Kill! Mutants killed so far: {len(killed_mutants)}")
 
-                try:
-                    mutant_path.mkdir()
                     print("Writing kill info to file.")
-                    with open(mutant_path / "kill_info.json", "w") as outfile:
-                        json.dump({"killing_test": wgslsmith_test_name,
-                                   "kill_type": str(mutant_result),
-                                   "unmutated_stdout" : regular_execution_result.stdout.decode("utf-8"),
-                                   "mutated_stdout" : mutant_result_stdout.stdout.decode("utf-8")},
-                                   outfile)
-                except FileExistsError:
-                    print(f"Mutant {mutant} was independently discovered to be killed.")
-                    continue
-             
+                    # A run stopped by its timeout or watchdog has no result, so no output is recorded for it
+                    noted = note_kill(args.mutant_kill_path, results_store, mutant, wgslsmith_test_name,
+                                      {"killing_test": wgslsmith_test_name,
+                                       "kill_type": str(mutant_result),
+                                       "unmutated_stdout" : regular_execution_result.stdout.decode("utf-8"),
+                                       "mutated_stdout" : None if mutant_result_stdout is None
+                                                          else mutant_result_stdout.stdout.decode("utf-8"),
+                                       "mutated_stdout_spool": get_mutant_spool_info(mutant_result_stdout),
+                                       "resource_usage": mutant_resource_usage[mutant]})
+                    journal.record_outcome(wgslsmith_test_name, mutant, KILLED, str(mutant_result))
+                    if not noted:
+                        print(f"Mutant {mutant} was independently discovered to be killed.")
+                        continue
+
+                # Stopping here cancels the batches that are still running
+                if not still_testing(total_test_time=args.total_test_time,
+                                     maximum_time_since_last_kill=args.maximum_time_since_last_kill,
+                                     start_time_for_overall_testing=start_time_for_overall_testing,
+                                     time_of_last_kill=time_of_last_kill):
+                    break
+
+            if work_queue is not None:
+                lease_keeper.stop()
+                # Surviving mutants (and any not tried before stopping) go back to the queue for other programs.
+                # A mutant found to be killed by another process is completed with the test that killed it
+                killed_here: Set[int] = set(killed_by_this_test)
+                for mutant in candidate_mutants_for_this_test:
+                    if mutant in killed_here:
+                        work_queue.complete(worker, str(mutant), {"killing_test": wgslsmith_test_name})
+                    elif mutant in killed_mutants:
+                        work_queue.complete(worker, str(mutant),
+                                            {"killing_test": get_killing_test(args.mutant_kill_path, results_store,
+                                                                              mutant)})
+                    else:
+                        work_queue.release(worker, str(mutant))
+
             terminating_test_process: bool = not still_testing(
                 total_test_time=args.total_test_time,
                 maximum_time_since_last_kill=args.maximum_time_since_last_kill,
@@ -375,7 +552,8 @@ def main(raw_args=None):
 
             all_considered_mutants = killed_by_this_test \
                 + covered_but_not_killed_by_this_test \
-                + already_killed_by_other_tests
+                + already_killed_by_other_tests \
+                + claimed_by_other_processes
             all_considered_mutants.sort()
 
             if covered_by_this_test != all_considered_mutants:
@@ -389,22 +567,27 @@ def main(raw_args=None):
             already_killed_by_other_tests.sort()
             
             print('Saving kill summary...')
-            
-            test_output_directory: Path = Path(args.mutant_kill_path, f'tests/{wgslsmith_test_name}')
-            
-            try:
-                test_output_directory.mkdir()
-            except FileExistsError:
-                print(f"Skipping seed {wgslsmith_seed} as a directory for it already exists")
-                continue
-            shutil.copy(src=wgslsmith_generated_program, dst=test_output_directory / "prog.wgsl")
 
+            kill_summary = {"terminated_early": terminated_early,
+                            "covered_mutants": covered_by_this_test,
+                            "killed_mutants": killed_by_this_test,
+                            "skipped_mutants": already_killed_by_other_tests,
+                            "claimed_mutants": sorted(claimed_by_other_processes),
+                            "survived_mutants": covered_but_not_killed_by_this_test,
+                            "resource_usage": {"unmutated": regular_execution_result.resource_usage(),
+                                               "mutant_tracking": mutant_tracking_result.resource_usage(),
+                                               "mutant_runs": mutant_runs_usage.to_json()},
+                            "timeouts": {"mutant_tracking": tracking_timeout,
+                                         "mutant_runs": get_execution_timeout(baseline_timing.wall_time,
+                                                                              limit=args.compile_timeout,
+                                                                              concurrency=args.max_in_flight),
+                                         "silence": silence_timeout},
+                            "mutant_resource_usage": mutant_resource_usage}
             with open(test_output_directory / "kill_summary.json", "w") as outfile:
-                json.dump({"terminated_early": terminated_early,
-                           "covered_mutants": covered_by_this_test,
-                           "killed_mutants": killed_by_this_test,
-                           "skipped_mutants": already_killed_by_other_tests,
-                           "survived_mutants": covered_but_not_killed_by_this_test}, outfile)
+                json.dump(kill_summary, outfile)
+            if results_store is not None:
+                results_store.record_test_summary(wgslsmith_test_name, 'wgslsmith', kill_summary)
+            journal.record_done(wgslsmith_test_name)
 
 if __name__ == '__main__':
     main()
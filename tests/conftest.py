@@ -0,0 +1,70 @@
+import json
+
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from tests.fake_dawn import make_cts_repo, make_fake_dawn, write_mutation_info
+
+# Unmutated status of each stub test; b,y:t2 fails without mutants, so it is never reliable
+STUB_TESTS = {"webgpu:a,x:t1": 'pass',
+              "webgpu:a,x:t2": 'pass',
+              "webgpu:b,y:t1": 'pass',
+              "webgpu:b,y:t2": 'fail'}
+STUB_COVERS = {"webgpu:a,x:t1": [0, 1],
+               "webgpu:a,x:t2": [2],
+               "webgpu:b,y:t1": [1, 3]}
+STUB_KILLS = {0: ["webgpu:a,x:t1"],
+              1: ["webgpu:b,y:t1"],
+              3: ["webgpu:b,y:t2"]}
+STUB_QUERIES = ["webgpu:a,*", "webgpu:b,*"]
+NUM_MUTATIONS = 4
+
+
+class CTSCampaign:
+    '''
+    Everything a CTS kill run needs, with fake Dawn builds (see
+    tests/fake_dawn.py) and a stub CTS checkout.
+    '''
+
+    def __init__(self, root: Path):
+        self.mutated_path = make_fake_dawn(Path(root, 'dawn_mutated'), STUB_TESTS, STUB_COVERS, STUB_KILLS,
+                                           build_id='mutated')
+        self.tracking_path = make_fake_dawn(Path(root, 'dawn_tracking'), STUB_TESTS, STUB_COVERS, STUB_KILLS,
+                                            build_id='tracking')
+        self.cts_repo = make_cts_repo(Path(root, 'cts'))
+        self.mutation_info_file = write_mutation_info(Path(root, 'mutated.json'), NUM_MUTATIONS)
+        self.tracking_info_file = write_mutation_info(Path(root, 'tracking.json'), NUM_MUTATIONS)
+        self.reliable_tests = Path(root, 'reliable_tests.json')
+        with open(self.reliable_tests, 'w') as f:
+            json.dump([test for (test, status) in STUB_TESTS.items() if status == 'pass'], f)
+        self.query_file = self.write_queries(Path(root, 'queries.json'), STUB_QUERIES)
+        self.mutant_kill_path = Path(root, 'kill')
+
+    @staticmethod
+    def write_queries(query_file: Path, queries: List[str]) -> Path:
+        with open(query_file, 'w') as f:
+            json.dump(queries, f)
+        return query_file
+
+    def kill_args(self, *extra_args: str, query_file: Path = None, mutant_kill_path: Path = None) -> List[str]:
+        return [str(self.mutated_path),
+                str(self.tracking_path),
+                str(self.mutation_info_file),
+                str(self.tracking_info_file),
+                str(mutant_kill_path or self.mutant_kill_path),
+                'file',
+                '--query_file', str(query_file or self.query_file),
+                '--cts_repo', str(self.cts_repo),
+                '--reliable_tests', str(self.reliable_tests)] + list(extra_args)
+
+    def summary(self, query: str, mutant_kill_path: Path = None) -> dict:
+        query_directory = Path(mutant_kill_path or self.mutant_kill_path, 'tests', query.replace(':', '-'))
+        with open(Path(query_directory, 'kill_summary.json'), 'r') as f:
+            return json.load(f)
+
+
+@pytest.fixture
+def cts_campaign(tmp_path) -> CTSCampaign:
+    return CTSCampaign(tmp_path)
@@ -0,0 +1,127 @@
+'''
+A stand-in for a Dawn checkout, so that the CTS kill scripts can be run
+without Dawn or a GPU. Its tools/run prints verbose CTS result lines for
+the stub tests under the requested query: a test fails if it is listed as
+killing one of the mutants in DREDD_ENABLED_MUTATION, and the mutants
+covered by the tests run are written to DREDD_MUTANT_TRACKING_FILE. A
+run hangs on reaching a test listed as hanging for an enabled mutant.
+Every run is logged to runs.jsonl in the checkout.
+'''
+
+import json
+import os
+import stat
+import subprocess
+import sys
+
+from pathlib import Path
+from typing import Dict, List
+
+STUB_FILE_NAME = 'stub_cts.json'
+RUN_LOG_FILE_NAME = 'runs.jsonl'
+
+TOOLS_RUN = '''#!{python}
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+dawn_path = Path(__file__).resolve().parent.parent
+with open(Path(dawn_path, {stub_file!r})) as f:
+    stub = json.load(f)
+
+query = sys.argv[-1]
+prefix = query[:-1] if query.endswith('*') else query
+enabled = [m for m in os.environ.get('DREDD_ENABLED_MUTATION', '').split(',') if m]
+tracking_file = os.environ.get('DREDD_MUTANT_TRACKING_FILE')
+
+with open(Path(dawn_path, {run_log!r}), 'a') as f:
+    f.write(json.dumps({{"query": query, "mutants": enabled, "tracking": tracking_file is not None}}) + '\\n')
+
+failing = set(test for m in enabled for test in stub["kills"].get(m, []))
+hanging = set(test for m in enabled for test in stub["hangs"].get(m, []))
+covered = set()
+for (test, status) in stub["tests"].items():
+    if test != query and not test.startswith(prefix):
+        continue
+    if test in hanging:
+        time.sleep(60)
+    covered.update(stub["covers"].get(test, []))
+    print(f'{{test}} - {{"fail" if test in failing else status}}', flush=True)
+
+if tracking_file is not None:
+    with open(tracking_file, 'w') as f:
+        f.write(''.join(f'{{m}}\\n' for m in sorted(covered)))
+'''
+
+
+def make_fake_dawn(dawn_path: Path,
+                   tests: Dict[str, str],
+                   covers: Dict[str, List[int]],
+                   kills: Dict[int, List[str]],
+                   hangs: Dict[int, List[str]] = None,
+                   build_id: str = 'dawn') -> Path:
+    '''
+    tests maps each stub test to its unmutated status, covers maps tests to
+    the mutants they cover and kills and hangs map mutants to the tests that
+    fail or hang when they are enabled.
+    '''
+    Path(dawn_path, 'tools').mkdir(parents=True)
+    Path(dawn_path, 'out', 'Debug').mkdir(parents=True)
+    Path(dawn_path, 'out', 'Debug', 'dawn.node').write_text(build_id)
+    with open(Path(dawn_path, STUB_FILE_NAME), 'w') as f:
+        json.dump({"tests": tests,
+                   "covers": covers,
+                   "kills": {str(m): failing for (m, failing) in kills.items()},
+                   "hangs": {str(m): hanging for (m, hanging) in (hangs or {}).items()}}, f)
+
+    tools_run = Path(dawn_path, 'tools', 'run')
+    tools_run.write_text(TOOLS_RUN.format(python=sys.executable, stub_file=STUB_FILE_NAME, run_log=RUN_LOG_FILE_NAME))
+    tools_run.chmod(tools_run.stat().st_mode | stat.S_IXUSR)
+    return dawn_path
+
+
+def read_runs(dawn_path: Path) -> List[dict]:
+    run_log = Path(dawn_path, RUN_LOG_FILE_NAME)
+    if not run_log.exists():
+        return []
+    with open(run_log, 'r') as f:
+        return [json.loads(line) for line in f]
+
+
+def make_cts_repo(cts_repo: Path) -> Path:
+    Path(cts_repo, 'src', 'webgpu').mkdir(parents=True)
+    Path(cts_repo, 'src', 'webgpu', 'stub.spec.ts').write_text('')
+    git = ['git', '-C', str(cts_repo), '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+    subprocess.run(git + ['init', '-q'], check=True)
+    subprocess.run(git + ['add', '.'], check=True)
+    subprocess.run(git + ['commit', '-q', '-m', 'stub'], check=True)
+    return cts_repo
+
+
+def write_mutation_info(mutation_info_file: Path, num_mutations: int) -> Path:
+    # Each mutation in its own top-level node, so any set of mutants can be enabled together
+    with open(mutation_info_file, 'w') as f:
+        json.dump({"infoForFiles": [{"mutationTree": [
+            {"children": [], "mutationGroups": [{"removeStmt": {"mutationId": m}}]}
+            for m in range(num_mutations)]}]}, f)
+    return mutation_info_file
+
+
+def set_stub_test_status(dawn_path: Path, test: str, status: str) -> None:
+    stub_file = Path(dawn_path, STUB_FILE_NAME)
+    with open(stub_file, 'r') as f:
+        stub = json.load(f)
+    stub["tests"][test] = status
+    with open(stub_file, 'w') as f:
+        json.dump(stub, f)
+
+
+def add_stub_hang(dawn_path: Path, mutant: int, test: str) -> None:
+    stub_file = Path(dawn_path, STUB_FILE_NAME)
+    with open(stub_file, 'r') as f:
+        stub = json.load(f)
+    stub["hangs"].setdefault(str(mutant), []).append(test)
+    with open(stub_file, 'w') as f:
+        json.dump(stub, f)
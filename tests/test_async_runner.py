@@ -0,0 +1,67 @@
+import gzip
+import sys
+
+import common.async_runner as async_runner
+
+from common.async_runner import STREAM_LINE_LIMIT, AsyncExecutionEngine
+from common.process_reaper import read_process_info
+
+
+def test_lines_longer_than_the_stream_buffer_are_kept_whole():
+    long_line_length = 3 * STREAM_LINE_LIMIT
+    cmd = [sys.executable, '-c',
+           f'import sys; sys.stdout.write("x" * {long_line_length} + "\\nshort\\nno newline")']
+    lines = []
+
+    def collect(line: str) -> bool:
+        lines.append(line)
+        return False
+
+    with AsyncExecutionEngine(1) as engine:
+        [(_, result)] = list(engine.map_unordered(
+            lambda _: engine.run_process(cmd, timeout_seconds=60, stop_predicate=collect, capture_limit_bytes=None),
+            [None]))
+
+    assert [len(line) for line in lines] == [long_line_length + 1, len('short\n'), len('no newline')]
+    assert result.returncode == 0
+    assert len(result.stdout) == long_line_length + len('\nshort\nno newline')
+
+
+def test_map_unordered_yields_every_result():
+    async def double(item: int) -> int:
+        return 2 * item
+
+    with AsyncExecutionEngine(2) as engine:
+        assert sorted(engine.map_unordered(double, [1, 2, 3])) == [(1, 2), (2, 4), (3, 6)]
+
+
+def test_stdout_beyond_the_capture_limit_is_spooled(tmp_path):
+    cmd = [sys.executable, '-c', 'print("a" * 10); print("b" * 10)']
+    spool = tmp_path / 'stdout.gz'
+
+    with AsyncExecutionEngine(1) as engine:
+        [(_, result)] = list(engine.map_unordered(
+            lambda _: engine.run_process(cmd, timeout_seconds=60, capture_limit_bytes=11, stdout_spool=spool),
+            [None]))
+
+    assert result.stdout == b'a' * 10 + b'\n'
+    assert result.stdout_spool == spool
+    with gzip.open(spool, 'rb') as f:
+        assert f.read() == b'b' * 10 + b'\n'
+
+
+def test_command_that_ignores_sigterm_is_killed_by_the_wrapper(monkeypatch, tmp_path):
+    monkeypatch.setattr(async_runner, 'TERMINATE_GRACE_SECONDS', 0.5)
+    pid_file = tmp_path / 'pid'
+    cmd = [sys.executable, '-c',
+           'import os, signal, time; '
+           'signal.signal(signal.SIGTERM, signal.SIG_IGN); '
+           f'open({str(pid_file)!r}, "w").write(str(os.getpid())); '
+           'time.sleep(60)']
+
+    with AsyncExecutionEngine(1) as engine:
+        [(_, result)] = list(engine.map_unordered(lambda _: engine.run_process(cmd, timeout_seconds=1), [None]))
+
+    assert result is None
+    command = read_process_info(int(pid_file.read_text()))
+    assert command is None or command.state == 'Z'
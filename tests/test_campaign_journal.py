@@ -0,0 +1,22 @@
+from common.campaign_journal import KILLED, SURVIVED, CampaignJournal
+
+
+def test_replay_drops_truncated_tail(tmp_path):
+    journal_file = tmp_path / 'journal.jsonl'
+    with CampaignJournal(journal_file) as journal:
+        journal.record_start('q')
+        journal.record_outcome('q', 1, KILLED, 'CTSKillStatus.KILL_TEST_FAIL')
+    # A crash part way through writing the next record
+    with open(journal_file, 'a') as f:
+        f.write('{"type": "outcome", "test": "q", "mut')
+
+    with CampaignJournal(journal_file) as journal:
+        assert list(journal.outcomes('q')) == [1]
+        assert journal.interrupted_tests() == ['q']
+        journal.record_outcome('q', 2, SURVIVED, 'CTSKillStatus.SURVIVED')
+        journal.record_done('q')
+
+    with CampaignJournal(journal_file) as journal:
+        assert sorted(journal.outcomes('q')) == [1, 2]
+        assert journal.completed_tests() == {'q'}
+        assert journal.interrupted_tests() == []
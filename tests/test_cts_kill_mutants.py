@@ -0,0 +1,166 @@
+import json
+
+import run.cts.kill_mutants as kill_mutants
+
+from common.campaign_journal import KILLED, SURVIVED, UNCOVERED, CampaignJournal, get_journal_file
+from run.cts.coverage_matrix import CoverageMatrix
+from run.cts.query_sharding import QueryRuntimes, get_default_query_runtimes_path, write_query_shards
+from tests.conftest import STUB_QUERIES
+from tests.fake_dawn import add_stub_hang, read_runs, set_stub_test_status
+
+
+def test_per_query_kill_run(cts_campaign):
+    kill_mutants.main(cts_campaign.kill_args())
+
+    a = cts_campaign.summary('webgpu:a,*')
+    assert a["covered_mutants"] == [0, 1, 2]
+    assert a["killed_mutants"] == [0]
+    assert a["survived_mutants"] == [1, 2]
+
+    # Mutant 1 survives query a but is killed by query b; mutant 3 only breaks an unreliable test
+    b = cts_campaign.summary('webgpu:b,*')
+    assert b["covered_mutants"] == [1, 3]
+    assert b["killed_mutants"] == [1]
+    assert b["survived_mutants"] == [3]
+
+    killed = sorted(int(path.name) for path in (cts_campaign.mutant_kill_path / 'killed_mutants').iterdir())
+    assert killed == [0, 1]
+
+    # One unmutated run per query on the mutated build, one tracking run per query
+    runs = read_runs(cts_campaign.mutated_path)
+    assert sorted(run["query"] for run in runs if not run["mutants"]) == ['webgpu:a,*', 'webgpu:b,*']
+    assert len([run for run in read_runs(cts_campaign.tracking_path) if run["tracking"]]) == 2
+
+
+def test_per_query_kill_run_resumes_from_journal(cts_campaign):
+    # As left by a process that crashed part way through query a, after finishing query b
+    cts_campaign.mutant_kill_path.mkdir()
+    with CampaignJournal(get_journal_file(cts_campaign.mutant_kill_path)) as journal:
+        journal.record_start('webgpu:b,*')
+        journal.record_done('webgpu:b,*')
+        journal.record_start('webgpu:a,*')
+        journal.record_outcome('webgpu:a,*', 0, KILLED, 'CTSKillStatus.KILL_TEST_FAIL')
+        journal.record_outcome('webgpu:a,*', 2, SURVIVED, 'CTSKillStatus.SURVIVED')
+
+    kill_mutants.main(cts_campaign.kill_args())
+
+    a = cts_campaign.summary('webgpu:a,*')
+    assert a["killed_mutants"] == [0]
+    assert a["survived_mutants"] == [1, 2]
+
+    # Only the undecided mutant of the interrupted query is run, and the finished query is not rerun
+    runs = read_runs(cts_campaign.mutated_path)
+    assert [run["mutants"] for run in runs if run["mutants"]] == [['1']]
+    assert all(run["query"] == 'webgpu:a,*' for run in runs)
+    with CampaignJournal(get_journal_file(cts_campaign.mutant_kill_path)) as journal:
+        assert journal.completed_tests() == {'webgpu:a,*', 'webgpu:b,*'}
+
+
+def test_sharded_kill_runs_record_query_runtimes(cts_campaign, tmp_path):
+    shard_files = write_query_shards(STUB_QUERIES, tmp_path / 'no_runtimes_yet.sqlite', 2, tmp_path)
+    for shard_file in shard_files:
+        kill_mutants.main(cts_campaign.kill_args(query_file=shard_file))
+
+    for query in STUB_QUERIES:
+        assert cts_campaign.summary(query)["query"] == query
+    with QueryRuntimes(get_default_query_runtimes_path(cts_campaign.mutant_kill_path)) as query_runtimes:
+        assert sorted(query_runtimes.expected_wall_times()) == STUB_QUERIES
+
+
+def unmutated_runs(dawn_path) -> list:
+    return [run for run in read_runs(dawn_path) if not run["mutants"] and not run["tracking"]]
+
+
+def test_unmutated_results_are_cached_across_campaigns(cts_campaign, tmp_path):
+    baseline_cache = str(tmp_path / 'baseline_cache.sqlite')
+    kill_mutants.main(cts_campaign.kill_args('--baseline_cache', baseline_cache))
+    assert len(unmutated_runs(cts_campaign.mutated_path)) == 2
+    assert cts_campaign.summary('webgpu:a,*')["unmutated_cached"] is False
+
+    second_campaign = tmp_path / 'kill_2'
+    kill_mutants.main(cts_campaign.kill_args('--baseline_cache', baseline_cache, mutant_kill_path=second_campaign))
+    assert len(unmutated_runs(cts_campaign.mutated_path)) == 2
+    for query in STUB_QUERIES:
+        summary = cts_campaign.summary(query, second_campaign)
+        assert summary["unmutated_cached"] is True
+        assert summary["baseline_source"] == 'cache'
+    assert cts_campaign.summary('webgpu:a,*', second_campaign)["killed_mutants"] == [0]
+
+    # A rebuilt Dawn does not match the cached results
+    (cts_campaign.mutated_path / 'out' / 'Debug' / 'dawn.node').write_text('rebuilt')
+    third_campaign = tmp_path / 'kill_3'
+    kill_mutants.main(cts_campaign.kill_args('--baseline_cache', baseline_cache, mutant_kill_path=third_campaign))
+    assert len(unmutated_runs(cts_campaign.mutated_path)) == 4
+    assert cts_campaign.summary('webgpu:a,*', third_campaign)["unmutated_cached"] is False
+
+
+def tracking_runs(dawn_path) -> list:
+    return [run for run in read_runs(dawn_path) if run["tracking"]]
+
+
+def test_mutant_coverage_is_cached_per_tracking_build(cts_campaign, tmp_path):
+    kill_mutants.main(cts_campaign.kill_args())
+    assert len(tracking_runs(cts_campaign.tracking_path)) == 2
+    assert cts_campaign.summary('webgpu:a,*')["tracking_cached"] is False
+    assert (cts_campaign.tracking_path / 'out' / 'coverage_cache.sqlite').exists()
+
+    second_campaign = tmp_path / 'kill_2'
+    kill_mutants.main(cts_campaign.kill_args(mutant_kill_path=second_campaign))
+    assert len(tracking_runs(cts_campaign.tracking_path)) == 2
+    for query in STUB_QUERIES:
+        assert cts_campaign.summary(query, second_campaign)["tracking_cached"] is True
+    assert cts_campaign.summary('webgpu:a,*', second_campaign)["covered_mutants"] == [0, 1, 2]
+    assert cts_campaign.summary('webgpu:b,*', second_campaign)["killed_mutants"] == [1]
+
+
+def test_tracking_run_as_baseline_with_cross_check(cts_campaign):
+    kill_mutants.main(cts_campaign.kill_args('--tracking_baseline', '--tracking_baseline_cross_check_interval', '2'))
+
+    # Query a is baselined by its tracking run alone; query b is also cross-checked on the mutated build
+    a = cts_campaign.summary('webgpu:a,*')
+    assert a["baseline_source"] == 'tracking'
+    assert a["killed_mutants"] == [0]
+    b = cts_campaign.summary('webgpu:b,*')
+    assert b["baseline_source"] == 'mutated'
+    assert b["baseline_divergence"] == []
+    assert b["killed_mutants"] == [1]
+    assert [run["query"] for run in unmutated_runs(cts_campaign.mutated_path)] == ['webgpu:b,*']
+    assert len(tracking_runs(cts_campaign.tracking_path)) == 2
+
+
+def test_tracking_baseline_divergence_is_reported(cts_campaign):
+    set_stub_test_status(cts_campaign.mutated_path, 'webgpu:b,y:t2', 'pass')
+    kill_mutants.main(cts_campaign.kill_args('--tracking_baseline', '--tracking_baseline_cross_check_interval', '1'))
+
+    assert cts_campaign.summary('webgpu:a,*')["baseline_divergence"] == []
+    b = cts_campaign.summary('webgpu:b,*')
+    assert b["baseline_divergence"] == ['webgpu:b,y:t2']
+    assert b["baseline_source"] == 'mutated'
+
+
+def test_targeted_sample_run(cts_campaign, tmp_path):
+    coverage_matrix = tmp_path / 'coverage_matrix.json'
+    CoverageMatrix({"webgpu:a,*": [0, 1, 2], "webgpu:b,*": [1]}).save(coverage_matrix)
+    # Mutant 1 hangs query a, but is killed by query b
+    add_stub_hang(cts_campaign.mutated_path, 1, 'webgpu:a,x:t1')
+
+    kill_mutants.main(cts_campaign.kill_args('--coverage_matrix', str(coverage_matrix),
+                                             '--no-order_by_kill_history',
+                                             '--compile_timeout', '2',
+                                             '--mutant_sample', '0', '1', '2', '3'))
+
+    with open(cts_campaign.mutant_kill_path / 'tests' / 'webgpu-' / 'kill_summary.json', 'r') as f:
+        summary = json.load(f)
+    assert summary["killed_mutants"] == [0, 1]
+    assert summary["survived_mutants"] == [2]
+    # Mutant 3 is not covered by any query, so is not run
+    assert summary["uncovered_mutants"] == [3]
+    assert (cts_campaign.mutant_kill_path / 'uncovered_mutants.txt').read_text() == '3\n'
+    assert (cts_campaign.mutant_kill_path / 'surviving_mutants.txt').read_text() == '2\n'
+    assert all('3' not in run["mutants"] for run in read_runs(cts_campaign.mutated_path))
+    with open(cts_campaign.mutant_kill_path / 'killed_mutants' / '1' / 'kill_info.json', 'r') as f:
+        assert json.load(f)["killing_query"] == 'webgpu:b,*'
+
+    # Journalled, so a resumed sample counts it as uncovered again
+    with CampaignJournal(get_journal_file(cts_campaign.mutant_kill_path)) as journal:
+        assert journal.outcomes('mutant_sample:webgpu:*')[3]["outcome"] == UNCOVERED
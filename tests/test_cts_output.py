@@ -0,0 +1,82 @@
+from common import cts_output
+from common.cts_output import (CTSOutputParser, SummaryCount, iter_events, parse_file, parse_result_line,
+                               split_result_line)
+
+
+def test_split_result_line():
+    assert split_result_line('webgpu:a,x:t1 - pass') == ('webgpu:a,x:t1', 'pass')
+    assert split_result_line('webgpu:a,x:t1 - fail: expected 1, got 2') == ('webgpu:a,x:t1', 'fail')
+    # The test id ends at the first space
+    assert split_result_line('webgpu:a,x:t1 (1.5ms) - skip') == ('webgpu:a,x:t1', 'skip')
+
+
+def test_split_result_line_rejects_other_lines():
+    assert split_result_line('Running webgpu:a,*') is None
+    assert split_result_line('webgpu:a,x:t1 - passed') is None
+    assert split_result_line('webgpu:a,x:t1 - unknown') is None
+
+
+def test_parse_result_line():
+    result = parse_result_line('webgpu:a,x:t1 - warn: deprecated')
+    assert (result.test, result.status) == ('webgpu:a,x:t1', 'warn')
+    assert parse_result_line('PASS: 3') is None
+
+
+def test_feed_joins_chunks_split_mid_line():
+    parser = CTSOutputParser()
+    assert parser.feed(b'webgpu:a,x:t1 - pa') == []
+    events = parser.feed(b'ss\nwebgpu:a,x:t2 - fail\nwebgpu:b,')
+    assert [(e.test, e.status) for e in events] == [('webgpu:a,x:t1', 'pass'), ('webgpu:a,x:t2', 'fail')]
+    assert parser.feed('y:t1 - skip') == []
+    (event,) = parser.close()
+    assert isinstance(event, cts_output.TestResult)
+    assert (event.test, event.status) == ('webgpu:b,y:t1', 'skip')
+    assert parser.close() == []
+    assert parser.results == {'webgpu:a,x:t1': 'pass', 'webgpu:a,x:t2': 'fail', 'webgpu:b,y:t1': 'skip'}
+
+
+def test_warn_reports_a_warning():
+    (result, warning) = CTSOutputParser().feed_line('webgpu:a,x:t1 - warn: slow path taken')
+    assert result.status == 'warn'
+    assert isinstance(warning, cts_output.TestWarning)
+    assert (warning.test, warning.message) == ('webgpu:a,x:t1', 'slow path taken')
+
+
+def test_summary_counts():
+    parser = CTSOutputParser()
+    events = parser.feed_line('PASS: 3 FAIL: 1')
+    assert [(e.status, e.count) for e in events] == [('pass', 3), ('fail', 1)]
+    assert all(isinstance(e, SummaryCount) for e in events)
+    # The first count reported for a status is kept
+    parser.feed_line('PASS: 7')
+    assert parser.summary == {'pass': 3, 'fail': 1}
+
+
+def test_read_lines_matches_feed_line():
+    lines = ['Running webgpu:*\n',
+             'webgpu:a,x:t1 - pass\n',
+             'webgpu:a,x:t2 (2ms) - fail: mismatch\n',
+             'webgpu:b,y:t1 - warn: slow\n',
+             'webgpu:b,y:t2 - passed\n',
+             'PASS: 1 FAIL: 1 WARN: 1\n']
+    saved = CTSOutputParser().read_lines(lines)
+    live = CTSOutputParser()
+    for line in lines:
+        live.feed(line)
+    assert saved.results == live.results
+    assert saved.summary == live.summary == {'pass': 1, 'fail': 1, 'warn': 1}
+    assert saved.test_results() == {'webgpu:a,x:t1': 'pass', 'webgpu:a,x:t2': 'fail'}
+    assert saved.test_results(['warn']) == {'webgpu:b,y:t1': 'warn'}
+
+
+def test_parse_file(tmp_path):
+    output = tmp_path / 'cts_output.txt'
+    output.write_text('webgpu:a,x:t1 - pass\nwebgpu:a,x:t2 - skip\n')
+    assert parse_file(output).test_results() == {'webgpu:a,x:t1': 'pass', 'webgpu:a,x:t2': 'skip'}
+
+
+def test_iter_events():
+    events = list(iter_events(['webgpu:a,x:t1 - pass\n', 'webgpu:a,x:t2 - warn\n', 'PASS: 1\n']))
+    assert [type(e) for e in events] == [cts_output.TestResult, cts_output.TestResult, cts_output.TestWarning,
+                                         SummaryCount]
+    assert events[2].message == ''
@@ -0,0 +1,87 @@
+import json
+import sys
+
+import pytest
+
+import run.cts.kill_mutants as kill_mutants
+
+from common.run_test_with_mutants import CTSKillStatus
+from run.cts.cts_worker import TIMEOUT_STATUS, WORKER_SERVER_SCRIPT, CTSWorker, run_tests_to_completion
+from run.cts.reliable_test_index import ReliableTestIndex
+
+
+def stub_worker(tmp_path, statuses: dict) -> CTSWorker:
+    results_file = tmp_path / 'stub_results.json'
+    with open(results_file, 'w') as f:
+        json.dump(statuses, f)
+    return CTSWorker([sys.executable, str(WORKER_SERVER_SCRIPT), '--stub_results', str(results_file)])
+
+
+def test_worker_runs_requests_in_one_process(tmp_path):
+    with stub_worker(tmp_path, {"t2": 'fail', "t3": 'skip'}) as worker:
+        assert worker.run_tests(["t1", "t2"]).statuses == {"t1": 'pass', "t2": 'fail'}
+        pid = worker.process.pid
+        assert worker.run_tests(["t3"]).statuses == {"t3": 'skip'}
+        assert worker.process.pid == pid
+
+
+def test_crashing_test_fails_and_the_rest_still_run(tmp_path):
+    with stub_worker(tmp_path, {"t2": 'crash'}) as worker:
+        assert run_tests_to_completion(worker, ["t1", "t2", "t3"]) == {"t1": 'pass', "t2": 'fail', "t3": 'pass'}
+
+
+def test_hanging_test_times_out(tmp_path):
+    with stub_worker(tmp_path, {"t2": 'hang'}) as worker:
+        result = worker.run_tests(["t1", "t2", "t3"], timeout_seconds=2)
+        assert result.timed_out
+        assert result.interrupted_test == "t2"
+        assert result.statuses == {"t1": 'pass'}
+
+
+def test_stop_predicate_ends_the_request(tmp_path):
+    with stub_worker(tmp_path, {"t2": 'fail'}) as worker:
+        statuses = run_tests_to_completion(worker, ["t1", "t2", "t3"],
+                                           stop_predicate=lambda test, status: status == 'fail')
+        assert statuses == {"t1": 'pass', "t2": 'fail'}
+
+
+def test_test_timeout_applies_to_each_test(tmp_path):
+    with stub_worker(tmp_path, {"t2": 'hang'}) as worker:
+        statuses = run_tests_to_completion(worker, ["t1", "t2", "t3"], test_timeout_seconds=1)
+        assert statuses == {"t1": 'pass', "t2": TIMEOUT_STATUS, "t3": 'pass'}
+
+
+def test_worker_that_does_not_start_raises(tmp_path):
+    with CTSWorker([sys.executable, '-c', 'pass']) as worker:
+        with pytest.raises(RuntimeError):
+            worker.run_tests(["t1"])
+
+
+def run_worker_queries(monkeypatch, tmp_path, worker_cmd) -> tuple:
+    monkeypatch.setattr(kill_mutants, 'get_cts_worker_cmd', lambda dawn_path, cts_repo: worker_cmd)
+    runs = []
+    result = kill_mutants.run_cts_queries_in_worker([1],
+                                                    ["webgpu:a,*", "webgpu:b,*"],
+                                                    tmp_path,
+                                                    tmp_path,
+                                                    '',
+                                                    ReliableTestIndex(["webgpu:a,x:t1", "webgpu:b,y:t1"]),
+                                                    lambda query, killed, wall_time: runs.append((query, killed)),
+                                                    {"webgpu:a,*": 1, "webgpu:b,*": 1})
+    return (result, runs)
+
+
+def test_hanging_test_kills_mutants_in_worker(monkeypatch, tmp_path):
+    results_file = tmp_path / 'stub_results.json'
+    results_file.write_text(json.dumps({"webgpu:b,y:t1": 'hang'}))
+    ((status, killing_test, _, query), runs) = run_worker_queries(
+        monkeypatch, tmp_path, [sys.executable, str(WORKER_SERVER_SCRIPT), '--stub_results', str(results_file)])
+    assert (status, killing_test, query) == (CTSKillStatus.KILL_TEST_TIMEOUT, "webgpu:b,y:t1", "webgpu:b,*")
+    assert runs == [("webgpu:a,*", False), ("webgpu:b,*", True)]
+
+
+def test_worker_that_does_not_start_kills_mutants(monkeypatch, tmp_path):
+    ((status, killing_test, _, query), runs) = run_worker_queries(monkeypatch, tmp_path,
+                                                                  [sys.executable, '-c', 'pass'])
+    assert (status, killing_test, query) == (CTSKillStatus.KILL_WORKER_CRASH, None, "webgpu:a,*")
+    assert runs == [("webgpu:a,*", True)]
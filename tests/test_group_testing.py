@@ -0,0 +1,50 @@
+import pytest
+
+from common.group_testing import bisect_mutants, group_test_mutants, pack_compatible_mutants
+from common.mutation_tree import MutationTree
+
+
+def make_tree() -> MutationTree:
+    # Mutation 0 is in a node whose child holds mutation 1; mutations 2 and 3 are in separate nodes
+    return MutationTree({"infoForFiles": [{"mutationTree": [
+        {"children": [{"children": [], "mutationGroups": [{"removeStmt": {"mutationId": 1}}]}],
+         "mutationGroups": [{"removeStmt": {"mutationId": 0}}]},
+        {"children": [], "mutationGroups": [{"removeStmt": {"mutationId": 2}}]},
+        {"children": [], "mutationGroups": [{"removeStmt": {"mutationId": 3}}]}]}]})
+
+
+def test_incompatible_mutants_are_kept_apart():
+    assert pack_compatible_mutants([0, 1, 2, 3], make_tree(), 4) == [[0, 2, 3], [1]]
+    assert pack_compatible_mutants([0, 1, 2, 3], make_tree(), 2) == [[0, 2], [1, 3]]
+    assert pack_compatible_mutants([0, 1, 2, 3], make_tree(), 1) == [[0], [1], [2], [3]]
+
+
+def run_with_kills(killing_mutants, runs):
+    def run_mutants(mutants):
+        runs.append(list(mutants))
+        return 'killed' if any(m in killing_mutants for m in mutants) else 'survived'
+    return run_mutants
+
+
+def test_surviving_batch_is_run_once():
+    runs = []
+    results = group_test_mutants([1, 2, 3, 4], run_with_kills(set(), runs), lambda result: result == 'survived')
+    assert runs == [[1, 2, 3, 4]]
+    assert results == {1: 'survived', 2: 'survived', 3: 'survived', 4: 'survived'}
+
+
+def test_killed_batch_is_bisected_to_the_killed_mutants():
+    runs = []
+    results = group_test_mutants([1, 2, 3, 4], run_with_kills({2, 4}, runs), lambda result: result == 'survived')
+    assert results == {1: 'survived', 2: 'killed', 3: 'survived', 4: 'killed'}
+    assert runs == [[1, 2, 3, 4], [1, 2], [1], [2], [3, 4], [3], [4]]
+
+
+def test_bisect_mutants_attributes_results_from_the_final_runs():
+    strategy = bisect_mutants([1, 2], lambda result: result == 'survived')
+    assert next(strategy) == [1, 2]
+    assert strategy.send('killed') == [1]
+    assert strategy.send('survived') == [2]
+    with pytest.raises(StopIteration) as finished:
+        strategy.send('killed')
+    assert finished.value.value == {1: 'survived', 2: 'killed'}
@@ -0,0 +1,198 @@
+import copy
+import io
+import json
+import sys
+
+import pytest
+
+import common.mutation_tree as mutation_tree
+
+from common.mutation_tree import MutationTree, MutationTreeBuilder, load_mutation_tree, stream_mutation_info
+
+# Two files; mutation groups of every kind, nodes without mutations, nesting three deep and a node whose mutation
+# groups come before its children (Dredd writes them after)
+MUTATION_INFO = {"infoForFiles": [
+    {"mutationTree": [
+        {"mutationGroups": [{"removeStmt": {"mutationId": 0}}],
+         "children": [
+             {"children": [],
+              "mutationGroups": [{"replaceExpr": {"instances": [{"mutationId": 1}, {"mutationId": 2}]}}]},
+             {"children": [
+                 {"children": [],
+                  "mutationGroups": [{"replaceUnaryOperator": {"instances": [{"mutationId": 3}]}}]}],
+              "mutationGroups": []},
+             {"children": [],
+              "mutationGroups": [{"replaceBinaryOperator": {"instances": [{"mutationId": 4}, {"mutationId": 5}]}},
+                                 {"removeStmt": {"mutationId": 6}}]}]},
+        {"children": [],
+         "mutationGroups": [{"removeStmt": {"mutationId": 7}}]}]},
+    {"mutationTree": [
+        {"children": [
+            {"children": [], "mutationGroups": [{"removeStmt": {"mutationId": 9}}]}],
+         "mutationGroups": [{"removeStmt": {"mutationId": 8}}]}]}]}
+
+
+def get_mutation_ids(json_node) -> list:
+    mutation_ids = []
+    for group in json_node["mutationGroups"]:
+        (kind, mutation) = next(iter(group.items()))
+        mutation_ids += [mutation["mutationId"]] if kind == 'removeStmt' \
+            else [instance["mutationId"] for instance in mutation["instances"]]
+    return mutation_ids
+
+
+class ObjectMutationTree:
+    '''
+    The object tree MutationTree used to be, with its recursion into
+    children restored, as the reference for the flat arrays.
+    '''
+
+    def __init__(self, json_data):
+        self.nodes = {}
+        self.parent_map = {}
+        self.mutation_id_to_node_id = {}
+        self.num_mutations = 0
+        self.num_nodes = 0
+
+        def populate(json_node, node_id):
+            children = []
+            for child_json_node in json_node["children"]:
+                child_node_id = self.num_nodes
+                children.append(child_node_id)
+                self.parent_map[child_node_id] = node_id
+                self.num_nodes += 1
+                populate(child_json_node, child_node_id)
+            self.nodes[node_id] = (get_mutation_ids(json_node), children)
+            self.num_mutations = max([self.num_mutations] + self.nodes[node_id][0])
+            for mutation_id in self.nodes[node_id][0]:
+                self.mutation_id_to_node_id[mutation_id] = node_id
+
+        for file_info in json_data["infoForFiles"]:
+            for json_node in file_info["mutationTree"]:
+                root_node_id = self.num_nodes
+                self.num_nodes += 1
+                populate(json_node, root_node_id)
+
+    def get_mutation_ids_for_subtree(self, node_id) -> list:
+        (mutation_ids, children) = self.nodes[node_id]
+        return mutation_ids + [m for child in children for m in self.get_mutation_ids_for_subtree(child)]
+
+    def get_incompatible_mutation_ids(self, mutation_id) -> list:
+        node_id = self.mutation_id_to_node_id[mutation_id]
+        result = self.get_mutation_ids_for_subtree(node_id)
+        while node_id in self.parent_map:
+            node_id = self.parent_map[node_id]
+            result += self.nodes[node_id][0]
+        return result
+
+
+def test_flat_tree_matches_object_tree():
+    tree = MutationTree(MUTATION_INFO)
+    reference = ObjectMutationTree(MUTATION_INFO)
+
+    assert tree.num_nodes == reference.num_nodes == 8
+    assert tree.num_mutations == reference.num_mutations == 9
+    assert dict(tree.parent_map) == reference.parent_map
+    assert dict(tree.mutation_id_to_node_id) == reference.mutation_id_to_node_id
+    for node_id in range(tree.num_nodes):
+        node = tree.nodes[node_id]
+        assert (node.mutation_ids, node.children) == reference.nodes[node_id]
+        assert tree.get_mutation_ids_for_subtree(node_id) == reference.get_mutation_ids_for_subtree(node_id)
+    for mutation_id in range(tree.num_mutations + 1):
+        assert tree.get_incompatible_mutation_ids(mutation_id) == reference.get_incompatible_mutation_ids(mutation_id)
+
+
+def test_ancestors_and_subtrees():
+    tree = MutationTree(MUTATION_INFO)
+    # Mutation 3 is below a node without mutations, below the node of mutation 0
+    assert tree.get_incompatible_mutation_ids(3) == [3, 0]
+    assert tree.get_incompatible_mutation_ids(0) == [0, 1, 2, 3, 4, 5, 6]
+    # Roots in other files, and siblings, are compatible
+    assert tree.get_incompatible_mutation_ids(7) == [7]
+    assert tree.get_incompatible_mutation_ids(9) == [9, 8]
+    assert list(tree.get_children(0)) == [1, 2, 4]
+    assert tree.get_mutation_ids_for_subtree(2) == [3]
+
+
+def test_deep_tree_is_built_without_recursion():
+    depth = 10 * sys.getrecursionlimit()
+    builder = MutationTreeBuilder()
+    for mutation_id in range(depth):
+        builder.start_node()
+        builder.add_mutation_ids([mutation_id])
+    for _ in range(depth):
+        builder.end_node()
+    tree = builder.build()
+
+    assert tree.get_incompatible_mutation_ids(depth - 1) == list(range(depth - 1, -1, -1))
+    assert tree.get_mutation_ids_for_subtree(0) == list(range(depth))
+
+
+
+def assert_same_tree(tree: MutationTree, expected: MutationTree) -> None:
+    assert list(tree.parent) == list(expected.parent)
+    assert list(tree.subtree_end) == list(expected.subtree_end)
+    assert list(tree.mutation_offsets) == list(expected.mutation_offsets)
+    assert list(tree.mutation_ids) == list(expected.mutation_ids)
+    assert list(tree.mutation_node) == list(expected.mutation_node)
+    assert tree.num_mutations == expected.num_mutations
+    assert tree.digest == expected.digest
+
+
+def stream_tree(json_data, indent=None) -> MutationTree:
+    builder = MutationTreeBuilder()
+    stream_mutation_info(io.BytesIO(json.dumps(json_data, indent=indent).encode()), builder)
+    return builder.build()
+
+
+@pytest.mark.parametrize('json_data', [
+    MUTATION_INFO,
+    {"infoForFiles": []},
+    {"infoForFiles": [{"mutationTree": []}, {"mutationTree": [{"children": [], "mutationGroups": []}]}]},
+], ids=['nested', 'no_files', 'empty_trees'])
+def test_streamed_tree_matches_loaded_tree(json_data):
+    pytest.importorskip('ijson')
+    assert_same_tree(stream_tree(json_data), MutationTree(json_data))
+    assert_same_tree(stream_tree(json_data, indent=2), MutationTree(json_data))
+
+
+def test_load_mutation_tree_with_and_without_ijson(tmp_path, monkeypatch):
+    pytest.importorskip('ijson')
+    mutation_info_file = tmp_path / 'mutation_info.json'
+    mutation_info_file.write_text(json.dumps(MUTATION_INFO))
+    streamed = load_mutation_tree(mutation_info_file)
+    monkeypatch.setattr(mutation_tree, 'ijson', None)
+    assert_same_tree(streamed, load_mutation_tree(mutation_info_file))
+
+
+# Digest of MUTATION_INFO. The digest keys campaign state to the tree, so it must only change with the format on purpose
+MUTATION_INFO_DIGEST = '3681c3dcc54ef5d1d8c0980a5511f27b35c4b112cabcf2e8e590d749f0a2f4bd'
+
+
+def test_digest_is_pinned():
+    tree = MutationTree(MUTATION_INFO)
+    assert tree.digest == MUTATION_INFO_DIGEST
+    # Recomputed from the arrays alone, as for a tree without a stored digest
+    assert MutationTree.from_arrays(list(tree.parent), list(tree.subtree_end), list(tree.mutation_offsets),
+                                    list(tree.mutation_ids)).digest == MUTATION_INFO_DIGEST
+
+
+def test_digest_is_the_same_streamed_and_loaded():
+    pytest.importorskip('ijson')
+    assert stream_tree(MUTATION_INFO).digest == MUTATION_INFO_DIGEST
+    assert stream_tree(MUTATION_INFO, indent=4).digest == MUTATION_INFO_DIGEST
+
+
+def test_digest_changes_with_structure():
+    moved_mutation = copy.deepcopy(MUTATION_INFO)
+    # Move mutation 7 from the second root of the first file to the first root
+    second_root = moved_mutation["infoForFiles"][0]["mutationTree"][1]
+    moved_mutation["infoForFiles"][0]["mutationTree"][0]["mutationGroups"] += second_root["mutationGroups"]
+    second_root["mutationGroups"] = []
+
+    added_child = copy.deepcopy(MUTATION_INFO)
+    added_child["infoForFiles"][1]["mutationTree"][0]["children"].append({"children": [], "mutationGroups": []})
+
+    digests = [MutationTree(json_data).digest for json_data in [moved_mutation, added_child]]
+    assert MUTATION_INFO_DIGEST not in digests
+    assert len(set(digests)) == 2
@@ -0,0 +1,88 @@
+import json
+
+from pathlib import Path
+
+import common.mutation_tree_cache as mutation_tree_cache
+
+from common.mutation_tree import MutationTree
+from common.mutation_tree_cache import get_cache_file, get_mutation_tree_digest, load_cached_mutation_tree, \
+    read_mutation_tree_cache, read_mutation_tree_cache_digest, write_mutation_tree_cache
+from tests.test_mutation_tree import MUTATION_INFO, MUTATION_INFO_DIGEST, assert_same_tree
+
+
+def write_mutation_info(path: Path, json_data) -> Path:
+    path.write_text(json.dumps(json_data))
+    return path
+
+
+def count_json_loads(monkeypatch) -> list:
+    loads = []
+    load_mutation_tree = mutation_tree_cache.load_mutation_tree
+
+    def counting_load_mutation_tree(mutation_info_file):
+        loads.append(mutation_info_file)
+        return load_mutation_tree(mutation_info_file)
+
+    monkeypatch.setattr(mutation_tree_cache, 'load_mutation_tree', counting_load_mutation_tree)
+    return loads
+
+
+def test_cache_round_trip(tmp_path):
+    tree = MutationTree(MUTATION_INFO)
+    cache_file = Path(tmp_path, 'tree.cache')
+    write_mutation_tree_cache(tree, cache_file)
+    assert_same_tree(read_mutation_tree_cache(cache_file), tree)
+
+
+def test_cache_is_reused(tmp_path, monkeypatch):
+    mutation_info_file = write_mutation_info(Path(tmp_path, 'mutation_info.json'), MUTATION_INFO)
+    loads = count_json_loads(monkeypatch)
+
+    first = load_cached_mutation_tree(mutation_info_file)
+    second = load_cached_mutation_tree(mutation_info_file)
+    assert len(loads) == 1
+    assert_same_tree(second, first)
+    assert_same_tree(second, MutationTree(MUTATION_INFO))
+
+
+def test_changed_mutation_info_is_not_served_from_cache(tmp_path):
+    mutation_info_file = write_mutation_info(Path(tmp_path, 'mutation_info.json'), MUTATION_INFO)
+    old_cache_file = get_cache_file(mutation_info_file)
+    load_cached_mutation_tree(mutation_info_file)
+
+    changed = {"infoForFiles": MUTATION_INFO["infoForFiles"][:1]}
+    write_mutation_info(mutation_info_file, changed)
+    assert get_cache_file(mutation_info_file) != old_cache_file
+    assert_same_tree(load_cached_mutation_tree(mutation_info_file), MutationTree(changed))
+
+
+def test_bad_cache_file_falls_back_to_mutation_info(tmp_path, monkeypatch):
+    mutation_info_file = write_mutation_info(Path(tmp_path, 'mutation_info.json'), MUTATION_INFO)
+    cache_file = get_cache_file(mutation_info_file)
+    expected = load_cached_mutation_tree(mutation_info_file)
+    good_cache = cache_file.read_bytes()
+    loads = count_json_loads(monkeypatch)
+
+    for bad_cache in [b'', good_cache[:-1], good_cache[:mutation_tree_cache.CACHE_HEADER.size],
+                      b'NOTATREE' + good_cache[8:]]:
+        cache_file.write_bytes(bad_cache)
+        assert read_mutation_tree_cache(cache_file) is None
+        assert_same_tree(load_cached_mutation_tree(mutation_info_file), expected)
+        # The cache is rewritten by the fallback
+        assert cache_file.read_bytes() == good_cache
+    assert len(loads) == 4
+
+
+def test_digest_is_read_from_a_valid_cache_only(tmp_path, monkeypatch):
+    mutation_info_file = write_mutation_info(Path(tmp_path, 'mutation_info.json'), MUTATION_INFO)
+    cache_file = get_cache_file(mutation_info_file)
+    assert get_mutation_tree_digest(mutation_info_file) == MUTATION_INFO_DIGEST
+    assert read_mutation_tree_cache_digest(cache_file) == MUTATION_INFO_DIGEST
+
+    # A cache whose header is intact but whose arrays were truncated is not trusted
+    cache_file.write_bytes(cache_file.read_bytes()[:-1])
+    assert read_mutation_tree_cache_digest(cache_file) is None
+    loads = count_json_loads(monkeypatch)
+    assert get_mutation_tree_digest(mutation_info_file) == MUTATION_INFO_DIGEST
+    assert len(loads) == 1
+    assert read_mutation_tree_cache_digest(cache_file) == MUTATION_INFO_DIGEST
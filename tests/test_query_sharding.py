@@ -0,0 +1,31 @@
+from run.cts.query_sharding import QueryRuntimes, estimate_runtimes, shard_queries
+
+
+def test_shard_queries_balances_expected_runtime():
+    wall_times = {"a": 10.0, "b": 7.0, "c": 5.0, "d": 3.0, "e": 2.0}
+    shards = shard_queries(list(wall_times), wall_times, 2)
+    assert shards == [["a", "d"], ["b", "c", "e"]]
+    assert sorted(query for shard in shards for query in shard) == sorted(wall_times)
+
+
+def test_shard_queries_is_deterministic_and_drops_duplicates():
+    wall_times = {"a": 1.0, "b": 1.0, "c": 1.0}
+    assert shard_queries(["c", "a", "b", "a"], wall_times, 2) == shard_queries(["a", "b", "c"], wall_times, 2)
+    assert shard_queries(["a", "b", "c"], wall_times, 2) == [["a", "c"], ["b"]]
+
+
+def test_shard_queries_more_shards_than_queries():
+    assert shard_queries(["a"], {"a": 1.0}, 3) == [["a"], [], []]
+
+
+def test_unknown_queries_take_the_median_runtime():
+    assert estimate_runtimes(["a", "b", "c", "d"], {"a": 1.0, "b": 3.0, "c": 8.0}) == \
+        {"a": 1.0, "b": 3.0, "c": 8.0, "d": 3.0}
+    assert estimate_runtimes(["a"], {}) == {"a": 1.0}
+
+
+def test_query_runtimes_weight_recent_runs(tmp_path):
+    with QueryRuntimes(tmp_path / 'query_runtimes.sqlite') as query_runtimes:
+        query_runtimes.record("a", 10.0)
+        query_runtimes.record("a", 20.0)
+        assert query_runtimes.expected_wall_times() == {"a": 15.0}
@@ -0,0 +1,43 @@
+import json
+import os
+
+from run.cts.reliable_test_index import ReliableTestIndex, get_index_file, load_reliable_test_index
+
+TESTS = ["webgpu:b,y:t1", "webgpu:a,x:t2", "webgpu:a,x:t1", "webgpu:a,xy:t1", "webgpu:a,x:t1"]
+
+
+def test_membership_and_queries():
+    index = ReliableTestIndex(TESTS)
+    assert len(index) == 4
+    assert "webgpu:a,x:t1" in index
+    assert "webgpu:a,x:t3" not in index
+    assert "webgpu:c" not in index
+    assert index.tests_under("webgpu:a,x:*") == ["webgpu:a,x:t1", "webgpu:a,x:t2"]
+    assert index.tests_under("webgpu:a,*") == ["webgpu:a,x:t1", "webgpu:a,x:t2", "webgpu:a,xy:t1"]
+    assert index.count_under("webgpu:*") == 4
+    assert index.count_under("webgpu:a,x:t2") == 1
+    assert index.count_under("webgpu:a,x:t3") == 0
+    assert index.count_under("unittests:*") == 0
+
+
+def test_persisted_index_is_used_while_the_tests_file_is_unchanged(tmp_path):
+    reliable_tests_file = tmp_path / 'reliable_tests.json'
+    with open(reliable_tests_file, 'w') as f:
+        json.dump(TESTS, f)
+
+    assert load_reliable_test_index(reliable_tests_file).tests == sorted(set(TESTS))
+    assert get_index_file(reliable_tests_file).exists()
+
+    # A fresh index is read without the tests file
+    with open(get_index_file(reliable_tests_file), 'r') as f:
+        persisted = json.load(f)
+    persisted["tests"] = ["webgpu:from_index"]
+    with open(get_index_file(reliable_tests_file), 'w') as f:
+        json.dump(persisted, f)
+    assert "webgpu:from_index" in load_reliable_test_index(reliable_tests_file)
+
+    # Rewriting the tests file makes the index stale
+    with open(reliable_tests_file, 'w') as f:
+        json.dump(["webgpu:new"], f)
+    os.utime(reliable_tests_file, ns=(0, 1))
+    assert load_reliable_test_index(reliable_tests_file).tests == ["webgpu:new"]
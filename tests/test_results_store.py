@@ -0,0 +1,23 @@
+from common.results_store import ResultsStore, get_killing_test, is_noted_as_killed, note_kill
+
+
+def test_killing_test_from_the_kill_directory(tmp_path):
+    (tmp_path / 'killed_mutants').mkdir()
+    assert note_kill(tmp_path, None, 4, 'wgslsmith_1', {"killing_test": 'wgslsmith_1', "kill_type": 'k'})
+    assert note_kill(tmp_path, None, 5, 'webgpu:a,*', {"killing_query": 'webgpu:a,*', "kill_type": 'k'})
+    # The first kill is kept
+    assert not note_kill(tmp_path, None, 4, 'wgslsmith_2', {"killing_test": 'wgslsmith_2', "kill_type": 'k'})
+
+    assert is_noted_as_killed(tmp_path, None, 4)
+    assert get_killing_test(tmp_path, None, 4) == 'wgslsmith_1'
+    assert get_killing_test(tmp_path, None, 5) == 'webgpu:a,*'
+    assert get_killing_test(tmp_path, None, 6) is None
+
+
+def test_killing_test_from_the_results_store(tmp_path):
+    (tmp_path / 'killed_mutants').mkdir()
+    with ResultsStore(tmp_path / 'results.sqlite') as results_store:
+        assert note_kill(tmp_path, results_store, 4, 'wgslsmith_1', {"killing_test": 'wgslsmith_1', "kill_type": 'k'})
+        assert not note_kill(tmp_path, results_store, 4, 'wgslsmith_2', {"kill_type": 'k'})
+        assert get_killing_test(tmp_path, results_store, 4) == 'wgslsmith_1'
+        assert get_killing_test(tmp_path, results_store, 5) is None
@@ -0,0 +1,55 @@
+import sys
+import time
+
+import common.process_reaper as process_reaper
+import common.run_process_with_timeout as run_process_with_timeout
+
+from common.process_reaper import read_process_info
+from common.run_process_with_timeout import run_process_streaming
+
+PRINT_LINES = [sys.executable, '-c', 'for i in range(5): print(f"line {i}", flush=True)']
+
+
+def test_on_line_sees_every_line_without_stopping_the_run():
+    lines = []
+    result = run_process_streaming(PRINT_LINES, timeout_seconds=30, on_line=lines.append)
+    assert lines == [f'line {i}\n' for i in range(5)]
+    assert result.returncode == 0
+    assert not result.stopped_early
+
+
+def test_stop_predicate_stops_the_run_after_on_line():
+    lines = []
+    result = run_process_streaming(PRINT_LINES, timeout_seconds=30, on_line=lines.append,
+                                   stop_predicate=lambda line: line == 'line 1\n')
+    assert lines == ['line 0\n', 'line 1\n']
+    assert result.stopped_early
+
+
+# Leaves a process behind in its session, holding none of the output pipes, and prints its pid
+LEAVE_PROCESS_BEHIND = [sys.executable, '-c',
+                        'import subprocess, sys; '
+                        'p = subprocess.Popen(["sleep", "60"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL); '
+                        'print(p.pid)']
+
+
+def test_session_is_swept_before_the_leader_is_reaped(monkeypatch):
+    leader_states = []
+
+    def check_reap_session(session: int) -> list:
+        # The leader must still hold its pid, and so the session id, while the session is swept
+        leader_states.append(read_process_info(session).state)
+        return process_reaper.reap_session(session)
+
+    monkeypatch.setattr(run_process_with_timeout, 'reap_session', check_reap_session)
+    result = run_process_streaming(LEAVE_PROCESS_BEHIND, timeout_seconds=30)
+
+    assert leader_states and set(leader_states) == {'Z'}
+    # SIGKILL is delivered asynchronously, so give the kernel a moment to tear the process down
+    deadline = time.monotonic() + 10
+    while True:
+        left_behind = read_process_info(int(result.stdout))
+        if left_behind is None or left_behind.state == 'Z' or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert left_behind is None or left_behind.state == 'Z'
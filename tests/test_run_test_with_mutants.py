@@ -0,0 +1,21 @@
+from common.run_test_with_mutants import get_execution_timeout, get_mutant_stdout_spool, get_silence_timeout
+
+
+def test_execution_timeout_scales_with_concurrency():
+    assert get_execution_timeout(2.0) == 10.0
+    assert get_execution_timeout(2.0, concurrency=4) == 40.0
+    # The configured timeout still caps it
+    assert get_execution_timeout(2.0, limit=30.0, concurrency=4) == 30.0
+    assert get_execution_timeout(0.01) == 1.0
+
+
+def test_silence_timeout_scales_with_concurrency():
+    assert get_silence_timeout(3.0) == 15.0
+    assert get_silence_timeout(3.0, concurrency=2) == 30.0
+
+
+def test_mutant_stdout_spool_names(tmp_path):
+    assert get_mutant_stdout_spool(tmp_path, [7]) == tmp_path / 'mutant_stdout_7.gz'
+    batch = get_mutant_stdout_spool(tmp_path, list(range(1000)))
+    assert batch.parent == tmp_path and len(batch.name) < 64
+    assert batch != get_mutant_stdout_spool(tmp_path, list(range(999)))
@@ -0,0 +1,70 @@
+import json
+import stat
+import sys
+
+import common.run_test_with_mutants as run_test_with_mutants
+import run.wgslsmith.kill_mutants as kill_mutants
+
+from tests.fake_dawn import write_mutation_info
+
+# Stands in for both the WGSLsmith checkout (gen and recondition) and the harness built against each compiler
+# (run). Mutant 0 makes a run go silent, mutant 1 changes its outputs
+FAKE_WGSLSMITH = '''#!{python}
+import os
+import shutil
+import sys
+import time
+
+command = sys.argv[1]
+if command == 'gen':
+    with open(sys.argv[3], 'w') as f:
+        f.write('// {{}}\\n')
+elif command == 'recondition':
+    shutil.copy(sys.argv[2], sys.argv[3])
+else:
+    tracking_file = os.environ.get('DREDD_MUTANT_TRACKING_FILE')
+    if tracking_file is not None:
+        with open(tracking_file, 'w') as f:
+            f.write('0\\n1\\n')
+    enabled = [m for m in os.environ.get('DREDD_ENABLED_MUTATION', '').split(',') if m]
+    if '0' in enabled:
+        time.sleep(60)
+    print('outputs: buffer0 [' + ('1, 3' if '1' in enabled else '1, 2') + ']', flush=True)
+'''
+
+
+def make_fake_wgslsmith(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(FAKE_WGSLSMITH.format(python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return path
+
+
+def test_silenced_mutant_run_is_recorded_as_a_kill(tmp_path, monkeypatch):
+    # So that the silence watchdog, rather than the run timeout, stops the mutant that hangs
+    monkeypatch.setattr(run_test_with_mutants, 'MIN_SILENCE_TIMEOUT_FOR_MUTANT_EXECUTION', 0.5)
+
+    wgslsmith_root = tmp_path / 'wgslsmith'
+    make_fake_wgslsmith(wgslsmith_root / 'wgslsmith')
+    mutant_kill_path = tmp_path / 'kill'
+    # Mutants 0 and 1 are tried: as before the flat tree, num_mutations is the largest mutation id
+    kill_mutants.main([str(write_mutation_info(tmp_path / 'mutated.json', 3)),
+                       str(write_mutation_info(tmp_path / 'tracking.json', 3)),
+                       str(make_fake_wgslsmith(tmp_path / 'mutated' / 'wgslsmith')),
+                       str(make_fake_wgslsmith(tmp_path / 'tracking' / 'wgslsmith')),
+                       str(wgslsmith_root),
+                       str(mutant_kill_path),
+                       '--compile_timeout', '30',
+                       '--work_queue', str(tmp_path / 'work_queue.sqlite'),
+                       '--seed', '1'])
+
+    with open(mutant_kill_path / 'killed_mutants' / '0' / 'kill_info.json', 'r') as f:
+        silenced = json.load(f)
+    assert silenced["kill_type"] == str(run_test_with_mutants.KillStatus.KILL_RUNTIME_TIMEOUT)
+    assert silenced["mutated_stdout"] is None
+    assert silenced["resource_usage"] is None
+
+    with open(mutant_kill_path / 'killed_mutants' / '1' / 'kill_info.json', 'r') as f:
+        different_output = json.load(f)
+    assert different_output["kill_type"] == str(run_test_with_mutants.KillStatus.KILL_DIFFERENT_STDOUT)
+    assert '[1, 3]' in different_output["mutated_stdout"]
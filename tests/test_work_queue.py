@@ -0,0 +1,80 @@
+import time
+
+from common.work_queue import WorkQueue, drain
+
+LEASE_SECONDS = 0.2
+
+
+def make_queue(tmp_path, **kwargs) -> WorkQueue:
+    queue = WorkQueue(tmp_path / 'work_queue.sqlite', lease_seconds=LEASE_SECONDS, **kwargs)
+    queue.add_items({"a": {"mutant": 1}, "b": {"mutant": 2}})
+    return queue
+
+
+def test_items_are_leased_once_until_completed(tmp_path):
+    queue = make_queue(tmp_path)
+    [item] = queue.lease('w1')
+    assert (item.key, item.payload, item.attempts) == ("a", {"mutant": 1}, 1)
+    assert [item.key for item in queue.lease('w2', limit=2)] == ["b"]
+    assert queue.lease('w3') == []
+
+    assert queue.complete('w1', "a", {"killed": True})
+    assert not queue.complete('w1', "b", {})
+    assert queue.complete('w2', "b", {})
+    assert queue.results() == {"a": {"killed": True}, "b": {}}
+    assert queue.is_drained()
+    queue.close()
+
+
+def test_expired_lease_is_reassigned(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.lease('crashed', limit=2)
+    time.sleep(2 * LEASE_SECONDS)
+
+    items = queue.lease('w2', limit=2)
+    assert [(item.key, item.attempts) for item in items] == [("a", 2), ("b", 2)]
+    # The crashed worker's result is dropped once the item has been reassigned
+    assert not queue.complete('crashed', "a", {})
+    assert queue.complete('w2', "a", {})
+    queue.close()
+
+
+def test_renewed_lease_does_not_expire(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.lease('w1')
+    for _ in range(3):
+        time.sleep(LEASE_SECONDS / 2)
+        queue.renew('w1')
+    assert [item.key for item in queue.lease('w2', limit=2)] == ["b"]
+    queue.close()
+
+
+def test_item_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    queue.add_items({"a": {"mutant": 3}})
+    for worker in ['w1', 'w2']:
+        assert [item.key for item in queue.lease(worker)] == ["a"]
+        time.sleep(2 * LEASE_SECONDS)
+    assert [item.key for item in queue.lease('w3', limit=2)] == ["b"]
+    assert queue.failed_keys() == ["a"]
+    queue.close()
+
+
+def test_released_item_keeps_its_attempts(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.lease_keys('w1', ["b"])
+    queue.release('w1', "b")
+    [item] = queue.lease_keys('w2', ["b"])
+    assert item.attempts == 1
+    queue.close()
+
+
+def test_drain_leases_every_item(tmp_path):
+    queue = make_queue(tmp_path)
+    leased = []
+    for items in drain(queue, 'w1', limit=1, wait_seconds=0):
+        for item in items:
+            leased.append(item.key)
+            queue.complete('w1', item.key, {})
+    assert leased == ["a", "b"]
+    queue.close()